@@ -0,0 +1,137 @@
+"""
+Constant propagation over a renamed block, used to tell memory operations apart. Values come from
+loadI constants and flow through add, sub, mult, lshift, and rshift (with the simulator's 32-bit
+wraparound); anything that depends on a load is unknown. An access is one word (WORD_BYTES bytes)
+at its address:
+    -load rA => rB reads the word at rA, and output c reads the word at c
+    -store rA => rB writes the word at rB
+Two accesses are disjoint only if both addresses are known and the words do not overlap, so an
+unknown address conflicts with everything.
+"""
+
+WORD_BYTES = 4
+
+
+def wrap(value):
+    # value as a 32-bit two's complement integer
+    return (value + 0x80000000) % 0x100000000 - 0x80000000
+
+
+def fold(opcode, a, b):
+    # The value add, sub, mult, lshift, or rshift (opcodes 3 to 7) computes, or None
+    if opcode == 3:
+        return wrap(a + b)
+    if opcode == 4:
+        return wrap(a - b)
+    if opcode == 5:
+        return wrap(a * b)
+    if not 0 <= b < 32:
+        # Shift counts the simulator does not define
+        return None
+    if opcode == 6:
+        return wrap(a << b)
+    return a >> b
+
+
+def may_alias(a, b):
+    # Whether accesses at addresses a and b (None: unknown) can touch the same bytes
+    return a is None or b is None or abs(a - b) < WORD_BYTES
+
+
+class AddressTracker:
+    """
+    Feed it the operations of a renamed block in block order (address()); it returns the address
+    each load, store, and output accesses, as far as it is known.
+    """
+
+    def __init__(self):
+        # VR -> its value, for the VRs whose value is known
+        self.values = {}
+
+    def address(self, opcode, constant, vr1, vr2, vr3):
+        # constant: SR 1 (the constant of loadI and output); vr1, vr2, vr3: VRs 1, 2, and 3.
+        # Returns the address a load, store, or output accesses (None if unknown or not one).
+        values = self.values
+        if opcode == 1:
+            values[vr3] = wrap(constant)
+            return None
+        if opcode == 0:
+            values.pop(vr3, None)
+            return values.get(vr1)
+        if opcode == 2:
+            return values.get(vr3)
+        if opcode == 8:
+            return constant
+        if 3 <= opcode <= 7:
+            a = values.get(vr1)
+            b = values.get(vr2)
+            value = None if a is None or b is None else fold(opcode, a, b)
+            if value is None:
+                values.pop(vr3, None)
+            else:
+                values[vr3] = value
+        return None
+
+
+class StoreIndex:
+    """
+    The stores seen so far, indexed by address, so that the latest store that may write what a
+    load or output reads is found without walking back through every store.
+    """
+
+    def __init__(self):
+        # address -> (position, store) of the latest store to exactly that address
+        self.at = {}
+        # (position, store) of the latest store to an unknown address
+        self.unknown = None
+        # (position, store) of the latest store
+        self.latest = None
+
+    def add(self, position, store, address):
+        entry = (position, store)
+        if address is None:
+            self.unknown = entry
+        else:
+            self.at[address] = entry
+        self.latest = entry
+
+    def latest_aliasing(self, address):
+        # The latest store that may write the word at address (None: unknown), or None
+        if address is None or self.latest is None:
+            return None if self.latest is None else self.latest[1]
+        best = self.unknown
+        at = self.at
+        for other in range(address - WORD_BYTES + 1, address + WORD_BYTES):
+            entry = at.get(other)
+            if entry is not None and (best is None or entry[0] > best[0]):
+                best = entry
+        return None if best is None else best[1]
+
+
+class PendingReads:
+    """
+    The loads and outputs a later store may still need a serial edge to, indexed by the address
+    they read (None for unknown addresses).
+    """
+
+    def __init__(self):
+        # address -> [(position, load or output), ...]
+        self.at = {}
+
+    def add(self, position, node, address):
+        self.at.setdefault(address, []).append((position, node))
+
+    def aliasing(self, address, remove):
+        # The reads a store to address (None: unknown) may overwrite, in block order; with remove,
+        # they are no longer pending
+        if address is None:
+            addresses = list(self.at)
+        else:
+            addresses = [None, *range(address - WORD_BYTES + 1, address + WORD_BYTES)]
+        found = []
+        for other in addresses:
+            entries = self.at.pop(other, None) if remove else self.at.get(other)
+            if entries:
+                found.extend(entries)
+        found.sort(key=lambda entry: entry[0])
+        return [node for _, node in found]
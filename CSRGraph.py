@@ -0,0 +1,90 @@
+"""
+Dependence graph in compressed sparse row form, as built by
+DependencyGraphGenerator.generate_dependency_graph_csr: integer node ids (block positions) and typed
+array columns, so a graph pickles as a handful of byte strings.
+"""
+
+from array import array
+from Node import format_operation
+
+NONE = -1
+
+
+class CSRGraph:
+    def __init__(self):
+        # Per node. constants holds SR 1 of loadI and output, else 0 (a list: ILOC constants have
+        # no size limit); NONE marks an unused VR.
+        self.lines = array("q")
+        self.opcodes = array("b")
+        self.constants = []
+        self.vrs1 = array("q")
+        self.vrs2 = array("q")
+        self.vrs3 = array("q")
+        # Out edges (node -> child): node i's are out_offsets[i] to out_offsets[i + 1] - 1 in each
+        # column. out_vrs is the VR a data edge carries (else NONE) and out_latencies the edge's
+        # latency on the machine the graph was built for. The in edges (node -> parent) are the
+        # same columns, indexed by the child. Edges are in the order the Node graph stores them,
+        # so both forms schedule identically.
+        self.out_offsets = array("I", [0])
+        self.out_targets = array("I")
+        self.out_kinds = array("b")
+        self.out_vrs = array("q")
+        self.out_latencies = array("I")
+        self.in_offsets = array("I", [0])
+        self.in_targets = array("I")
+        self.in_kinds = array("b")
+        self.in_vrs = array("q")
+        self.in_latencies = array("I")
+        self.out_degree = array("I")
+        self.in_degree = array("I")
+        # Built with the memory frontier and without disambiguation (see Scheduler.schedule)
+        self.memory_frontier = False
+        # formatOP() result per node, made on first use (not pickled)
+        self.formatted = {}
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["formatted"] = {}
+        return state
+
+    def children(self, node):
+        return self.out_targets[self.out_offsets[node]:self.out_offsets[node + 1]]
+
+    def parents(self, node):
+        return self.in_targets[self.in_offsets[node]:self.in_offsets[node + 1]]
+
+    def roots(self):
+        # Nodes no other node depends on, in block order
+        return [node for node, degree in enumerate(self.in_degree) if degree == 0]
+
+    def leaves(self):
+        # Nodes without dependences (ready at the start of scheduling), in block order
+        return [node for node, degree in enumerate(self.out_degree) if degree == 0]
+
+    def formatOP(self, node):
+        formatted = self.formatted.get(node)
+        if formatted is None:
+            formatted = format_operation(self.opcodes[node], self.constants[node], self.vrs1[node], self.vrs2[node], self.vrs3[node])
+            self.formatted[node] = formatted
+        return formatted
+
+    def node(self, node):
+        return CSRNodeView(self, node)
+
+
+class CSRNodeView:
+    # The part of the Node interface ScheduleWriter uses, for one node of a CSRGraph
+    __slots__ = ("graph", "id")
+
+    def __init__(self, graph: CSRGraph, node):
+        self.graph = graph
+        self.id = node
+
+    def formatOP(self):
+        return self.graph.formatOP(self.id)
+
+    def getOPNum(self):
+        return self.graph.lines[self.id]
@@ -0,0 +1,168 @@
+"""
+Struct-of-arrays version of the OP linked list: column k holds index k of OP.getData() for every
+operation, in block order.
+"""
+
+from array import array
+from OP import OP
+
+# Typed columns cannot hold None or float("inf"), so they are stored as these sentinels (and
+# translated back by OPView); values from INF up cannot be stored at all
+NONE = -1
+INF = 2 ** 63 - 1
+
+
+def to_column(value):
+    if value is None:
+        return NONE
+    if value == float("inf"):
+        return INF
+    if value >= INF:
+        raise OverflowError(f"{value} does not fit in a column")
+    return value
+
+
+def from_column(value):
+    if value == NONE:
+        return None
+    if value == INF:
+        return float("inf")
+    return value
+
+
+class ColumnarIR:
+    def __init__(self):
+        self.columns = [array("q") for _ in range(14)]
+
+    def __len__(self):
+        return len(self.columns[1])
+
+    def append(self, data):
+        # data: a 14-entry list laid out like OP.getData()
+        values = [to_column(value) for value in data]
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+    def append_operation(self, line_num, opcode, operand1=NONE, operand2=NONE, operand3=NONE):
+        # Appends a freshly parsed operation (line, opcode, and SRs or constants) to the columns
+        # Parser fills; the VR, PR, and NU columns are filled in by pad() once parsing is done.
+        if operand1 >= INF or operand2 >= INF or operand3 >= INF:
+            raise OverflowError("operand does not fit in a column")
+        columns = self.columns
+        columns[0].append(line_num)
+        columns[1].append(opcode)
+        columns[2].append(operand1)
+        columns[6].append(operand2)
+        columns[10].append(operand3)
+
+    def pad(self):
+        # Extends every column that is shorter than the opcode column with NONE
+        length = len(self)
+        for column in self.columns:
+            if len(column) < length:
+                column.extend(array("q", [NONE]) * (length - len(column)))
+
+    def get(self, row, index):
+        return from_column(self.columns[index][row])
+
+    def set(self, row, index, value):
+        self.columns[index][row] = to_column(value)
+
+    def row(self, row):
+        return [from_column(column[row]) for column in self.columns]
+
+    def op(self, row):
+        return OPView(self, row)
+
+    def head(self):
+        return OPView(self, 0) if len(self) else None
+
+    def tail(self):
+        return OPView(self, len(self) - 1) if len(self) else None
+
+    @classmethod
+    def from_linked_list(cls, head: OP):
+        ir = cls()
+        curr = head
+        while curr != None:
+            ir.append(curr.getData())
+            curr = curr.getNext()
+        return ir
+
+    def to_linked_list(self):
+        head = None
+        tail = None
+        for row in range(len(self)):
+            record = OP()
+            record.data = self.row(row)
+            if tail != None:
+                tail.setNext(record)
+                record.setPrev(tail)
+            else:
+                head = record
+            tail = record
+        return head, tail
+
+
+class RowView:
+    # Live list-like view of one row; reads and writes go straight to the columns
+    __slots__ = ("ir", "columns", "row")
+
+    def __init__(self, ir: ColumnarIR, row):
+        self.ir = ir
+        self.columns = ir.columns
+        self.row = row
+
+    def __len__(self):
+        return 14
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.ir.row(self.row)[index]
+        value = self.columns[index][self.row]
+        if value == NONE:
+            return None
+        if value == INF:
+            return float("inf")
+        return value
+
+    def __setitem__(self, index, value):
+        self.columns[index][self.row] = to_column(value)
+
+    def __iter__(self):
+        return iter(self.ir.row(self.row))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(self.ir.row(self.row))
+
+
+class OPView:
+    """
+    Adapter that gives one row of a ColumnarIR the OP interface (getData, getNext, getPrev), so
+    code written against the linked list (Renamer.renaming, generate_dependency_graph, Node) can
+    run on columnar IR unchanged.
+    """
+    __slots__ = ("ir", "row", "data")
+
+    def __init__(self, ir: ColumnarIR, row):
+        self.ir = ir
+        self.row = row
+        self.data = RowView(ir, row)
+
+    def getData(self):
+        return self.data
+
+    def getNext(self):
+        return OPView(self.ir, self.row + 1) if self.row + 1 < len(self.ir) else None
+
+    def getPrev(self):
+        return OPView(self.ir, self.row - 1) if self.row > 0 else None
+
+    def __eq__(self, other):
+        return isinstance(other, OPView) and self.ir is other.ir and self.row == other.row
+
+    def __hash__(self):
+        return hash((id(self.ir), self.row))
@@ -0,0 +1,69 @@
+"""
+Dead-code elimination on a renamed block, between Renamer and DependencyGraphGenerator: removes the
+operations whose results are never read, and those only they read.
+"""
+
+import math
+from OP import OP
+
+# load, loadI, add, sub, mult, lshift, rshift: their only effect is the VR they define (stores,
+# outputs, and nops are never removed)
+SIDE_EFFECT_FREE = {0, 1, 3, 4, 5, 6, 7}
+
+# The VR slots (3, 7, 11: VRs 1, 2, and 3) each opcode reads, indexed by opcode
+USE_SLOTS = [[3], [], [3, 11], [3, 7], [3, 7], [3, 7], [3, 7], [3, 7], [], []]
+
+
+def eliminate_dead_code(head: OP):
+    """
+    head: The head of the renamed IR; dead operations are unlinked from it.
+
+    Returns (head, tail, removed): the ends of what is left (None for both if nothing is) and the
+    number of operations removed.
+    """
+    # Renamer marks dead definitions (NU 3 is infinity); removing one can leave the definitions it
+    # read dead in turn, so they go through a worklist. The rest keep their line numbers and NUs.
+    # The operation that defines each VR, and the number of reads of each VR
+    definer = {}
+    reads = {}
+    worklist = []
+    curr = head
+    tail = None
+    while curr != None:
+        data = curr.getData()
+        opcode = data[1]
+        for slot in USE_SLOTS[opcode]:
+            reads[data[slot]] = reads.get(data[slot], 0) + 1
+        if opcode in SIDE_EFFECT_FREE:
+            definer[data[11]] = curr
+            if data[13] == math.inf:
+                worklist.append(curr)
+        tail = curr
+        curr = curr.getNext()
+
+    removed = 0
+    while worklist:
+        op = worklist.pop()
+        data = op.getData()
+        # Unlink the operation
+        prev, next = op.getPrev(), op.getNext()
+        if prev != None:
+            prev.setNext(next)
+        else:
+            head = next
+        if next != None:
+            next.setPrev(prev)
+        else:
+            tail = prev
+        op.setPrev(None)
+        op.setNext(None)
+        removed += 1
+
+        for slot in USE_SLOTS[data[1]]:
+            vr = data[slot]
+            reads[vr] -= 1
+            if reads[vr] == 0 and vr in definer:
+                # The definition is dead now too
+                definer[vr].getData()[13] = math.inf
+                worklist.append(definer[vr])
+    return head, tail, removed
@@ -1,5 +1,10 @@
 from OP import OP
-from Node import Node
+from Node import Node, DATA, SERIAL, CONFLICT
+from ColumnarIR import ColumnarIR
+from CSRGraph import CSRGraph, NONE
+from MachineModel import DEFAULT_MACHINE
+from AddressAnalysis import AddressTracker, StoreIndex, PendingReads
+from array import array
 # Create an empty map, M
 # walk the block, top to bottom
 #     at each operation o:
@@ -20,74 +25,48 @@ For reference, for an operation OP:
     -Indices 4, 8, 12: PRs 1, 2, and 3
     -Indices 5, 9, 13: NUs 1, 2, and 3
 """
-def generate_dependency_graph(head: OP):
-    codesToLexemes = ["load", "loadI", "store", "add", "sub", "mult", "lshift", "rshift", "output", "nop"]
-    operand_def_indices = {
-        "load": [2], "loadI": [2], "store": [], "add": [2], "sub": [2], "mult": [2], "lshift": [2], "rshift": [2],
-        "output": [], "nop": []
-    }
-    operand_use_indices = {
-        "load": [0], "loadI": [], "store": [0, 2], "add": [0, 1], "sub": [0, 1], "mult": [0, 1], "lshift": [0, 1], "rshift": [0, 1],
-        "output": [0], "nop": []
-    }
-
-    # Maps virtual registers to the operation that defines them
-    M = {}
-    # Keeps track of important previous operations for conflict and serialization edges
-    mostRecentStore = None
-    mostRecentOutput = None
-    previousLoadsAndOutputs = []
+def iterate_IR(head: OP):
+    # Walks the linked list top to bottom
+    current_OP = head
+    while current_OP:
+        yield current_OP
+        current_OP = current_OP.getNext()
+
+
+def generate_dependency_graph(head: OP, reduce_memory_edges=True, disambiguate=False, machine=DEFAULT_MACHINE):
+    return generate_dependency_graph_stream(iterate_IR(head), reduce_memory_edges, disambiguate, machine)
+
+
+def generate_dependency_graph_stream(operations, reduce_memory_edges=True, disambiguate=False, machine=DEFAULT_MACHINE):
+    """
+    Builds the graph from any iterable of renamed OPs in block order, e.g. a generator chain of
+    Parser.streamILOC and Renamer.renaming_forward. Nodes are created as the operations arrive.
+
+    reduce_memory_edges: Give each store serial edges only to the loads and outputs after the
+    previous store (the memory frontier). Its edges to earlier ones are implied: the previous store
+    has them, and the store has a serial edge to it. Scheduler.schedule keeps track of the one load
+    a store can be issued ahead of, so the schedule is the same either way (see its memory_frontier
+    argument). False adds an edge to every earlier load and output.
 
+    disambiguate: Leave out the edges between a store and a load or output that provably access
+    different words (see AddressAnalysis): a load or output waits for the latest store that may
+    write its word, and a store has serial edges only to the loads and outputs that may read its
+    word. Stores stay in block order.
+
+    machine: The MachineModel whose latencies are stored on the edges (see Node.getEdgeLatency), so
+    the passes over the graph never look them up.
+    """
     # Start of the DOT file
     dot_lines = ["digraph G {", "node [shape=box];"]  # Set the shape of nodes
 
     nodes = []
-    current_OP = head
-    while current_OP:
+    for current_OP, edges in dependence_edges(operations, reduce_memory_edges, disambiguate, machine):
         node = Node(current_OP)
-        lexeme = codesToLexemes[current_OP.getData()[1]]
-
-        # If the OP defines a VR then add that to M to keep track of for any future OPs that need to use it (dependency)
-        for operand_index in operand_def_indices[lexeme]:
-            vr = current_OP.getData()[4 * operand_index + 3]
-            M[vr] = node
-
-        # If the OP uses any VRs make sure to add an edge to track those dependencies
-        for operand_index in operand_use_indices[lexeme]:
-            vr = current_OP.getData()[4 * operand_index + 3]
-            if vr in M:
-                node.setNewChild(M[vr], "Data", f'r{vr}')
-                M[vr].setNewParent(node)
-
-        # OP is a load, store, or output: serialization and conflict edges
-        if lexeme in ["load", "output"]:
-            if mostRecentStore and mostRecentStore not in node.getChildren():
-                node.setNewChild(mostRecentStore, "Conflict")
-                mostRecentStore.setNewParent(node)
-        if lexeme == "output":
-            if mostRecentOutput and mostRecentOutput not in node.getChildren():
-                node.setNewChild(mostRecentOutput, "Serial")
-                mostRecentOutput.setNewParent(node)
-        if lexeme == "store":
-            if mostRecentStore and mostRecentStore not in node.getChildren():
-                node.setNewChild(mostRecentStore, "Serial")
-                mostRecentStore.setNewParent(node)
-            for loadOrOutput in previousLoadsAndOutputs:
-                if loadOrOutput not in node.getChildren():
-                    node.setNewChild(loadOrOutput, "Serial")
-                    loadOrOutput.setNewParent(node)
-
-        # Update any of the important operation records
-        if lexeme == "store":
-            mostRecentStore = node
-        if lexeme == "output":
-            mostRecentOutput = node
-        if lexeme in ["load", "output"]:
-            previousLoadsAndOutputs.append(node)
-
+        for child, (kind, vr, latency) in edges.items():
+            child = nodes[child]
+            node.setNewChild(child, kind, vr, latency)
+            child.setNewParent(node)
         nodes.append(node)
-        # Move on to the next operation
-        current_OP = current_OP.getNext()
 
 
     # Add nodes and edges to dot_lines
@@ -119,6 +98,177 @@ def generate_dependency_graph(head: OP):
     
     return nodes, roots, leaves
 
+def dependence_edges(operations, reduce_memory_edges=True, disambiguate=False, machine=DEFAULT_MACHINE):
+    """
+    The edges of the graph, for every builder in this module. Walks any iterable of renamed OPs in
+    block order and yields (OP, edges) as each one arrives. edges maps each of the operation's
+    children (the block position of an earlier operation) to (kind, VR, latency): DATA, SERIAL, or
+    CONFLICT, the VR a data edge carries (NONE for the others), and the edge's latency on machine.
+    Children are in the order the graph stores them, each once.
+
+    reduce_memory_edges, disambiguate: See generate_dependency_graph_stream().
+    """
+    # Operand numbers (0, 1, 2) that each opcode defines and uses, indexed by opcode
+    operand_defs = [[2], [2], [], [2], [2], [2], [2], [2], [], []]
+    operand_uses = [[0], [], [0, 2], [0, 1], [0, 1], [0, 1], [0, 1], [0, 1], [0], []]
+    latencies = machine.latency
+    serial_latency = machine.serial_latency
+
+    # Maps virtual registers to the position of the operation that defines them
+    M = {}
+    # Keeps track of important previous operations for conflict and serialization edges
+    mostRecentStore = None
+    mostRecentOutput = None
+    previousLoadsAndOutputs = []
+    # With disambiguate: known values and addresses, and the stores and the loads and outputs (in
+    # place of previousLoadsAndOutputs) by address
+    addresses = AddressTracker() if disambiguate else None
+    stores = StoreIndex()
+    reads = PendingReads()
+
+    for node, current_OP in enumerate(operations):
+        data = current_OP.getData()
+        opcode = data[1]
+        latency = latencies[opcode]
+        if addresses is not None:
+            address = addresses.address(opcode, data[2], data[3], data[7], data[11])
+        edges = {}
+
+        # If the OP defines a VR then add that to M to keep track of for any future OPs that need to use it (dependency)
+        for operand_index in operand_defs[opcode]:
+            M[data[4 * operand_index + 3]] = node
+
+        # If the OP uses any VRs make sure to add an edge to track those dependencies (one edge
+        # when both operands read the same value)
+        for operand_index in operand_uses[opcode]:
+            vr = data[4 * operand_index + 3]
+            if vr in M and M[vr] not in edges:
+                edges[M[vr]] = (DATA, vr, latency)
+
+        # load (0), store (2), output (8): serialization and conflict edges
+        if opcode == 0 or opcode == 8:
+            store = mostRecentStore if addresses is None else stores.latest_aliasing(address)
+            if store is not None and store not in edges:
+                edges[store] = (CONFLICT, NONE, latency)
+        if opcode == 8:
+            if mostRecentOutput is not None and mostRecentOutput not in edges:
+                edges[mostRecentOutput] = (SERIAL, NONE, serial_latency)
+        if opcode == 2:
+            if mostRecentStore is not None and mostRecentStore not in edges:
+                edges[mostRecentStore] = (SERIAL, NONE, serial_latency)
+            loadsAndOutputs = previousLoadsAndOutputs if addresses is None else reads.aliasing(address, reduce_memory_edges)
+            for loadOrOutput in loadsAndOutputs:
+                if loadOrOutput not in edges:
+                    edges[loadOrOutput] = (SERIAL, NONE, serial_latency)
+
+        # Update any of the important operation records
+        if opcode == 2:
+            mostRecentStore = node
+            if addresses is not None:
+                stores.add(node, node, address)
+            if reduce_memory_edges:
+                # Later stores reach these through this one
+                previousLoadsAndOutputs = []
+        if opcode == 8:
+            mostRecentOutput = node
+        if opcode == 0 or opcode == 8:
+            if addresses is None:
+                previousLoadsAndOutputs.append(node)
+            else:
+                reads.add(node, node, address)
+
+        yield current_OP, edges
+
+def edge_counts(nodes):
+    # Number of data, serial, and conflict edges in a Node graph, indexed by edge kind
+    counts = [0, 0, 0]
+    for node in nodes:
+        for child in node.getChildren():
+            counts[node.getEdgeKind(child)] += 1
+    return counts
+
+def generate_dependency_graph_columns(IR: ColumnarIR, reduce_memory_edges=True, disambiguate=False, machine=DEFAULT_MACHINE):
+    """
+    Same graph as generate_dependency_graph(), built from the columns of a renamed ColumnarIR.
+    Each Node wraps an OPView of its row, so formatting and opcode lookups read the columns.
+    """
+    return generate_dependency_graph_stream((IR.op(row) for row in range(len(IR))), reduce_memory_edges, disambiguate, machine)
+
+def generate_dependency_graph_csr(head: OP, machine=DEFAULT_MACHINE, reduce_memory_edges=True, disambiguate=False):
+    """
+    Same graph as generate_dependency_graph(), as a CSRGraph: integer node ids (block positions)
+    and array columns for the edges in both directions, with each edge's latency on machine.
+    """
+    return generate_dependency_graph_csr_stream(iterate_IR(head), machine, reduce_memory_edges, disambiguate)
+
+
+def rename_csr(graph: CSRGraph, names):
+    # Renames the VRs of a CSRGraph's operations and data edges by names (old VR -> new VR)
+    for column in (graph.vrs1, graph.vrs2, graph.vrs3, graph.out_vrs, graph.in_vrs):
+        for position, vr in enumerate(column):
+            if vr != NONE:
+                column[position] = names[vr]
+    graph.formatted = {}
+
+
+def generate_dependency_graph_csr_stream(operations, machine=DEFAULT_MACHINE, reduce_memory_edges=True, disambiguate=False):
+    # generate_dependency_graph_csr() from any iterable of renamed OPs in block order
+    graph = CSRGraph()
+    graph.memory_frontier = reduce_memory_edges and not disambiguate
+    out_targets = graph.out_targets
+    out_kinds = graph.out_kinds
+    out_vrs = graph.out_vrs
+    out_latencies = graph.out_latencies
+
+    for current_OP, edges in dependence_edges(operations, reduce_memory_edges, disambiguate, machine):
+        data = current_OP.getData()
+        opcode = data[1]
+        graph.lines.append(data[0])
+        graph.opcodes.append(opcode)
+        graph.constants.append(data[2] if opcode == 1 or opcode == 8 else 0)
+        graph.vrs1.append(NONE if data[3] is None else data[3])
+        graph.vrs2.append(NONE if data[7] is None else data[7])
+        graph.vrs3.append(NONE if data[11] is None else data[11])
+        for child, (kind, vr, latency) in edges.items():
+            out_targets.append(child)
+            out_kinds.append(kind)
+            out_vrs.append(vr)
+            out_latencies.append(latency)
+        graph.out_offsets.append(len(out_targets))
+        graph.out_degree.append(len(edges))
+    node = len(graph)
+
+    # In edges: count each node's parents, then place every edge after its target's earlier
+    # parents (parents are visited in block order, the order the Node graph adds them in)
+    in_degree = array("I", bytes(4 * node)) if node else array("I")
+    for child in out_targets:
+        in_degree[child] += 1
+    in_offsets = graph.in_offsets
+    for degree in in_degree:
+        in_offsets.append(in_offsets[-1] + degree)
+    edges = len(out_targets)
+    in_targets = array("I", bytes(4 * edges)) if edges else array("I")
+    in_kinds = array("b", bytes(edges))
+    in_vrs = array("q", bytes(8 * edges))
+    in_latencies = array("I", bytes(4 * edges)) if edges else array("I")
+    fill = array("I", in_offsets[:-1])
+    out_offsets = graph.out_offsets
+    for parent in range(node):
+        for edge in range(out_offsets[parent], out_offsets[parent + 1]):
+            child = out_targets[edge]
+            position = fill[child]
+            fill[child] = position + 1
+            in_targets[position] = parent
+            in_kinds[position] = out_kinds[edge]
+            in_vrs[position] = out_vrs[edge]
+            in_latencies[position] = out_latencies[edge]
+    graph.in_degree = in_degree
+    graph.in_targets = in_targets
+    graph.in_kinds = in_kinds
+    graph.in_vrs = in_vrs
+    graph.in_latencies = in_latencies
+    return graph
+
 # def generate_dependency_graph(head: OP):
 #     # Map opcode to the indices in the IR that store definitions and uses
 #     codesToLexemes = ["load", "loadI", "store", "add",
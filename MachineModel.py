@@ -0,0 +1,249 @@
+"""
+Description of the target machine (a JSON or TOML file, or the equivalent dict, like LAB3_MACHINE),
+compiled once into the lookup tables Scheduler and PriorityCalculator use.
+"""
+
+import hashlib
+import json
+import os
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: JSON descriptions only
+    tomllib = None
+
+OPCODES = ["load", "loadI", "store", "add", "sub", "mult", "lshift", "rshift", "output", "nop"]
+NOP_OPCODE = 9
+
+LAB3_MACHINE = {
+    "name": "lab3",
+    "issue_width": 2,
+    "units": [
+        {"name": "f0", "opcodes": ["load", "store", "loadI", "add", "sub", "lshift", "rshift", "output"]},
+        {"name": "f1", "opcodes": ["loadI", "add", "sub", "mult", "lshift", "rshift", "output"]},
+    ],
+    "latencies": {"load": 5, "store": 5, "mult": 3},
+    "default_latency": 1,
+    "serial_latency": 1,
+    "per_cycle": {"output": 1},
+}
+
+# Largest latency a machine may have (Node packs edge latencies into this many bits)
+MAX_LATENCY = 0xFFFF
+
+# The keys of a description:
+#   -units: The functional units (issue slots), each with the opcodes it accepts; every opcode but
+#    nop (which the scheduler drops) must be accepted by at least one
+#   -issue_width: The most operations issued per cycle (default: one per unit)
+#   -latencies: Cycles from issue to retirement, per opcode; default_latency for the rest
+#   -serial_latency: The latency of a serial (memory ordering) edge
+#   -per_cycle: The most operations of an opcode issued in one cycle
+KEYS = {"name", "issue_width", "units", "latencies", "default_latency", "serial_latency", "per_cycle"}
+
+
+def opcode_index(name, where):
+    if name not in OPCODES:
+        raise ValueError(f"unknown opcode {name!r} in {where}: expected one of {', '.join(OPCODES)}")
+    return OPCODES.index(name)
+
+
+def positive_int(value, where):
+    if type(value) is not int or value < 1:
+        raise ValueError(f"{where} must be a positive integer, not {value!r}")
+    return value
+
+
+def latency_value(value, where):
+    positive_int(value, where)
+    if value > MAX_LATENCY:
+        raise ValueError(f"{where} must be at most {MAX_LATENCY}, not {value!r}")
+    return value
+
+
+class MachineModel:
+    """
+    Lookup tables compiled from a machine description (see compile_machine). Opcodes that have the
+    same unit mask (and no per-cycle limit) share a resource class, and the scheduler keeps one
+    ready queue per class:
+        -latency[opcode], unit_mask[opcode] (bit u set if unit u accepts the opcode), and
+         opcode_class[opcode]
+        -class_mask[c], class_limit[c] (the most class c operations per cycle, or None), and
+         class_units[c] (the units of class c in the order they are tried: the units that accept
+         the fewest opcodes first, so the more flexible ones stay free for later picks)
+        -addable[state] and assignment[state], for the operations picked so far in a cycle (state,
+         see pick): the classes that still fit (a bitmask) and the unit of each picked operation.
+         Both are worked out once per distinct state and then looked up, so the scheduler's cost
+         per pick does not grow with the number of units.
+    """
+
+    def __init__(self, description):
+        unknown = set(description) - KEYS
+        if unknown:
+            raise ValueError(f"unknown machine description keys: {', '.join(sorted(unknown))}")
+        self.description = description
+        self.name = description.get("name", "machine")
+
+        units = description.get("units")
+        if not isinstance(units, list) or not units:
+            raise ValueError("machine description needs a non-empty list of units")
+        self.units = []
+        accepts = []
+        for u, unit in enumerate(units):
+            name = unit.get("name", f"f{u}")
+            opcodes = {opcode_index(opcode, f"unit {name}") for opcode in unit.get("opcodes", [])}
+            if NOP_OPCODE in opcodes:
+                raise ValueError(f"unit {name} accepts nop, which never issues")
+            self.units.append(name)
+            accepts.append(opcodes)
+        self.issue_width = positive_int(description.get("issue_width", len(units)), "issue_width")
+
+        self.unit_mask = [sum(1 << u for u, opcodes in enumerate(accepts) if opcode in opcodes)
+                          for opcode in range(len(OPCODES))]
+        for opcode, mask in enumerate(self.unit_mask):
+            if not mask and opcode != NOP_OPCODE:
+                raise ValueError(f"no unit accepts {OPCODES[opcode]}")
+
+        default_latency = latency_value(description.get("default_latency", 1), "default_latency")
+        self.latency = [default_latency] * len(OPCODES)
+        for opcode, latency in description.get("latencies", {}).items():
+            self.latency[opcode_index(opcode, "latencies")] = latency_value(latency, f"latency of {opcode}")
+        self.serial_latency = latency_value(description.get("serial_latency", 1), "serial_latency")
+
+        self.per_cycle = [None] * len(OPCODES)
+        for opcode, limit in description.get("per_cycle", {}).items():
+            self.per_cycle[opcode_index(opcode, "per_cycle")] = positive_int(limit, f"per_cycle limit of {opcode}")
+
+        # Resource classes, numbered in opcode order
+        self.opcode_class = []
+        self.class_mask = []
+        self.class_limit = []
+        classes = {}
+        for opcode, mask in enumerate(self.unit_mask):
+            # Limited opcodes get a class of their own, so the limit counts only them
+            group = (mask, opcode if self.per_cycle[opcode] is not None else None)
+            if group not in classes:
+                classes[group] = len(self.class_mask)
+                self.class_mask.append(mask)
+                self.class_limit.append(self.per_cycle[opcode])
+            self.opcode_class.append(classes[group])
+        self.class_units = [sorted((u for u in range(len(units)) if mask >> u & 1), key=lambda u: (len(accepts[u]), u))
+                            for mask in self.class_mask]
+
+        # Sequences of classes picked in one cycle, encoded as ints (see pick); filled in on demand
+        self.nop_class = self.opcode_class[NOP_OPCODE] if not self.unit_mask[NOP_OPCODE] else None
+        self.addable = AddableClasses(self)
+        self.assignment = SlotAssignment(self)
+
+    def pick(self, state, c):
+        # The state after picking an operation of class c (not nop) in state; 0 is an empty cycle
+        return state * (len(self.class_mask) + 1) + c + 1
+
+    def picks(self, state):
+        # The classes picked in state, in pick order
+        base = len(self.class_mask) + 1
+        picks = []
+        while state:
+            state, c = divmod(state, base)
+            picks.append(c - 1)
+        picks.reverse()
+        return picks
+
+    def assign(self, picks):
+        """
+        Matches the picked operations (their classes, in pick order) to distinct units; returns the
+        unit of each, or None if they do not fit. Each operation takes the first free unit of its
+        class, as a greedy scheduler would; only when none is free are the earlier operations moved
+        (an augmenting path of the bipartite matching) to make room.
+        """
+        owner = [None] * len(self.units)
+        units = [None] * len(picks)
+
+        def place(i, visited):
+            for unit in self.class_units[picks[i]]:
+                if unit in visited:
+                    continue
+                visited.add(unit)
+                if owner[unit] is None or place(owner[unit], visited):
+                    owner[unit] = i
+                    units[i] = unit
+                    return True
+            return False
+
+        for i, c in enumerate(picks):
+            for unit in self.class_units[c]:
+                if owner[unit] is None:
+                    owner[unit] = i
+                    units[i] = unit
+                    break
+            else:
+                if not place(i, set()):
+                    return None
+        return tuple(units)
+
+    def fingerprint(self):
+        # Identifies the description, e.g. for schedule cache variants
+        canonical = json.dumps(self.description, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class AddableClasses(dict):
+    # state -> bitmask of the classes (bit c for class c) that can still be picked in that state
+    def __init__(self, machine):
+        super().__init__()
+        self.machine = machine
+
+    def __missing__(self, state):
+        machine = self.machine
+        picks = machine.picks(state)
+        addable = 0
+        if len(picks) < min(machine.issue_width, len(machine.units)):
+            for c, limit in enumerate(machine.class_limit):
+                if c == machine.nop_class:
+                    addable |= 1 << c
+                elif (limit is None or picks.count(c) < limit) and machine.assign(picks + [c]) is not None:
+                    addable |= 1 << c
+        self[state] = addable
+        return addable
+
+
+class SlotAssignment(dict):
+    # state -> the unit of each picked operation, in pick order
+    def __init__(self, machine):
+        super().__init__()
+        self.machine = machine
+
+    def __missing__(self, state):
+        units = self.machine.assign(self.machine.picks(state))
+        self[state] = units
+        return units
+
+
+def compile_machine(description):
+    # description: A dict laid out like LAB3_MACHINE; raises ValueError if it is not a valid machine
+    return MachineModel(description)
+
+
+def load_machine(path):
+    # Reads and compiles a .json or .toml machine description
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".toml":
+        if tomllib is None:
+            raise ValueError("TOML machine descriptions need Python 3.11 or later; use JSON")
+        with open(path, "rb") as file:
+            try:
+                description = tomllib.load(file)
+            except tomllib.TOMLDecodeError as error:
+                raise ValueError(f"{path}: {error}")
+    else:
+        with open(path, "r", encoding="utf-8") as file:
+            try:
+                description = json.load(file)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"{path}: {error}")
+    if not isinstance(description, dict):
+        raise ValueError(f"{path}: a machine description is a JSON object or TOML table")
+    return compile_machine(description)
+
+
+# The machine lab3 schedules for unless told otherwise
+DEFAULT_MACHINE = compile_machine(LAB3_MACHINE)
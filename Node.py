@@ -1,47 +1,101 @@
 from OP import OP
+from MachineModel import DEFAULT_MACHINE, MAX_LATENCY
+
+# Edge kinds, stored as small ints; EDGE_TYPES holds the names getEdge reports
+DATA = 0
+SERIAL = 1
+CONFLICT = 2
+EDGE_TYPES = ("Data", "Serial", "Conflict")
+
+# An edge packed into one int: the kind in bits 0-1, the edge's latency in the next LATENCY_BITS
+# bits, and VR + 1 above them (VR + 1 is 0 for serial and conflict edges)
+LATENCY_SHIFT = 2
+LATENCY_BITS = MAX_LATENCY.bit_length()
+LATENCY_MASK = MAX_LATENCY
+VR_SHIFT = LATENCY_SHIFT + LATENCY_BITS
+
+# Shared stand-in for the edges of a node that has none
+NO_EDGES = ()
+
+# Shared stand-in for the children and parents of a node that has none yet
+NO_NODES = frozenset()
+
 
 class Node:
+    __slots__ = ("OP", "edges", "parents", "latency", "priority", "finished", "ready", "unfinished", "unreleased", "formatted")
+
     def __init__(self, OP):
         self.OP = OP
-        self.children = set()
-        self.parents = set()
-        # Maps children ID to edgeType ("Data", "Serial", "Conflict") and potentially VR dependency ("" for serial and conflict)
-        self.edges = {}
+        # Maps each child to its edge, packed into one int (see LATENCY_SHIFT). The keys are the
+        # node's children. Created on the first edge.
+        self.edges = None
+        # Dict used as an ordered set (values are None), so parents are visited in the order their
+        # edges were added; created on the first parent
+        self.parents = None
         self.latency = 0
         self.priority = 0
         self.finished = False
         self.ready = False
+        # Scheduler bookkeeping: children that have not retired, and children that still block an
+        # early release (all but issued loads and stores this node has a serial edge to)
+        self.unfinished = 0
+        self.unreleased = 0
+        # formatOP's result, made on first use
+        self.formatted = None
 
-    def setNewChild(self, node, edgeType, edgeDependency = ""):
-        self.children.add(node)
-        self.edges[node.getOPNum()] = {"edgeType": edgeType, "edgeDependency": edgeDependency}
+    def setNewChild(self, node, edgeType, edgeDependency = "", latency = None):
+        """
+        edgeType: An edge kind (DATA, SERIAL, or CONFLICT) or its name ("Data", "Serial", "Conflict").
+        edgeDependency: The VR a data edge carries, as an int or as its name ("r5").
+        latency: The edge's latency (default: its latency on the lab3 machine, see edge_latency).
+        """
+        if isinstance(edgeType, str):
+            edgeType = EDGE_TYPES.index(edgeType)
+        if isinstance(edgeDependency, str):
+            edgeDependency = int(edgeDependency[1:]) if edgeDependency else -1
+        if latency is None:
+            latency = edge_latency(self.OP.getData()[1], edgeType)
+        if self.edges is None:
+            self.edges = {}
+        self.edges[node] = edgeType | latency << LATENCY_SHIFT | (edgeDependency + 1) << VR_SHIFT
+    def getEdgeKind(self, node):
+        return self.edges[node] & 3
+    def getEdgeVR(self, node):
+        # The VR a data edge carries (None for serial and conflict edges)
+        dependency = self.edges[node] >> VR_SHIFT
+        return dependency - 1 if dependency else None
     def getEdge(self, node):
-        return self.edges[node.getOPNum()]
-    def getEdgeLatency(self, node):
-        # codesToLexemes = ["load", "loadI", "store", "add", "sub", "mult", "lshift", "rshift", "output", "nop"]
-        edge = self.getEdge(node)
-        opcode_idx = self.OP.getData()[1]
-        if edge["edgeType"] == "Serial":
-            return 1
-        elif opcode_idx == 0 or opcode_idx == 2:
-            return 5
-        elif opcode_idx == 5:
-            return 3
-        else:
-            return 1
+        edge = self.edges[node]
+        dependency = edge >> VR_SHIFT
+        return {"edgeType": EDGE_TYPES[edge & 3], "edgeDependency": f"r{dependency - 1}" if dependency else ""}
+    def getEdgeLatency(self, node, machine=None):
+        # The latency the edge was built with, or its latency on machine
+        if machine is None:
+            return self.edges[node] >> LATENCY_SHIFT & LATENCY_MASK
+        return edge_latency(self.OP.getData()[1], self.edges[node] & 3, machine)
+    def getEdges(self):
+        # (child, packed edge) pairs, in the same order as getChildren; the passes that visit every
+        # edge read the latency from the packed edge (edge >> LATENCY_SHIFT & LATENCY_MASK)
+        return NO_EDGES if self.edges is None else self.edges.items()
 
     def getChildren(self):
-        return self.children
+        # A live view of the children (supports len, in, and iteration like a set)
+        return NO_NODES if self.edges is None else self.edges.keys()
     def setNewParent(self, node):
-        self.parents.add(node)
+        if self.parents is None:
+            self.parents = {}
+        self.parents[node] = None
     def getParents(self):
-        return self.parents
+        # A live view of the parents, in the order they were added
+        return NO_NODES if self.parents is None else self.parents.keys()
     
     def getOPNum(self):
         return self.OP.getData()[0]
 
     def formatOP(self):
-        return format_ILOC_operation(self.OP)
+        if self.formatted is None:
+            self.formatted = format_ILOC_operation(self.OP)
+        return self.formatted
     def getOPLabel(self):
         # Assuming the operation label is a unique string representation of the operation
         formatted_op = self.formatOP().replace('"', '\\"')
@@ -49,30 +103,40 @@ class Node:
     def __lt__(self, other):
         return self.priority > other.priority
 
+def edge_latency(opcode, kind, machine=DEFAULT_MACHINE):
+    # Serial edges only order the operations; the others wait out the parent's (opcode's) latency
+    if kind == SERIAL:
+        return machine.serial_latency
+    return machine.latency[opcode]
+
+
 def format_ILOC_operation(op: OP) -> str:
-    codesToLexemes = ["load", "loadI", "store", "add", "sub", "mult", "lshift", "rshift", "output", "nop"]
-    opcode_idx = op.getData()[1]
     op_data = op.getData()
+    return format_operation(op_data[1], op_data[2], op_data[3], op_data[7], op_data[11])
+
+
+def format_operation(opcode_idx, constant, vr1, vr2, vr3) -> str:
+    # constant: SR 1 (the constant of loadI and output); vr1, vr2, vr3: VRs 1, 2, and 3
     formatted_str = ""
 
     if opcode_idx == 0:
-        formatted_str = f"load r{op_data[3]} => r{op_data[11]}"
+        formatted_str = f"load r{vr1} => r{vr3}"
     elif opcode_idx == 1:
-        formatted_str = f"loadI {op_data[2]} => r{op_data[11]}"
+        formatted_str = f"loadI {constant} => r{vr3}"
     elif opcode_idx == 2:
-        formatted_str = f"store r{op_data[3]} => r{op_data[11]}"
+        formatted_str = f"store r{vr1} => r{vr3}"
     elif opcode_idx == 3:
-        formatted_str = f"add r{op_data[3]}, r{op_data[7]} => r{op_data[11]}"
+        formatted_str = f"add r{vr1}, r{vr2} => r{vr3}"
     elif opcode_idx == 4:
-        formatted_str = f"sub r{op_data[3]}, r{op_data[7]} => r{op_data[11]}"
+        formatted_str = f"sub r{vr1}, r{vr2} => r{vr3}"
     elif opcode_idx == 5:
-        formatted_str = f"mult r{op_data[3]}, r{op_data[7]} => r{op_data[11]}"
+        formatted_str = f"mult r{vr1}, r{vr2} => r{vr3}"
     elif opcode_idx == 6:
-        formatted_str = f"lshift r{op_data[3]}, r{op_data[7]} => r{op_data[11]}"
+        formatted_str = f"lshift r{vr1}, r{vr2} => r{vr3}"
     elif opcode_idx == 7:
-        formatted_str = f"rshift r{op_data[3]}, r{op_data[7]} => r{op_data[11]}"
+        formatted_str = f"rshift r{vr1}, r{vr2} => r{vr3}"
     elif opcode_idx == 8:
-        formatted_str = f"output {op_data[2]}"
+        formatted_str = f"output {constant}"
     elif opcode_idx == 9:
         formatted_str = "nop"
 
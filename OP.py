@@ -1,4 +1,6 @@
 class OP:
+    __slots__ = ("data", "prev", "next")
+
     def __init__(self):
         # Matches the 14 columns of the IR table in the assignment description
         # Line number, then opcode, then three consecutive entries for operands with (SR, VR, PR, and NU)
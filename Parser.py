@@ -1,5 +1,13 @@
 from OP import OP
-from Scanner import Scanner
+from ColumnarIR import ColumnarIR, NONE, to_column
+from Scanner import Scanner, TableScanner, ERROR
+from array import array
+import hashlib
+import mmap
+import os
+import re
+import struct
+import tempfile
 import sys
 import logging
 
@@ -206,7 +214,448 @@ def finish_nop(start, line, stream, line_num, scanner: Scanner):
         return temp
 
 
-def parseILOC(file, parse, stream, read, scanner: Scanner):
+# Token categories that must follow the first token of a valid operation (TableScanner path)
+OPERATION_PATTERNS = {
+    0: array("q", [5, 6, 5, 7, 5, 9]),  # ARITHOP REG, REG => REG
+    1: array("q", [5, 7, 5, 9]),        # MEMOP REG => REG
+    2: array("q", [10, 7, 5, 9]),       # LOADI CONSTANT => REG
+    3: array("q", [10, 9]),             # OUTPUT CONSTANT
+    4: array("q", [9]),                 # NOP
+}
+# (token position after the first token, IR index) for each operand of an operation
+OPERAND_SLOTS = {
+    0: ((0, 2), (2, 6), (4, 10)),
+    1: ((0, 2), (2, 10)),
+    2: ((0, 2), (2, 10)),
+    3: ((0, 2),),
+    4: (),
+}
+
+
+def finish_tokens(tokens, line_num):
+    # tokens is a TableScanner token array for one line: (category, value) pairs
+    pattern = OPERATION_PATTERNS.get(tokens[0])
+    categories = tokens[2::2]
+    if type(categories) is list:
+        # A line with a value too large for an int64 array (see TableScanner)
+        categories = array("q", categories)
+    if pattern is None or categories != pattern:
+        return None
+    values = tokens[3::2]
+    record = OP()
+    data = record.getData()
+    data[0] = line_num
+    data[1] = tokens[1]
+    for position, ir_index in OPERAND_SLOTS[tokens[0]]:
+        data[ir_index] = values[position]
+    return record
+
+
+# IR indices holding source registers, by opcode (loadI and output hold constants at index 2)
+REGISTER_SLOTS = [(2, 10), (10,), (2, 10), (2, 6, 10), (2, 6, 10), (2, 6, 10), (2, 6, 10), (2, 6, 10), (), ()]
+
+
+def parse_line_tokens(tokens, line_num):
+    """
+    Handles one line of TableScanner tokens the way parseILOC handles one line of input.
+
+    Returns (is_operation, node): is_operation tells whether the line counts towards num_ops, and
+    node is None for comments and invalid lines. Invalid lines are reported to stderr.
+    """
+    token = tokens[0]
+    if token == ERROR:
+        error_msg = f"ERROR {line_num}: line invalid"
+        print(error_msg, file=sys.stderr)
+        logger.error(error_msg)
+        return False, None
+    if token == 9:
+        # Comment: Not an operation
+        return False, None
+
+    node = finish_tokens(tokens, line_num)
+    if not node:
+        print("ERROR ", line_num, ": line invalid", file=sys.stderr)
+    return True, node
+
+
+def parse_table_lines(file, scanner: TableScanner):
+    # Same loop as parseILOC, but each line is tokenized in one call by the table-driven scanner
+    error = False
+    head = None
+    tail = head
+    line_num = 0
+    num_ops = 0
+    max_sr = 0
+    while True:
+        line = file.readline()
+        line_num += 1
+        if not line:
+            break
+
+        tokens = scanner.scan_line(line)
+        is_operation, node = parse_line_tokens(tokens, line_num)
+        if is_operation:
+            num_ops += 1
+        if not node:
+            error = error or tokens[0] != 9
+            continue
+
+        # Update the max SR number
+        data = node.getData()
+        for slot in REGISTER_SLOTS[data[1]]:
+            max_sr = max(max_sr, data[slot])
+        tail, head = add_node(head, tail, node)
+    return head, tail, num_ops, max_sr, line_num, error
+
+
+def streamILOC(file, scanner: Scanner):
+    """
+    Generator version of parseILOC(table=True): yields each operation's OP as soon as its line is
+    parsed, without linking the OPs into a list. Invalid lines are reported to stderr as they are
+    reached and skipped.
+    """
+    if not isinstance(scanner, TableScanner):
+        scanner = TableScanner()
+    line_num = 0
+    while True:
+        line = file.readline()
+        line_num += 1
+        if not line:
+            break
+        node = parse_line_tokens(scanner.scan_line(line), line_num)[1]
+        if node:
+            yield node
+
+
+# A well-formed operation, comment, or blank line, as the scanner would tokenize it. Lines that do
+# not match (errors, lines cut off by the end of the file) go through the TableScanner instead.
+OPERATION_LINE = re.compile(
+    rb"[ \t]*(?:"
+    rb"(add|sub|mult|lshift|rshift)[ \t]*r(\d+)[ \t]*,[ \t]*r(\d+)[ \t]*=>[ \t]*r(\d+)"
+    rb"|(load|store)[ \t]*r(\d+)[ \t]*=>[ \t]*r(\d+)"
+    rb"|loadI[ \t]*(\d+)[ \t]*=>[ \t]*r(\d+)"
+    rb"|output[ \t]*(\d+)"
+    rb"|(nop)"
+    rb")?[ \t]*(?://[^\n]*)?\n"
+)
+OPCODES = {b"load": 0, b"loadI": 1, b"store": 2, b"add": 3, b"sub": 4, b"mult": 5, b"lshift": 6, b"rshift": 7}
+
+
+def parse_buffer(buf, scanner: TableScanner, ir: ColumnarIR = None):
+    """
+    Parses a whole ILOC file held in a bytes-like buffer (bytes or mmap). Lines are located by
+    offset in the buffer, so no per-line string objects are created for well-formed lines.
+
+    ir: When given, operations are appended to this ColumnarIR instead of being linked as OPs
+    (head and tail are then None). Operations with a value the columns cannot hold are reported
+    as errors and left out.
+
+    Returns head, tail, num_ops, max_sr, line_num, error.
+    """
+    if buf.find(b"\r") >= 0:
+        # Match the newline translation of a file opened in text mode
+        buf = bytes(buf).replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+    error = False
+    head = None
+    tail = head
+    line_num = 0
+    num_ops = 0
+    max_sr = 0
+    match = OPERATION_LINE.match
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        line_num += 1
+        line = match(buf, pos)
+        if line is None:
+            tokens, pos = scanner.scan_next_line(buf, pos, end)
+            is_operation, node = parse_line_tokens(tokens, line_num)
+            if is_operation:
+                num_ops += 1
+            if not node:
+                error = error or tokens[0] != 9
+                continue
+            data = node.getData()
+            if ir is None:
+                tail, head = add_node(head, tail, node)
+            else:
+                ir.pad()
+                try:
+                    ir.append(data)
+                except OverflowError:
+                    report_too_large(line_num)
+                    error = True
+                    continue
+            # Update the max SR number
+            for slot in REGISTER_SLOTS[data[1]]:
+                max_sr = max(max_sr, data[slot])
+            continue
+
+        pos = line.end()
+        kind = line.lastindex
+        if kind is None:
+            # Comment or blank line: Not an operation
+            continue
+        num_ops += 1
+        groups = line.groups()
+        if ir is not None:
+            # Columnar IR: append the operands straight to the columns
+            try:
+                if kind == 4:
+                    r1 = int(groups[1])
+                    r2 = int(groups[2])
+                    r3 = int(groups[3])
+                    ir.append_operation(line_num, OPCODES[groups[0]], r1, r2, r3)
+                    max_sr = max(max_sr, r1, r2, r3)
+                elif kind == 7:
+                    r1 = int(groups[5])
+                    r3 = int(groups[6])
+                    ir.append_operation(line_num, OPCODES[groups[4]], r1, NONE, r3)
+                    max_sr = max(max_sr, r1, r3)
+                elif kind == 9:
+                    r3 = int(groups[8])
+                    ir.append_operation(line_num, 1, int(groups[7]), NONE, r3)
+                    max_sr = max(max_sr, r3)
+                elif kind == 10:
+                    ir.append_operation(line_num, 8, int(groups[9]))
+                else:
+                    ir.append_operation(line_num, 9)
+            except OverflowError:
+                report_too_large(line_num)
+                error = True
+            continue
+
+        node = OP()
+        data = node.getData()
+        data[0] = line_num
+        if kind == 4:
+            data[1] = OPCODES[groups[0]]
+            data[2] = r1 = int(groups[1])
+            data[6] = r2 = int(groups[2])
+            data[10] = r3 = int(groups[3])
+            max_sr = max(max_sr, r1, r2, r3)
+        elif kind == 7:
+            data[1] = OPCODES[groups[4]]
+            data[2] = r1 = int(groups[5])
+            data[10] = r3 = int(groups[6])
+            max_sr = max(max_sr, r1, r3)
+        elif kind == 9:
+            data[1] = 1
+            data[2] = int(groups[7])
+            data[10] = r3 = int(groups[8])
+            max_sr = max(max_sr, r3)
+        elif kind == 10:
+            data[1] = 8
+            data[2] = int(groups[9])
+        else:
+            data[1] = 9
+        tail, head = add_node(head, tail, node)
+    if ir is not None:
+        ir.pad()
+    return head, tail, num_ops, max_sr, line_num, error
+
+
+def report_too_large(line_num):
+    # A valid operation whose constant or register the ColumnarIR cannot hold
+    error_msg = f"ERROR {line_num}: value too large for the columnar IR"
+    print(error_msg, file=sys.stderr)
+    logger.error(error_msg)
+
+
+def parseILOC_buffer(buf, parse, read, scanner: Scanner):
+    # Same result as parseILOC (head, tail, num_ops, max_sr), parsed from a bytes-like buffer
+    if not isinstance(scanner, TableScanner):
+        scanner = TableScanner()
+    head, tail, num_ops, max_sr, line_num, error = parse_buffer(buf, scanner)
+    return finish_parse(head, tail, num_ops, max_sr, line_num, error, parse, False, read)
+
+
+def parseILOC_columnar(buf, parse, read, scanner: Scanner):
+    # Like parseILOC_buffer, but builds a ColumnarIR; returns ir, num_ops, max_sr
+    if not isinstance(scanner, TableScanner):
+        scanner = TableScanner()
+    ir = ColumnarIR()
+    _, _, num_ops, max_sr, line_num, error = parse_buffer(buf, scanner, ir)
+    finish_parse(ir.head(), ir.tail(), num_ops, max_sr, line_num, error, parse, False, read)
+    return ir, num_ops, max_sr
+
+
+def parseILOC_file(file, parse, read, scanner: Scanner, columnar=False, ir_cache=False):
+    """
+    file: an ILOC file opened in binary mode. The file is memory-mapped when possible (and read in
+    one call otherwise), then parsed by parseILOC_buffer (or parseILOC_columnar if columnar).
+
+    ir_cache: Load the parsed IR from the binary cache next to the file (file.name + ".ir") if it
+    matches the file's content, and write that cache after a clean parse otherwise.
+    """
+    parse_whole_buffer = parseILOC_columnar if columnar else parseILOC_buffer
+    if ir_cache:
+        return parseILOC_cached(file.read(), getattr(file, "name", None), parse, read, scanner, columnar)
+    try:
+        buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # Empty files and in-memory streams cannot be mapped
+        return parse_whole_buffer(file.read(), parse, read, scanner)
+    with buf:
+        return parse_whole_buffer(buf, parse, read, scanner)
+
+
+# Binary IR cache ////////////////////////////////////////////////////////////////////////////
+
+# A cache file holds the parsed IR of one input as five int64 columns (line number, opcode, and
+# operands 1, 2, and 3, i.e. indices 0, 1, 2, 6, and 10 of OP.getData(); NONE where unused) after
+# a fixed header: the magic (including the byte order of the columns), the PARSER_VERSION that
+# wrote it, the SHA-256 of the input, and the number of rows, num_ops, max_sr, and the number of
+# lines. Only inputs without invalid lines are cached, so loading never has errors to report.
+
+# Bump whenever the parsed IR for a given input can change
+PARSER_VERSION = 1
+
+IR_CACHE_SUFFIX = ".ir"
+IR_CACHE_MAGIC = b"ILOCIR" + (b"le" if sys.byteorder == "little" else b"be")
+IR_CACHE_HEADER = struct.Struct("=8sI32sqqqq")
+IR_CACHE_SLOTS = (0, 1, 2, 6, 10)
+
+
+def write_ir_cache(path, digest, columns, num_ops, max_sr, line_num):
+    # columns: five array("q") laid out as in IR_CACHE_SLOTS. Written atomically; failures are ignored
+    header = IR_CACHE_HEADER.pack(IR_CACHE_MAGIC, PARSER_VERSION, digest, len(columns[0]), num_ops, max_sr, line_num)
+    try:
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp-", suffix=IR_CACHE_SUFFIX, dir=os.path.dirname(path) or ".")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(header)
+            for column in columns:
+                column.tofile(file)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+
+def load_ir_cache(path, digest):
+    # Returns (columns, num_ops, max_sr, line_num), or None if there is no cache for this content
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) < IR_CACHE_HEADER.size:
+        return None
+    magic, version, cached_digest, rows, num_ops, max_sr, line_num = IR_CACHE_HEADER.unpack_from(data)
+    if magic != IR_CACHE_MAGIC or version != PARSER_VERSION or cached_digest != digest:
+        return None
+    values = array("q")
+    values.frombytes(memoryview(data)[IR_CACHE_HEADER.size:])
+    if len(values) != rows * len(IR_CACHE_SLOTS):
+        return None
+    columns = [values[i * rows:(i + 1) * rows] for i in range(len(IR_CACHE_SLOTS))]
+    return columns, num_ops, max_sr, line_num
+
+
+def linked_list_columns(head):
+    # The IR_CACHE_SLOTS columns of a parsed (linked list) IR
+    columns = [array("q") for _ in IR_CACHE_SLOTS]
+    curr = head
+    while curr != None:
+        data = curr.getData()
+        for column, slot in zip(columns, IR_CACHE_SLOTS):
+            # Values that cannot be loaded back as columns raise OverflowError too
+            column.append(to_column(data[slot]))
+        curr = curr.getNext()
+    return columns
+
+
+def columns_linked_list(columns):
+    # Rebuilds the OP linked list from the IR_CACHE_SLOTS columns; returns head, tail
+    head = None
+    tail = None
+    for line_num, opcode, operand1, operand2, operand3 in zip(*columns):
+        node = OP()
+        data = node.data
+        data[0] = line_num
+        data[1] = opcode
+        if operand1 != NONE:
+            data[2] = operand1
+        if operand2 != NONE:
+            data[6] = operand2
+        if operand3 != NONE:
+            data[10] = operand3
+        if tail != None:
+            tail.next = node
+            node.prev = tail
+        else:
+            head = node
+        tail = node
+    return head, tail
+
+
+def columns_ir(columns):
+    # Builds a ColumnarIR from the IR_CACHE_SLOTS columns
+    ir = ColumnarIR()
+    for column, slot in zip(columns, IR_CACHE_SLOTS):
+        ir.columns[slot] = column
+    ir.pad()
+    return ir
+
+
+def parseILOC_cached(buf, name, parse, read, scanner: Scanner, columnar=False):
+    """
+    parseILOC_buffer (or parseILOC_columnar if columnar) through the binary IR cache of the input
+    called name. Without a name, the buffer is parsed without the cache.
+    """
+    if not isinstance(scanner, TableScanner):
+        scanner = TableScanner()
+    path = None
+    if isinstance(name, str):
+        path = name + IR_CACHE_SUFFIX
+        digest = hashlib.sha256(buf).digest()
+        cached = load_ir_cache(path, digest)
+        if cached is not None:
+            columns, num_ops, max_sr, line_num = cached
+            if columnar:
+                ir = columns_ir(columns)
+                finish_parse(ir.head(), ir.tail(), num_ops, max_sr, line_num, False, parse, False, read)
+                return ir, num_ops, max_sr
+            head, tail = columns_linked_list(columns)
+            return finish_parse(head, tail, num_ops, max_sr, line_num, False, parse, False, read)
+
+    ir = ColumnarIR() if columnar else None
+    head, tail, num_ops, max_sr, line_num, error = parse_buffer(buf, scanner, ir)
+    if path is not None and not error:
+        try:
+            columns = [ir.columns[slot] for slot in IR_CACHE_SLOTS] if columnar else linked_list_columns(head)
+        except OverflowError:
+            # A value the columns cannot hold
+            columns = None
+        if columns is not None:
+            write_ir_cache(path, digest, columns, num_ops, max_sr, line_num)
+    if columnar:
+        finish_parse(ir.head(), ir.tail(), num_ops, max_sr, line_num, error, parse, False, read)
+        return ir, num_ops, max_sr
+    return finish_parse(head, tail, num_ops, max_sr, line_num, error, parse, False, read)
+
+
+def parseILOC(file, parse, stream, read, scanner: Scanner, table=False, ir_cache=False):
+    """
+    table: Tokenize each line in one call with a TableScanner instead of token by token. Stream mode
+    always uses the token-by-token loop, since it prints each token as it is scanned.
+    ir_cache: Go through the binary IR cache next to the file (see parseILOC_cached); the file is
+    then parsed from its UTF-8 encoded content by the buffer parser.
+    """
+    if ir_cache and not stream:
+        return parseILOC_cached(file.read().encode("utf-8"), getattr(file, "name", None), parse, read, scanner)
+    if table and not stream:
+        if not isinstance(scanner, TableScanner):
+            scanner = TableScanner()
+        head, tail, num_ops, max_sr, line_num, error = parse_table_lines(file, scanner)
+        return finish_parse(head, tail, num_ops, max_sr, line_num, error, parse, stream, read)
+
     error = False
     head = None
     tail = head
@@ -280,6 +729,10 @@ def parseILOC(file, parse, stream, read, scanner: Scanner):
 
             tail, head = add_node(head, tail, node)
             tail.getData()[1] = lexeme
+    return finish_parse(head, tail, num_ops, max_sr, line_num, error, parse, stream, read)
+
+
+def finish_parse(head, tail, num_ops, max_sr, line_num, error, parse, stream, read):
     if parse:
         print("FAILURE") if error else print("SUCCESS")
     elif read:
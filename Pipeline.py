@@ -0,0 +1,189 @@
+import contextlib
+import io
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import Parser
+from Scanner import TableScanner
+import Renamer
+import DeadCodeEliminator
+import DependencyGraphGenerator
+import PriorityCalculator
+import Scheduler
+from ScheduleWriter import TextWriter
+from MachineModel import DEFAULT_MACHINE
+
+# Comment line that ends a block in multi-block ILOC files
+BLOCK_MARKER = b"//end of block"
+
+# Scanner reused by every block scheduled in this process (one per worker process)
+_scanner = None
+
+
+def init_worker():
+    global _scanner
+    _scanner = TableScanner()
+
+
+def schedule_block(buf, cache=None, priority=None, compress_nops=False, machine=None, disambiguate=False, dce=False):
+    """
+    Runs the whole Scanner -> Parser -> Renamer -> DependencyGraphGenerator -> PriorityCalculator ->
+    Scheduler pipeline on one block (bytes) and returns the schedule exactly as lab3.py prints it.
+    With a ScheduleCache, a block whose renamed IR was scheduled before skips the graph and the
+    scheduler. priority selects the priority function (see PriorityCalculator.parse_priority), and
+    compress_nops prints runs of idle cycles as "nop xN" lines, machine is the MachineModel to
+    schedule for (default: the lab3 machine), and disambiguate drops the memory edges between
+    operations whose addresses are provably different (see AddressAnalysis). dce removes the
+    operations whose results are never used before the graph is built (see DeadCodeEliminator); the
+    cache key is taken afterwards, so it needs no variant of its own.
+    """
+    if _scanner is None:
+        init_worker()
+    head, tail, num_ops, max_sr = Parser.parseILOC_buffer(buf, False, False, _scanner)
+    Renamer.renaming(tail, num_ops, max_sr)
+    if dce:
+        head = DeadCodeEliminator.eliminate_dead_code(head)[0]
+    if cache is not None:
+        key = cache.key(head, cache_variant(priority, compress_nops, machine, disambiguate))
+        schedule = cache.get(key)
+        if schedule is not None:
+            return schedule
+    schedule = schedule_renamed(head, priority, compress_nops, machine, disambiguate)
+    if cache is not None:
+        cache.put(key, schedule)
+    return schedule
+
+
+def schedule_renamed(head, priority=None, compress_nops=False, machine=None, disambiguate=False):
+    # DependencyGraphGenerator -> PriorityCalculator -> Scheduler on a renamed IR; returns the schedule
+    nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head, disambiguate=disambiguate, machine=machine or DEFAULT_MACHINE)
+    nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves, priority=priority)
+    schedule = io.StringIO()
+    Scheduler.schedule(nodes, roots, leaves, writer=TextWriter(schedule, compress_nops), machine=machine, memory_frontier=not disambiguate)
+    return schedule.getvalue()
+
+
+def cache_variant(priority=None, compress_nops=False, machine=None, disambiguate=False):
+    # Schedule cache variant for the options that change the schedule text
+    variant = (priority or "") + (" | nop runs" if compress_nops else "") + (" | disambiguated" if disambiguate else "")
+    # Always the machine's fingerprint, so entries of the default machine are dropped if it changes
+    return variant + " | machine " + (machine or DEFAULT_MACHINE).fingerprint()
+
+
+def schedule_block_counted(buf, cache, priority=None, compress_nops=False, machine=None, disambiguate=False, dce=False):
+    # schedule_block() for a worker process: also returns whether the (worker's copy of the) cache hit
+    hits = cache.hits
+    schedule = schedule_block(buf, cache, priority, compress_nops, machine, disambiguate, dce)
+    return schedule, cache.hits > hits
+
+
+def split_blocks(buf, marker=BLOCK_MARKER):
+    """
+    Splits a multi-block file into blocks. A line that starts with marker (after any indentation)
+    ends the current block; text after the last marker is a block of its own unless it is blank.
+    """
+    blocks = []
+    block_start = 0
+    offset = 0
+    for line in buf.splitlines(keepends=True):
+        offset += len(line)
+        if line.lstrip(b" \t").startswith(marker):
+            blocks.append(buf[block_start:offset])
+            block_start = offset
+    if buf[block_start:].strip():
+        blocks.append(buf[block_start:])
+    return blocks
+
+
+def schedule_blocks(blocks, workers=None, cache=None, priority=None, compress_nops=False, machine=None, disambiguate=False, dce=False):
+    """
+    Schedules independent blocks on a pool of worker processes and returns the schedules in the
+    same order as blocks. workers defaults to the number of CPUs; with one worker (or one block)
+    everything runs in this process. Workers share cache's directory, and their hits and misses
+    are added to cache's counters.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(blocks) <= 1:
+        return [schedule_block(block, cache, priority, compress_nops, machine, disambiguate, dce) for block in blocks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        chunksize = max(1, len(blocks) // (workers * 4))
+        if cache is None:
+            return list(executor.map(functools.partial(schedule_block, priority=priority, compress_nops=compress_nops, machine=machine, disambiguate=disambiguate, dce=dce), blocks, chunksize=chunksize))
+        schedules = []
+        for schedule, hit in executor.map(functools.partial(schedule_block_counted, cache=cache, priority=priority, compress_nops=compress_nops, machine=machine, disambiguate=disambiguate, dce=dce), blocks, chunksize=chunksize):
+            if hit:
+                cache.hits += 1
+            else:
+                cache.misses += 1
+            schedules.append(schedule)
+        return schedules
+
+
+def schedule_file(path):
+    """
+    Schedules one single-block ILOC file. Returns (path, schedule, messages): schedule is None if
+    the file could not be scheduled, and messages holds what the pipeline reported on stderr
+    (invalid lines) or the reason it failed.
+    """
+    try:
+        with open(path, "rb") as file:
+            buf = file.read()
+    except OSError as error:
+        return path, None, f"{type(error).__name__}: {error}\n"
+    schedule, messages = try_schedule_block(buf)
+    return path, schedule, messages
+
+
+def try_schedule_block(buf):
+    """
+    schedule_block() that never raises: returns (schedule, messages), where schedule is None if the
+    block could not be scheduled and messages holds what the pipeline reported on stderr (invalid
+    lines) or the reason it failed.
+    """
+    messages = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(messages):
+            schedule = schedule_block(buf)
+    except Exception as error:
+        messages.write(f"{type(error).__name__}: {error}\n")
+        return None, messages.getvalue()
+    return schedule, messages.getvalue()
+
+
+def schedule_files(paths, workers=None):
+    """
+    Schedules many files on a pool of worker processes, yielding schedule_file() results in the
+    same order as paths as they become available. A file that fails does not stop the others.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield schedule_file(path)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        yield from executor.map(schedule_file, paths)
+
+
+def collect_inputs(paths, manifest=None):
+    """
+    Expands the batch inputs into a list of files: directories contribute the files directly
+    inside them (sorted by name), and a manifest lists one path per line (blank lines and lines
+    starting with # are skipped; relative paths are relative to the manifest).
+    """
+    inputs = []
+    if manifest is not None:
+        base = os.path.dirname(manifest)
+        with open(manifest, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    inputs.append(os.path.join(base, line))
+    for path in paths:
+        if os.path.isdir(path):
+            inputs.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                          if os.path.isfile(os.path.join(path, name)))
+        else:
+            inputs.append(path)
+    return inputs
@@ -1,58 +1,368 @@
-from Node import Node
+import re
+from functools import cached_property
+from Node import Node, DATA, LATENCY_SHIFT, LATENCY_MASK
 from OP import OP
 
-def calculatePriorities(nodes, roots, leaves):
-    # Dictionary to store the latency calculated for each node
-    latency_cache = {}
+def topological_latencies(nodes, machine=None):
+    """
+    Sets node.latency to the longest latency-weighted path from any root to the node (the edge from
+    a node to its child weighs node.getEdgeLatency(child, machine)), in a single topological-order
+    pass. Every node and edge is visited once, so this is O(V + E).
 
-    # Iterative DFS function with memoization to update latencies
-    def iterative_dfs(starting_nodes):
-        stack = []
-        for node in starting_nodes:
-            stack.append((node, 0))  # Tuple of node and its current latency
+    machine: Weigh the edges with this MachineModel instead of the latencies the graph was built
+    with (see DependencyGraphGenerator.generate_dependency_graph).
+
+    Returns the nodes in topological order (every node before its children).
+    """
+    # Parents not yet visited, per node
+    waiting = {}
+    order = []
+    for node in nodes:
+        node.latency = 0
+        waiting[node] = len(node.getParents())
+        if waiting[node] == 0:
+            order.append(node)
+
+    # order grows while it is walked: a child is appended once its last parent has been visited
+    for node in order:
+        latency = node.latency
+        for child, edge in node.getEdges():
+            if machine is None:
+                child_latency = latency + (edge >> LATENCY_SHIFT & LATENCY_MASK)
+            else:
+                child_latency = latency + node.getEdgeLatency(child, machine)
+            if child_latency > child.latency:
+                child.latency = child_latency
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                order.append(child)
+    return order
+
+
+def exact_descendants(nodes, order=None, chunk_size=None):
+    """
+    Returns a dict mapping each node to its number of distinct descendants.
+
+    Each node's descendant set is a Python int used as a bitset (the last node of the topological
+    order is bit 0, so sets near the leaves stay short), built in reverse topological order as the union of its children's
+    sets and the children themselves. A node's set is dropped once all of its parents have used it.
+
+    order: The nodes in topological order (as returned by topological_latencies), if known.
+    chunk_size: Count descendants among at most chunk_size nodes per pass, so no set holds more
+    than chunk_size bits; memory stays bounded on very large blocks at the cost of one O(V + E)
+    pass per chunk. None counts everything in one pass.
+    """
+    if order is None:
+        order = topological_order(nodes)
+    position = {node: i for i, node in enumerate(order)}
+    children = [[position[child] for child in node.getChildren()] for node in order]
+    parent_counts = [len(node.getParents()) for node in order]
+    counts = descendant_counts(children, parent_counts, chunk_size)
+    return {node: counts[i] for i, node in enumerate(order)}
+
+
+def descendant_counts(children, parent_counts, chunk_size=None):
+    """
+    exact_descendants() on a graph given by position in topological order: children[i] lists the
+    positions of node i's children and parent_counts[i] its number of parents. Returns the counts
+    as a list in the same order.
+    """
+    counts = [0] * len(children)
+    if chunk_size is None or chunk_size <= 0:
+        chunk_size = max(1, len(children))
+
+    for low in range(0, len(children), chunk_size):
+        high = low + chunk_size
+        # Descendants come after their ancestors in the order, so nodes at or after high have none
+        # in this chunk
+        bits = [0] * min(high, len(children))
+        waiting = parent_counts[:]
+        for i in range(len(bits) - 1, -1, -1):
+            reach = 0
+            for child in children[i]:
+                if child < high:
+                    reach |= bits[child]
+                    if child >= low:
+                        reach |= 1 << (high - 1 - child)
+                    waiting[child] -= 1
+                    if waiting[child] == 0:
+                        bits[child] = 0
+            bits[i] = reach
+            counts[i] += reach.bit_count()
+    return counts
+
+
+def topological_order(nodes):
+    # Every node before its children, without touching node.latency
+    waiting = {node: len(node.getParents()) for node in nodes}
+    order = [node for node in nodes if waiting[node] == 0]
+    for node in order:
+        for child in node.getChildren():
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                order.append(child)
+    return order
+
+
+class PriorityGraph:
+    """
+    The dependence graph as lists indexed by node position in topological order, which is what
+    the priority functions read. Properties other than the structure are computed on first use.
+    """
+
+    def __init__(self, order, chunk_size=None, machine=None):
+        # order: The nodes in topological order, with latencies set (see topological_latencies);
+        # machine: as for topological_latencies
+        self.nodes = order
+        self.chunk_size = chunk_size
+        index = {node: i for i, node in enumerate(order)}
+        self.children = [[index[child] for child in node.getChildren()] for node in order]
+        # Latency of the edge to each child, in the same order as children
+        if machine is None:
+            self.edge_latencies = [[edge >> LATENCY_SHIFT & LATENCY_MASK for _, edge in node.getEdges()] for node in order]
+        else:
+            self.edge_latencies = [[node.getEdgeLatency(child, machine) for child in node.getChildren()] for node in order]
+        self.parents = [[index[parent] for parent in node.getParents()] for node in order]
+        self.latency = [node.latency for node in order]
+        self.opcodes = [node.OP.getData()[1] for node in order]
+
+    @classmethod
+    def from_csr(cls, graph, latency, chunk_size=None):
+        """
+        The same lists for a CSRGraph. Children always come before their parents in a block, so
+        the reverse of block order is a topological order: position i is node len(graph) - 1 - i.
+        latency: node.latency for each node id (see csr_latencies).
+        """
+        self = cls.__new__(cls)
+        last = len(graph) - 1
+        self.nodes = list(range(last, -1, -1))
+        self.chunk_size = chunk_size
+        out_offsets, out_targets = graph.out_offsets, graph.out_targets
+        in_offsets, in_targets = graph.in_offsets, graph.in_targets
+        self.children = [[last - child for child in out_targets[out_offsets[node]:out_offsets[node + 1]]] for node in self.nodes]
+        self.edge_latencies = [list(graph.out_latencies[out_offsets[node]:out_offsets[node + 1]]) for node in self.nodes]
+        self.parents = [[last - parent for parent in in_targets[in_offsets[node]:in_offsets[node + 1]]] for node in self.nodes]
+        self.latency = [latency[node] for node in self.nodes]
+        self.opcodes = [graph.opcodes[node] for node in self.nodes]
+        self.data_reads = [[(last - graph.out_targets[edge], graph.out_vrs[edge])
+                            for edge in range(out_offsets[node], out_offsets[node + 1]) if graph.out_kinds[edge] == DATA]
+                           for node in self.nodes]
+        return self
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @cached_property
+    def data_reads(self):
+        # (child, VR) for each data edge of each node, in the same order as children
+        nodes = self.nodes
+        return [[(child, node.getEdgeVR(nodes[child])) for child in children if node.getEdgeKind(nodes[child]) == DATA]
+                for node, children in zip(nodes, self.children)]
+
+    @cached_property
+    def height(self):
+        # Longest latency-weighted path from each node down to a leaf
+        height = [0] * len(self.nodes)
+        for i in range(len(self.nodes) - 1, -1, -1):
+            for child, latency in zip(self.children[i], self.edge_latencies[i]):
+                if latency + height[child] > height[i]:
+                    height[i] = latency + height[child]
+        return height
+
+    @cached_property
+    def descendants(self):
+        return descendant_counts(self.children, [len(parents) for parents in self.parents], self.chunk_size)
+
+
+# Priority functions by name: each takes a PriorityGraph and returns one value per node (in the
+# graph's order); a larger value is scheduled first
+PRIORITY_FUNCTIONS = {}
+
+
+def register_priority(name):
+    def register(function):
+        PRIORITY_FUNCTIONS[name] = function
+        return function
+    return register
 
-        while stack:
-            node, current_latency = stack.pop()
-            if node in latency_cache and current_latency <= latency_cache[node]:
-                continue
-            latency_cache[node] = current_latency
-            node.latency = current_latency
 
-            for child in node.getChildren():
-                edge_latency = node.getEdgeLatency(child)
-                stack.append((child, node.latency + edge_latency))
+@register_priority("critical_path")
+def critical_path(graph):
+    # node.latency: the longest latency-weighted path from a root (the end of the block) to the node
+    return graph.latency
 
-    iterative_dfs(roots)
 
-    # Dictionary to store the number of descendants calculated for each node
-    descendants_cache = {}
+@register_priority("descendants")
+def descendants(graph):
+    # Number of distinct descendants (see exact_descendants)
+    return graph.descendants
 
-    # Iterative function with memoization to count descendants
-    def iterative_count_descendants(nodes):
+
+@register_priority("slack")
+def slack(graph):
+    # Negated slack: 0 on the critical path, more negative the more the node can be delayed
+    length = max(map(sum, zip(graph.latency, graph.height)), default=0)
+    return [latency + height - length for latency, height in zip(graph.latency, graph.height)]
+
+
+@register_priority("successor_latency")
+def successor_latency(graph):
+    # Sum of the latencies of the edges from the operations that wait on this one
+    latencies = [0] * len(graph)
+    for i in range(len(graph)):
+        for child, latency in zip(graph.children[i], graph.edge_latencies[i]):
+            latencies[child] += latency
+    return latencies
+
+
+@register_priority("fan_out")
+def fan_out(graph):
+    # Number of operations that wait on this one
+    return [len(parents) for parents in graph.parents]
+
+
+# load, loadI, add, sub, mult, lshift, rshift
+DEFINING_OPCODES = {0, 1, 3, 4, 5, 6, 7}
+
+
+@register_priority("register_pressure")
+def register_pressure(graph):
+    """
+    Estimated change in live registers when the node is scheduled, negated so that operations that
+    free registers come first: each VR the node reads counts 1 / (number of operations that read
+    it), and a definition counts -1.
+    """
+    # (defining node, VR) -> number of operations that read it
+    readers = {}
+    for values in graph.data_reads:
+        for value in values:
+            readers[value] = readers.get(value, 0) + 1
+    return [sum(1 / readers[value] for value in values) - (opcode in DEFINING_OPCODES)
+            for values, opcode in zip(graph.data_reads, graph.opcodes)]
+
+
+def parse_priority(spec):
+    """
+    spec: A registered priority function's name, or a weighted sum of them such as
+    "10*critical_path + descendants" or "critical_path - 0.5*fan_out".
+
+    Returns a list of (weight, function) pairs.
+    """
+    terms = []
+    # Split before each sign, except the sign of an exponent ("1e-3")
+    for term in re.split(r"(?<![0-9.][eE])(?=[+-])", spec):
+        term = term.strip()
+        weight = 1
+        if term.startswith("+"):
+            term = term[1:].strip()
+        elif term.startswith("-"):
+            weight = -1
+            term = term[1:].strip()
+        if not term:
+            continue
+        if "*" in term:
+            left, right = (part.strip() for part in term.split("*", 1))
+            number, name = (left, right) if right in PRIORITY_FUNCTIONS else (right, left)
+            try:
+                weight *= int(number)
+            except ValueError:
+                try:
+                    weight *= float(number)
+                except ValueError:
+                    raise ValueError(f"invalid priority term {term!r}: expected WEIGHT*NAME") from None
+        else:
+            name = term
+        if name not in PRIORITY_FUNCTIONS:
+            raise ValueError(f"unknown priority function {name!r}: expected one of {', '.join(sorted(PRIORITY_FUNCTIONS))}")
+        terms.append((weight, PRIORITY_FUNCTIONS[name]))
+    if not terms:
+        raise ValueError("empty priority function")
+    return terms
+
+
+def priority_values(spec, graph):
+    # Evaluates a priority spec (see parse_priority) over the whole graph; one value per node
+    values = [0] * len(graph)
+    for weight, function in parse_priority(spec):
+        term = function(graph)
+        if weight == 1:
+            values = [value + t for value, t in zip(values, term)]
+        else:
+            values = [value + weight * t for value, t in zip(values, term)]
+    return values
+
+
+def calculatePriorities(nodes, roots, leaves, descendants=None, chunk_size=None, priority=None, machine=None):
+    """
+    priority = 10 * latency, the original formula (its descendants term summed the children's
+    terms without counting the children, so it was always 0 and is left out).
+    descendants: "exact" adds the number of distinct descendants (see exact_descendants;
+    chunk_size bounds its memory).
+    priority: A priority spec (see parse_priority) that replaces this formula, e.g. "slack" or
+    "10*critical_path + descendants".
+    machine: Weigh the edges with this MachineModel instead of the latencies the graph was built
+    with; build the graph for the machine instead (generate_dependency_graph's machine), which is
+    faster.
+    """
+    order = topological_latencies(nodes, machine)
+
+    if priority is not None:
+        graph = PriorityGraph(order, chunk_size, machine)
+        for node, value in zip(order, priority_values(priority, graph)):
+            node.priority = value
+        return sort_by_priority(nodes, roots, leaves)
+
+    if descendants == "exact":
+        descendants_cache = exact_descendants(nodes, order, chunk_size)
         for node in nodes:
-            stack = [node]
-            while stack:
-                current = stack[-1]
-                if current in descendants_cache:
-                    stack.pop()
-                    continue
-
-                children = current.getChildren()
-                if not children or all(child in descendants_cache for child in children):
-                    # Count this node and all its descendants
-                    count = 1  # Count the node itself
-                    for child in children:
-                        count += descendants_cache[child]
-                    descendants_cache[current] = count - 1  # Subtract 1 to exclude the node itself
-                    stack.pop()
-                else:
-                    stack.extend(children)
-
-    iterative_count_descendants(nodes)
+            node.priority = 10 * node.latency + descendants_cache[node]
+        return sort_by_priority(nodes, roots, leaves)
+    if descendants is not None:
+        raise ValueError(f"unknown descendants term {descendants!r}: expected 'exact'")
 
     for node in nodes:
-        node.priority = 10 * node.latency + descendants_cache[node]
+        node.priority = 10 * node.latency
+
+    return sort_by_priority(nodes, roots, leaves)
+
+
+def csr_latencies(graph):
+    """
+    node.latency for each node of a CSRGraph, by id: the longest latency-weighted path from a root
+    to the node. Children come before their parents in a block, so one pass from the last node to
+    the first sees every node after all of its parents.
+    """
+    latency = [0] * len(graph)
+    out_offsets, out_targets, out_latencies = graph.out_offsets, graph.out_targets, graph.out_latencies
+    for node in range(len(graph) - 1, -1, -1):
+        node_latency = latency[node]
+        for edge in range(out_offsets[node], out_offsets[node + 1]):
+            child = out_targets[edge]
+            if node_latency + out_latencies[edge] > latency[child]:
+                latency[child] = node_latency + out_latencies[edge]
+    return latency
+
+
+def calculate_csr_priorities(graph, descendants=None, chunk_size=None, priority=None):
+    """
+    calculatePriorities() for a CSRGraph (whose edge latencies already come from its machine).
+    Returns the priority of each node, by id, instead of setting node.priority.
+    """
+    latency = csr_latencies(graph)
+    if priority is not None:
+        values = priority_values(priority, PriorityGraph.from_csr(graph, latency, chunk_size))
+        # Position i of the PriorityGraph is node len(graph) - 1 - i
+        values.reverse()
+        return values
+    if descendants == "exact":
+        counts = PriorityGraph.from_csr(graph, latency, chunk_size).descendants[::-1]
+        return [10 * node_latency + count for node_latency, count in zip(latency, counts)]
+    if descendants is not None:
+        raise ValueError(f"unknown descendants term {descendants!r}: expected 'exact'")
+    return [10 * node_latency for node_latency in latency]
+
 
+def sort_by_priority(nodes, roots, leaves):
     sorted_nodes = sorted(nodes, key=lambda x: x.priority, reverse=True)
     sorted_roots = sorted(roots, key=lambda x: x.priority, reverse=True)
     sorted_leaves = sorted(leaves, key=lambda x: x.priority, reverse=True)
@@ -1,4 +1,5 @@
 from OP import OP
+from ColumnarIR import ColumnarIR, INF
 
 def renaming(IR: OP, num_ops, max_sr):
     """
@@ -85,3 +86,101 @@ def renaming(IR: OP, num_ops, max_sr):
     # return maxVR, maxLive
 
 
+
+def renaming_columns(IR: ColumnarIR, num_ops, max_sr):
+    """
+    Same renaming as renaming(), run directly on the columns of a ColumnarIR.
+
+    IR: The columnar intermediate representation (operations in block order).
+    num_ops: Number of operations.
+    max_sr: The greatest value of a register in the ILOC block.
+    """
+    VRName = 0
+    SRToVR = [-1] * (max_sr + 1)
+    LU = [INF] * (max_sr + 1)
+
+    columns = IR.columns
+    opcodes = columns[1]
+    # Operand numbers (0, 1, 2) that each opcode defines and uses, indexed by opcode
+    operand_defs = [[2], [2], [], [2], [2], [2], [2], [2], [], []]
+    operand_uses = [[0], [], [0, 2], [0, 1], [0, 1], [0, 1], [0, 1], [0, 1], [], []]
+
+    index = num_ops - 1
+    # Traverse the block bottom-to-top
+    for row in range(len(IR) - 1, -1, -1):
+        opcode = opcodes[row]
+        for operand_index in operand_defs[opcode]:
+            sr = columns[4 * operand_index + 2][row]
+            # Unused DEF
+            if SRToVR[sr] == -1:
+                SRToVR[sr] = VRName
+                VRName += 1
+            columns[4 * operand_index + 3][row] = SRToVR[sr]
+            columns[4 * operand_index + 5][row] = LU[sr]
+            # Kill the operand
+            SRToVR[sr] = -1
+            LU[sr] = INF
+        for operand_index in operand_uses[opcode]:
+            sr = columns[4 * operand_index + 2][row]
+            # Last USE
+            if SRToVR[sr] == -1:
+                SRToVR[sr] = VRName
+                VRName += 1
+            columns[4 * operand_index + 3][row] = SRToVR[sr]
+            columns[4 * operand_index + 5][row] = LU[sr]
+            LU[sr] = index
+        # Move up a line
+        index -= 1
+
+
+def renaming_forward(operations):
+    """
+    Streaming renamer: consumes OPs in block order and yields each one as soon as its VRs are set.
+
+    Unlike renaming(), which walks bottom-to-top, this pass only looks at operations it has
+    already seen, so it keeps one SR -> VR map and nothing else. Every definition gets a fresh VR
+    and every use reads the VR of the most recent definition (or a fresh VR for a value that is
+    live on entry to the block). NUs need to see later operations, so they are left as None.
+    The VR numbers differ from renaming(), but the dependences they describe are the same;
+    renaming_names() maps them to renaming()'s once the whole block has been seen.
+    """
+    operand_defs = [[2], [2], [], [2], [2], [2], [2], [2], [], []]
+    operand_uses = [[0], [], [0, 2], [0, 1], [0, 1], [0, 1], [0, 1], [0, 1], [], []]
+    VRName = 0
+    SRToVR = {}
+    for OP in operations:
+        data = OP.getData()
+        opcode = data[1]
+        # Uses read the current definition before this operation redefines anything
+        for operand_index in operand_uses[opcode]:
+            sr = data[4 * operand_index + 2]
+            if sr not in SRToVR:
+                SRToVR[sr] = VRName
+                VRName += 1
+            data[4 * operand_index + 3] = SRToVR[sr]
+        for operand_index in operand_defs[opcode]:
+            sr = data[4 * operand_index + 2]
+            SRToVR[sr] = VRName
+            data[4 * operand_index + 3] = VRName
+            VRName += 1
+        yield OP
+
+
+def renaming_names(operands):
+    """
+    operands: (opcode, VR 1, VR 2, VR 3) of each operation renaming_forward() renamed, in
+    bottom-to-top order.
+
+    Returns a dict mapping each VR renaming_forward() gave out to the VR renaming() gives the same
+    value. renaming() numbers values in the order it first meets them walking bottom-to-top, the
+    definition of an operation before its uses, so this walk meets them in the same order.
+    """
+    # Operand numbers (0, 1, 2) in the order renaming() visits them, indexed by opcode
+    operand_visits = [[2, 0], [2], [0, 2], [2, 0, 1], [2, 0, 1], [2, 0, 1], [2, 0, 1], [2, 0, 1], [], []]
+    names = {}
+    for operation in operands:
+        for operand_index in operand_visits[operation[0]]:
+            vr = operation[operand_index + 1]
+            if vr not in names:
+                names[vr] = len(names)
+    return names
@@ -1,3 +1,6 @@
+from array import array
+
+
 class Scanner:
     def scan_constant(self, start, line):
         idx = start
@@ -209,4 +212,308 @@ class Scanner:
             return 10, None, None
 
 
+# Token categories (see Parser.categories)
+ARITHOP, MEMOP, LOADI, OUTPUT, NOP, REG, COMMA, INTO, EOF, EOL, CONSTANT = range(11)
+# Category emitted by the bulk scanning modes for an invalid lexeme
+ERROR = -1
+# Internal category for the one lexeme ("=" not followed by ">") where Scanner returns a bare None
+_BARE_NONE = -2
+
+# Every fixed spelling the scanner recognizes: (spelling, category, lexeme, stream label)
+_KEYWORDS = [
+    (b"sub", ARITHOP, 4, "ARITHOP, \"sub\""),
+    (b"store", MEMOP, 2, "MEMOP, \"store\""),
+    (b"load", MEMOP, 0, "MEMOP, \"load\""),
+    (b"loadI", LOADI, 1, "LOADI, \"loadI\""),
+    (b"lshift", ARITHOP, 6, "ARITHOP, \"lshift\""),
+    (b"rshift", ARITHOP, 7, "ARITHOP, \"rshift\""),
+    (b"mult", ARITHOP, 5, "ARITHOP, \"mult\""),
+    (b"add", ARITHOP, 3, "ARITHOP, \"add\""),
+    (b"nop", NOP, 9, "NOP, \"nop\""),
+    (b"output", OUTPUT, 8, "OUTPUT, \"output\""),
+    (b"=>", INTO, 0, "INTO, \"=>\""),
+    (b",", COMMA, 0, None),
+    (b"\n", EOL, 0, "NEWLINE, \"\\n\""),
+    (b"//", EOL, 0, "NEWLINE, \"\\n\""),
+]
+
+# Actions taken on the first (non-whitespace) byte of a lexeme
+_SKIP, _KEYWORD, _CONSTANT, _REGISTER, _INVALID = range(5)
+
+
+def _build_tables():
+    # Builds the keyword DFA as a trie over bytes. State 0 is the start state and every other state
+    # is a proper prefix (or full spelling) of a keyword. Transitions are stored flat, indexed by
+    # (state << 8) | byte, with -1 for "no transition".
+    transitions = [-1] * 256
+    accept = [-1]
+    prefixes = {b"": 0}
+    for keyword_idx, (spelling, _, _, _) in enumerate(_KEYWORDS):
+        state = 0
+        for length in range(1, len(spelling) + 1):
+            prefix = spelling[:length]
+            if prefix not in prefixes:
+                prefixes[prefix] = len(accept)
+                accept.append(-1)
+                transitions.extend([-1] * 256)
+                transitions[(state << 8) | spelling[length - 1]] = prefixes[prefix]
+            state = prefixes[prefix]
+        accept[state] = keyword_idx
+
+    # Accepting states with no way to continue return as soon as they are reached; "load" is the
+    # only accepting state that needs one byte of lookahead (to tell it apart from "loadI")
+    final = [-1] * len(accept)
+    default = [-1] * len(accept)
+    for state, keyword_idx in enumerate(accept):
+        if keyword_idx < 0:
+            continue
+        if any(t >= 0 for t in transitions[state << 8:(state + 1) << 8]):
+            default[state] = keyword_idx
+        else:
+            final[state] = keyword_idx
+
+    # A byte that does not continue a keyword is an error, except after a lone "="
+    miss = [ERROR] * len(accept)
+    miss[prefixes[b"="]] = _BARE_NONE
+
+    start = [_INVALID] * 256
+    for byte in range(256):
+        if transitions[byte] >= 0:
+            start[byte] = _KEYWORD
+    start[ord(" ")] = _SKIP
+    start[ord("\t")] = _SKIP
+    for byte in range(ord("0"), ord("9") + 1):
+        start[byte] = _CONSTANT
+    start[ord("r")] = _REGISTER
+
+    is_digit = [False] * 256
+    for byte in range(ord("0"), ord("9") + 1):
+        is_digit[byte] = True
+
+    return transitions, final, default, miss, start, is_digit, prefixes[b"r"]
+
+
+_TRANSITIONS, _FINAL, _DEFAULT, _MISS, _START, _IS_DIGIT, _R_STATE = _build_tables()
+_KEYWORD_TOKENS = [(category, lexeme) for _, category, lexeme, _ in _KEYWORDS]
+_STREAM_LABELS = {(category, lexeme): label for _, category, lexeme, label in _KEYWORDS}
+
+
+class TableScanner(Scanner):
+    """
+    Table-driven scanner over bytes.
+
+    next_token() is a drop-in replacement for Scanner.next_token() (same tuples, same stream output,
+    same error results). scan_line() and scan_buffer() tokenize a whole line or buffer in one call
+    and return a flat array of (category, value) pairs, where value is the lexeme for operations,
+    the register number for REG, and the constant for CONSTANT. Each line's tokens end with EOL,
+    ERROR, or EOF (the buffer ran out before a newline). A value too large for the int64 array
+    turns the result into a list of the same pairs, so constants of any size scan as they do in
+    Scanner.
+    """
+
+    def _token(self, buf, idx, end):
+        # Scan a single lexeme starting at idx; returns (category, value, index after the lexeme)
+        while True:
+            if idx >= end:
+                return EOF, 0, idx
+            byte = buf[idx]
+            action = _START[byte]
+            if action != _SKIP:
+                break
+            idx += 1
+
+        if action == _CONSTANT:
+            start = idx
+            idx += 1
+            while idx < end and _IS_DIGIT[buf[idx]]:
+                idx += 1
+            return CONSTANT, int(buf[start:idx]), idx
+        if action == _REGISTER:
+            idx += 1
+            if idx >= end:
+                return EOF, 0, idx
+            if _IS_DIGIT[buf[idx]]:
+                start = idx
+                idx += 1
+                while idx < end and _IS_DIGIT[buf[idx]]:
+                    idx += 1
+                return REG, int(buf[start:idx]), idx
+            state = _R_STATE
+        elif action == _KEYWORD:
+            state = _TRANSITIONS[byte]
+            idx += 1
+        else:
+            return ERROR, 0, idx
+
+        # Walk the keyword DFA
+        while True:
+            keyword_idx = _FINAL[state]
+            if keyword_idx >= 0:
+                break
+            if idx >= end:
+                return EOF, 0, idx
+            next_state = _TRANSITIONS[(state << 8) | buf[idx]]
+            if next_state < 0:
+                keyword_idx = _DEFAULT[state]
+                if keyword_idx < 0:
+                    return _MISS[state], 0, idx
+                break
+            state = next_state
+            idx += 1
+        category, lexeme = _KEYWORD_TOKENS[keyword_idx]
+        return category, lexeme, idx
+
+    def _scan(self, buf, idx, end, out):
+        # Append the tokens for the line starting at idx to out; returns the index of the next line.
+        # This is _token() inlined into a loop, since it runs once per lexeme of the input.
+        append = out.append
+        start_action = _START
+        transitions = _TRANSITIONS
+        final = _FINAL
+        is_digit = _IS_DIGIT
+        keyword_tokens = _KEYWORD_TOKENS
+        while True:
+            if idx >= end:
+                append(EOF)
+                append(0)
+                return end
+            byte = buf[idx]
+            action = start_action[byte]
+            if action == _SKIP:
+                idx += 1
+                continue
+
+            if action == _KEYWORD:
+                state = transitions[byte]
+                idx += 1
+            elif action == _CONSTANT:
+                start = idx
+                idx += 1
+                while idx < end and is_digit[buf[idx]]:
+                    idx += 1
+                append(CONSTANT)
+                append(int(buf[start:idx]))
+                continue
+            elif action == _REGISTER and idx + 1 < end and is_digit[buf[idx + 1]]:
+                start = idx + 1
+                idx += 2
+                while idx < end and is_digit[buf[idx]]:
+                    idx += 1
+                append(REG)
+                append(int(buf[start:idx]))
+                continue
+            else:
+                # Anything unusual (errors, "rshift", end of input) goes through the general scanner
+                category, value, idx = self._token(buf, idx, end)
+                if category == EOL or category < 0 or category == EOF:
+                    idx = self._end_line(buf, idx, end, category, append)
+                    if idx < 0:
+                        return end
+                    return idx
+                append(category)
+                append(value)
+                continue
+
+            # Walk the keyword DFA
+            while True:
+                keyword_idx = final[state]
+                if keyword_idx >= 0:
+                    break
+                if idx >= end:
+                    keyword_idx = -1
+                    break
+                next_state = transitions[(state << 8) | buf[idx]]
+                if next_state < 0:
+                    keyword_idx = _DEFAULT[state]
+                    break
+                state = next_state
+                idx += 1
+            if keyword_idx < 0:
+                category = EOF if idx >= end else ERROR
+            else:
+                category, value = keyword_tokens[keyword_idx]
+                if category != EOL:
+                    append(category)
+                    append(value)
+                    continue
+            idx = self._end_line(buf, idx, end, category, append)
+            if idx < 0:
+                return end
+            return idx
+
+    def _end_line(self, buf, idx, end, category, append):
+        # Record the token that ends a line; returns the index of the next line (-1 at end of input)
+        if category == EOF:
+            append(EOF)
+            append(0)
+            return -1
+        if category == EOL:
+            append(EOL)
+            append(0)
+            if buf[idx - 1] == 10:
+                return idx
+        else:
+            append(ERROR)
+            append(0)
+        # Skip the rest of the line (comment or invalid lexeme)
+        newline = buf.find(b"\n", idx, end)
+        return -1 if newline < 0 else newline + 1
+
+    def _scan_into(self, buf, idx, end, out):
+        # _scan() the line starting at idx into out; returns (out, index of the next line). If a
+        # value does not fit in the array, the line is scanned again into a list copy of out.
+        mark = len(out)
+        try:
+            return out, self._scan(buf, idx, end, out)
+        except OverflowError:
+            out = out[:mark].tolist()
+            return out, self._scan(buf, idx, end, out)
+
+    def scan_line(self, line, start=0):
+        # Tokenize one line (str or bytes) in a single call
+        buf = line.encode("latin-1", "replace") if isinstance(line, str) else line
+        return self._scan_into(buf, start, len(buf), array("q"))[0]
+
+    def scan_next_line(self, buf, start, end):
+        # Tokenize the line of buf starting at start; returns (tokens, index of the next line)
+        return self._scan_into(buf, start, end, array("q"))
+
+    def scan_buffer(self, buf, start=0, end=None):
+        # Tokenize every line of a bytes-like buffer in a single call
+        if end is None:
+            end = len(buf)
+        out = array("q")
+        idx = start
+        while idx < end:
+            out, idx = self._scan_into(buf, idx, end, out)
+        return out
+
+    def next_token(self, start_idx, line, stream, line_num):
+        buf = line.encode("latin-1", "replace") if isinstance(line, str) else line
+        category, value, idx = self._token(buf, int(start_idx), len(buf))
+        if category == ERROR:
+            return None, None, None
+        if category == _BARE_NONE:
+            return None
+        if category == EOF:
+            if stream:
+                print(str(line_num) + ": < NEWLINE, \"\\n\" >")
+            return 10, None, None
+        if category == EOL:
+            if stream:
+                print(str(line_num) + ": < NEWLINE, \"\\n\" >")
+            return 9, None, None
+        if category == REG:
+            if stream:
+                print(str(line_num) + ": < REG, \"r" + str(value) + "\" >")
+            return 5, (value, idx), None
+        if category == CONSTANT:
+            if stream:
+                print(str(line_num) + ": < CONSTANT, \"", value, "\" >")
+            return 10, (value, idx), value
+        if stream and category != COMMA:
+            print(str(line_num) + ": < " + _STREAM_LABELS[category, value] + " >")
+        if category == INTO or category == COMMA:
+            return category, idx, None
+        return category, idx, value
 
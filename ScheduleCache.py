@@ -0,0 +1,124 @@
+"""
+On-disk schedule cache keyed by the content of the renamed IR: blocks that rename to the same IR
+share one entry, a <key>.sched file in the cache directory.
+"""
+
+import hashlib
+import os
+import tempfile
+from OP import OP
+from Scheduler import SCHEDULE_VERSION
+
+# Bump whenever the key or entry format changes; changes to the schedules themselves bump
+# Scheduler.SCHEDULE_VERSION, which every key includes
+CACHE_VERSION = b"schedule-cache-1"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+SUFFIX = ".sched"
+
+
+def normalized_ir(head: OP):
+    # One line per operation: opcode, constant (loadI and output only), and VRs 1, 2, and 3
+    lines = []
+    curr = head
+    while curr != None:
+        data = curr.getData()
+        constant = data[2] if data[1] == 1 or data[1] == 8 else ""
+        lines.append(f"{data[1]} {constant} {data[3]} {data[7]} {data[11]}\n")
+        curr = curr.getNext()
+    return "".join(lines).encode("ascii")
+
+
+def ir_key(head: OP, variant=""):
+    """
+    head: The head of the renamed IR.
+    variant: Anything else the schedule depends on (for example a scheduler option); blocks are
+    only shared between calls that pass the same variant.
+    """
+    digest = hashlib.sha256(CACHE_VERSION + b" %d\0" % SCHEDULE_VERSION)
+    digest.update(variant.encode("utf-8") + b"\0")
+    digest.update(normalized_ir(head))
+    return digest.hexdigest()
+
+
+class ScheduleCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Counters for this instance only (other processes sharing the directory keep their own)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, head: OP, variant=""):
+        return ir_key(head, variant)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key):
+        # Returns the cached schedule for key, or None (and counts a miss) if there is none
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                schedule = file.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # A hit refreshes the modification time, the LRU order evict() uses; if another worker
+        # evicted the entry since it was read, there is nothing left to refresh
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return schedule
+
+    def put(self, key, schedule):
+        # Written next to the entry and moved into place, so concurrent workers never see a partial one
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp-", suffix=SUFFIX, dir=self.directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(schedule)
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def entries(self):
+        # (modification time, size, path) for every complete entry, least recently used first
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(SUFFIX) or entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_mtime_ns, info.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        # Removes least recently used entries until the cache fits in max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        return f"schedule cache: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,166 @@
+# #!/usr/bin/python -u
+
+"""
+Long-lived scheduling server on a UNIX domain socket, plus the client for it.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import Pipeline
+
+DEFAULT_SOCKET = os.environ.get("ILOC_SCHEDULER_SOCKET", "/tmp/iloc-scheduler.sock")
+
+# A request is a 4-byte big-endian length and that many bytes of ILOC (one block). The response is a
+# status byte, the lengths of the schedule and of the messages (invalid lines, or why the block
+# failed), then both texts in UTF-8. A connection can carry any number of requests.
+REQUEST_HEADER = struct.Struct("!I")
+RESPONSE_HEADER = struct.Struct("!BII")
+STATUS_SCHEDULED = 0
+STATUS_FAILED = 1
+
+
+def read_exactly(file, size):
+    # Returns exactly size bytes, or None if the stream ends first
+    data = file.read(size)
+    if len(data) < size:
+        return None
+    return data
+
+
+class ScheduleRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            header = read_exactly(self.rfile, REQUEST_HEADER.size)
+            if header is None:
+                return
+            (length,) = REQUEST_HEADER.unpack(header)
+            block = read_exactly(self.rfile, length)
+            if block is None:
+                return
+            schedule, messages = Pipeline.try_schedule_block(block)
+            status = STATUS_FAILED if schedule is None else STATUS_SCHEDULED
+            schedule = (schedule or "").encode("utf-8")
+            messages = messages.encode("utf-8")
+            self.wfile.write(RESPONSE_HEADER.pack(status, len(schedule), len(messages)) + schedule + messages)
+            self.wfile.flush()
+
+
+class ScheduleServer(socketserver.UnixStreamServer):
+    """
+    Requests are handled one at a time in the server process, which keeps the modules imported and
+    one TableScanner (Pipeline's) alive between requests. Scheduler and Parser write to stdout and
+    stderr, so requests cannot safely run on threads of the same process.
+    """
+
+    def __init__(self, path):
+        # Replace a socket left behind by a server that did not shut down cleanly
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        Pipeline.init_worker()
+        super().__init__(path, ScheduleRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(path):
+    # SIGTERM stops the server the same way Ctrl-C does, so the socket file is removed
+    signal.signal(signal.SIGTERM, stop)
+    with ScheduleServer(path) as server:
+        print(f"scheduling server listening on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+class ScheduleClient:
+    # Keeps one connection open so several blocks can be scheduled without reconnecting
+    def __init__(self, path=DEFAULT_SOCKET):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile("rb")
+
+    def schedule(self, block):
+        """
+        Sends one ILOC block (bytes) and returns (schedule, messages); schedule is None if the
+        server could not schedule the block.
+        """
+        self.sock.sendall(REQUEST_HEADER.pack(len(block)) + block)
+        header = read_exactly(self.rfile, RESPONSE_HEADER.size)
+        if header is None:
+            raise ConnectionError("scheduling server closed the connection")
+        status, schedule_length, messages_length = RESPONSE_HEADER.unpack(header)
+        schedule = read_exactly(self.rfile, schedule_length)
+        messages = read_exactly(self.rfile, messages_length)
+        if schedule is None or messages is None:
+            raise ConnectionError("scheduling server closed the connection")
+        if status != STATUS_SCHEDULED:
+            return None, messages.decode("utf-8")
+        return schedule.decode("utf-8"), messages.decode("utf-8")
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Schedule ILOC blocks through a long-lived server.")
+    parser.add_argument("-s", "--socket", default=DEFAULT_SOCKET, help=f"UNIX socket path (default: {DEFAULT_SOCKET})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="run the scheduling server")
+    send = commands.add_parser("send", help="schedule ILOC files through a running server and print the schedules")
+    send.add_argument("names", nargs="+", help="ILOC files, or - for standard input")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.socket)
+        return 0
+
+    failures = 0
+    try:
+        client = ScheduleClient(args.socket)
+    except OSError as error:
+        print(f"ERROR: could not connect to the scheduling server at {args.socket}: {error}", file=sys.stderr)
+        return 2
+    with client:
+        for name in args.names:
+            try:
+                if name == "-":
+                    block = sys.stdin.buffer.read()
+                else:
+                    with open(name, "rb") as file:
+                        block = file.read()
+            except OSError:
+                print(f"ERROR: could not open {name}.", file=sys.stderr)
+                failures += 1
+                continue
+            schedule, messages = client.schedule(block)
+            sys.stderr.write(messages)
+            if schedule is None:
+                failures += 1
+                continue
+            sys.stdout.write(schedule)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
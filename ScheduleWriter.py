@@ -0,0 +1,119 @@
+"""
+Destinations for the schedule Scheduler produces: the scheduler hands each cycle to a writer, which
+decides how (and whether) to format it.
+"""
+
+import abc
+import sys
+
+# Printed for a cycle in which neither functional unit of the lab3 machine issues anything
+IDLE_CYCLE = "[ nop ; nop ]"
+
+# Lines collected before TextWriter writes them to its stream
+DEFAULT_BUFFER_LINES = 4096
+
+
+def format_cycle(issued):
+    # One line of the lab3 schedule; issued holds the node on each unit, or None for an idle unit
+    return "[ " + " ; ".join("nop" if node is None else node.formatOP() for node in issued) + " ]"
+
+
+def idle_cycle(width):
+    return IDLE_CYCLE if width == 2 else "[ " + " ; ".join(["nop"] * width) + " ]"
+
+
+class ScheduleWriter(abc.ABC):
+    # Each cycle has one slot per functional unit of the machine (two for lab3)
+    @abc.abstractmethod
+    def issue(self, cycle, issued):
+        # issued: The node issued on each unit this cycle (None for an idle unit); not all None
+        pass
+
+    def idle(self, cycle, count, width):
+        # count cycles, starting with cycle, in which none of the width units issues anything
+        pass
+
+    def close(self):
+        # Called once after the last cycle
+        pass
+
+
+class LineWriter(ScheduleWriter):
+    # Shared by the text writers: turns cycles into lab3 lines and hands them to emit(). Operations
+    # are formatted through Node.formatOP (cached per node).
+    def __init__(self, compress_nops=False):
+        """
+        compress_nops: Write each run of two or more idle cycles as one "nop xN" line instead of N
+        "[ nop ; nop ]" lines.
+        """
+        self.compress_nops = compress_nops
+
+    @abc.abstractmethod
+    def emit(self, lines):
+        pass
+
+    def issue(self, cycle, issued):
+        self.emit([format_cycle(issued)])
+
+    def idle(self, cycle, count, width):
+        if self.compress_nops and count > 1:
+            self.emit([f"nop x{count}"])
+        else:
+            self.emit([idle_cycle(width)] * count)
+
+
+class TextWriter(LineWriter):
+    # The lab3 text format, collected in a buffer and written to a stream in large chunks
+    def __init__(self, stream=None, compress_nops=False, buffer_lines=DEFAULT_BUFFER_LINES):
+        # stream defaults to sys.stdout as it is when the writer is created
+        super().__init__(compress_nops)
+        self.stream = sys.stdout if stream is None else stream
+        self.buffer_lines = buffer_lines
+        self.lines = []
+
+    def emit(self, lines):
+        self.lines.extend(lines)
+        if len(self.lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.lines.append("")
+            self.stream.write("\n".join(self.lines))
+            self.lines.clear()
+
+    def close(self):
+        self.flush()
+
+
+class FileWriter(TextWriter):
+    # TextWriter on a file it opens and closes itself
+    def __init__(self, path, compress_nops=False, buffer_lines=DEFAULT_BUFFER_LINES):
+        super().__init__(open(path, "w", encoding="utf-8"), compress_nops, buffer_lines)
+
+    def close(self):
+        super().close()
+        self.stream.close()
+
+
+class ListWriter(LineWriter):
+    # The lab3 text lines, kept in a list
+    def __init__(self, compress_nops=False):
+        super().__init__(compress_nops)
+        self.lines = []
+
+    def emit(self, lines):
+        self.lines.extend(lines)
+
+
+class RecordWriter(ScheduleWriter):
+    # Records for every issued operation, never formatted
+    def __init__(self):
+        # (cycle, unit, line number) per issued operation, in issue order; unit is the index of the
+        # functional unit (0 for f0, 1 for f1)
+        self.records = []
+
+    def issue(self, cycle, issued):
+        for unit, node in enumerate(issued):
+            if node is not None:
+                self.records.append((cycle, unit, node.getOPNum()))
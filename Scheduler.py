@@ -1,175 +1,335 @@
-from Node import Node
+from Node import Node, DATA, SERIAL
 from OP import OP
 import heapq
+import itertools
 import logging
+from ScheduleWriter import TextWriter
+from MachineModel import DEFAULT_MACHINE
 
 # Configure logging (disabled by default, enable via logging.basicConfig)
 logger = logging.getLogger(__name__)
 
+# Bump whenever the schedule of a given renamed block can change, whether through the graph
+# builder, the priorities, or the scheduler itself (ScheduleCache keys include it)
+SCHEDULE_VERSION = 2
 
-def schedule(nodes, roots, leaves, debug=False):
+class InheritedLoads:
+    """
+    With the memory frontier (DependencyGraphGenerator's reduce_memory_edges), a store has serial
+    edges only to the loads and outputs after the previous store. A store can issue while one load
+    it has a serial edge to is in flight, and the next store has no edge to that load. That store
+    inherits the load instead: it counts the load as one more unfinished child, and the load
+    releases it on retiring, in block order among the load's parents, as the edge would have.
+    Only for a graph built that way without disambiguation: there, a store has serial edges only to
+    the loads that may read its word, and inheriting would add back the ones left out. The
+    schedulers say how to read their graph:
+        -children(node): node's children, in edge order
+        -next_store(store): the store with a serial edge to store, or None
+        -finished(node) and is_load(node)
+    """
+
+    def __init__(self, children, next_store, finished, is_load):
+        self.children = children
+        self.next_store = next_store
+        self.finished = finished
+        self.is_load = is_load
+        # store -> the load it inherited; load -> the stores that inherited it
+        self.inherited = {}
+        self.waiters = {}
+
+    def in_flight_load(self, store):
+        # The load store was issued ahead of, if it has not retired
+        load = self.inherited.pop(store, None)
+        if load is not None and not self.finished(load):
+            return load
+        for child in self.children(store):
+            if not self.finished(child):
+                return child if self.is_load(child) else None
+        return None
+
+    def pass_on(self, store):
+        # Call when store issues. Returns the next store if it inherits a load (the scheduler adds
+        # one unfinished child to it), else None.
+        load = self.in_flight_load(store)
+        if load is None:
+            return None
+        dependent = self.next_store(store)
+        if dependent is None or load in self.children(dependent):
+            return None
+        self.inherited[dependent] = load
+        self.waiters.setdefault(load, []).append(dependent)
+        return dependent
+
+    def retire(self, load):
+        # The stores that inherited load, or None; the scheduler releases them
+        return self.waiters.pop(load, None)
+
+
+def next_store(store: Node):
+    # The store after store in block order (the one parent with a serial edge to it), or None
+    for dependent in store.getParents():
+        if dependent.OP.getData()[1] == 2 and dependent.getEdgeKind(store) == SERIAL:
+            return dependent
+    return None
+
+
+def schedule(nodes, roots, leaves, debug=False, compress_nops=False, writer=None, machine=None, memory_frontier=True):
     # print([leaf.formatOP() for leaf in leaves])
     '''
     nodes, roots, and leaves are sorted in descending order of priority.
+
+    writer: The ScheduleWriter that receives the schedule (default: a TextWriter on stdout).
+    compress_nops: For the default writer, print each run of two or more idle cycles as one
+    "nop xN" line instead of N "[ nop ; nop ]" lines.
+    machine: The MachineModel to schedule for (default: the lab3 machine).
+    memory_frontier: The graph was built with reduce_memory_edges and without disambiguate, as
+    DependencyGraphGenerator builds it by default: keep track of the loads stores inherit (see
+    InheritedLoads). Pass False for any other graph.
     '''
-    # Instrumentation: Track statistics
-    total_instructions = len(nodes)
-    instructions_scheduled = 0
-    logger.info(f"Starting scheduling for {total_instructions} instructions")
+    if writer is None:
+        writer = TextWriter(compress_nops=compress_nops)
+    if machine is None:
+        machine = DEFAULT_MACHINE
+    logger.info(f"Starting scheduling for {len(nodes)} instructions")
 
-    # print("INSTRUCTIONS TO SCHEDULE", len(nodes))
-    cycle = 1
-    ready = leaves[:]  # Create a heap with negative priorities
-    for node in ready:
-        node.ready = True
-    heapq.heapify(ready)  # Transform list into a heap, in-place
-    active = set()
-
-    # Assertion: All leaves should be ready initially
-    assert all(node.ready for node in leaves), "All leaf nodes must be ready at start"
-
-    while ready or active:
-        # print("READY SET: ", [node.formatOP() for node in ready])
-        # print("READY SET: ", [node.formatOP() for node in ready])
-        # print("ACTIVE SET: ", [active_op[0].formatOP() for active_op in active])
-        instruction = "[ "
-        operations = ["nop", "nop"]
-
-        # Flags to indicate if a functional unit has been scheduled
-        scheduled_on_f0 = False
-        scheduled_on_f1 = False
-        output_scheduled = False
-
-        # Hold onto ops that are priority but can't be scheduled (like necessary functional unit taken)
-        nodes_to_reready = set()
-        # Pick an operation for each of the functional units
-        while ready:
-            if scheduled_on_f0 and scheduled_on_f1:
-                # Both functional units have been scheduled, can exit the loop
-                break
-            # print("READY BEFORE SCHEDULING: ", [node.formatOP() for node in ready])
-            # Pop the node with the highest priority
-            node = heapq.heappop(ready)
-            scheduled = False
-
-            op_code = node.OP.getData()[1]
-            formatted_op = node.formatOP()
-
-            # Check constraints for functional units and schedule operations
-            if op_code in [0, 2] and not scheduled_on_f0:  # load and store only on f0
-                operations[0] = formatted_op
-                scheduled_on_f0 = True
-                active.add((node, cycle + 5))
-                scheduled = True
-                instructions_scheduled += 1
-                logger.debug(f"Cycle {cycle}: Scheduled {formatted_op} on f0")
-            elif op_code == 5 and not scheduled_on_f1:  # mult only on f1
-                operations[1] = formatted_op
-                scheduled_on_f1 = True
-                active.add((node, cycle + 3))
-                scheduled = True
-            elif op_code == 8 and not output_scheduled:  # only one output per cycle
-                if not scheduled_on_f1:
-                    operations[1] = formatted_op
-                    scheduled_on_f1 = True
-                    output_scheduled = True
-                    active.add((node, cycle + 1))
-                    scheduled = True
-                elif not scheduled_on_f0:   
-                    operations[0] = formatted_op
-                    scheduled_on_f0 = True
-                    output_scheduled = True
-                    active.add((node, cycle + 1))
-                    scheduled = True
-                output_scheduled = True
-            elif op_code in [1, 3, 4, 6, 7]:  # other operations on any functional unit
-                if not scheduled_on_f1:
-                    operations[1] = formatted_op
-                    scheduled_on_f1 = True
-                    active.add((node, cycle + 1))
-                    scheduled = True
-                elif not scheduled_on_f0:
-                    operations[0] = formatted_op
-                    scheduled_on_f0 = True
-                    active.add((node, cycle + 1))
-                    scheduled = True
-            # We are ignoring nops (op_code == 9)
-
-            if not scheduled:
-                nodes_to_reready.add(node)
-        
-        # Re-ready nodes that were pulled out but not scheduled
-        for node in nodes_to_reready:
-            heapq.heappush(ready, node)
-
-        # Remove operations from Active that retire
-        to_remove_from_active = set()
-        for active_op in active:
-            node, finish_cycle = active_op[0], active_op[1]
-            if finish_cycle <= cycle + 1:
-                to_remove_from_active.add(active_op)
-                node.finished = True
-        for active_op in to_remove_from_active:
-            node, finish_cycle = active_op[0], active_op[1]
-            for dependent in node.getParents():
-                can_add_to_ready = True
-                # Check if dependent is ready (all dependencies fulfilled)
-                for depender in dependent.getChildren():
-                    if not depender.finished:
-                        can_add_to_ready = False
-                        break
-                if can_add_to_ready and not dependent.ready:
-                    dependent.ready = True
-                    heapq.heappush(ready, dependent)
-        active = active.difference(to_remove_from_active)
-        # print("ACTIVE AFTER RETIRING: ", [node[0].formatOP() for node in active])
-
-        # Check for early releases 
-        # print("ACTIVE SET EARLY RELEASE: ", [active_op[0].formatOP() for active_op in active])
-        # print("READY SET EARLY RELEASE" , [node.formatOP() for node in ready])
-        for active_op in active:
-            node = active_op[0]
-            op_code = node.OP.getData()[1]
-            # codesToLexemes = ["load", "loadI", "store", "add", "sub", "mult", "lshift", "rshift", "output", "nop"]
-            # Multi-cycle operation
-            # if op_code in [0, 2, 5] and not node.ready
-            if op_code in [0, 2]:
-                # print("ACTIVE OP: ", node.formatOP())
-                for dependent in node.getParents():
-                    if not dependent.ready and dependent.getEdge(node)["edgeType"] == "Serial":
-                        # print("DEPENDENT UNDER CONSIDERATION: ", dependent.formatOP())
-                        can_add_to_ready = True
-                        # Check if all data and serial constraints are satisfied
-                        for child in dependent.getChildren():
-                            if child != node:
-                                if not child.finished:
-                                    can_add_to_ready = False
-                                    break
-                        if can_add_to_ready:
-                            # print("ADDING DEPENDENT", dependent.formatOP())
-                            dependent.ready = True
-                            # print("ADDING THIS OP TO READY SET DUE TO EARLY RELEASE: ", dependent.formatOP())
-                            heapq.heappush(ready, dependent)
-
-
-                
-
-
-        # Add the scheduled operations to the instruction
-        instruction += " ; ".join(operations) + " ]"
-        print(instruction)
+    # list_schedule works on numbers: each node's is its index in nodes
+    index = {node: number for number, node in enumerate(nodes)}
+    opcodes = [node.OP.getData()[1] for node in nodes]
+    parents = [[index[dependent] for dependent in node.getParents()] for node in nodes]
+    finished = bytearray(len(nodes))
+    unfinished = [len(node.getChildren()) for node in nodes]
+    unreleased = unfinished.copy()
 
-        # Increment the cycle counter
-        cycle += 1
+    def kinds(number):
+        node = nodes[number]
+        return [dependent.getEdgeKind(node) for dependent in node.getParents()]
+
+    def children(number):
+        return [index[child] for child in nodes[number].getChildren()]
 
-    # Instrumentation: Log final statistics
-    final_cycle = cycle - 1
-    logger.info(f"Scheduling complete: {total_instructions} instructions in {final_cycle} cycles")
+    def next_number_store(number):
+        store = next_store(nodes[number])
+        return None if store is None else index[store]
 
-    # Assertion: All nodes should be finished
+    def line(number):
+        return nodes[number].getOPNum()
+
+    inherited_loads = None
+    if memory_frontier:
+        inherited_loads = InheritedLoads(children, next_number_store, finished.__getitem__, lambda number: opcodes[number] == 0)
+    is_ready = bytearray(len(nodes))
+    final_cycle = list_schedule([index[leaf] for leaf in leaves], opcodes, [node.priority for node in nodes], line,
+                                parents.__getitem__, kinds, is_ready, finished, unfinished, unreleased,
+                                inherited_loads, writer, machine, nodes.__getitem__)
+    # Leave the scheduler's bookkeeping on the nodes
+    for number, node in enumerate(nodes):
+        node.ready = bool(is_ready[number])
+        node.finished = bool(finished[number])
+        node.unfinished = unfinished[number]
+        node.unreleased = unreleased[number]
+
+    logger.info(f"Scheduling complete: {len(nodes)} instructions in {final_cycle} cycles")
     assert all(node.finished for node in nodes), "All nodes must be finished after scheduling"
+    return final_cycle
+
+
+def schedule_csr(graph, priorities, debug=False, compress_nops=False, writer=None, machine=None):
+    '''
+    schedule() on a CSRGraph, with node ids in place of Node objects. priorities holds the priority
+    of each node by id (see PriorityCalculator.calculate_csr_priorities), and machine should be the
+    one the graph's edge latencies were built for. The graph's memory_frontier flag stands in for
+    schedule()'s.
+    '''
+    if writer is None:
+        writer = TextWriter(compress_nops=compress_nops)
+    if machine is None:
+        machine = DEFAULT_MACHINE
+    logger.info(f"Starting scheduling for {len(graph)} instructions")
+    opcodes = graph.opcodes
+    in_offsets, in_kinds = graph.in_offsets, graph.in_kinds
+
+    def kinds(node):
+        return in_kinds[in_offsets[node]:in_offsets[node + 1]]
 
-    # print("INSTRUCTIONS SCHEDULED: ", len([node for node in nodes if node.finished]))
+    def next_csr_store(store):
+        for dependent, kind in zip(graph.parents(store), kinds(store)):
+            if opcodes[dependent] == 2 and kind == SERIAL:
+                return dependent
+        return None
 
-    # Return cycle count for testing purposes
+    # Leaves in descending order of priority (stable, like sort_by_priority), then block order
+    leaves = sorted(graph.leaves(), key=priorities.__getitem__, reverse=True)
+    finished = bytearray(len(graph))
+    inherited_loads = None
+    if graph.memory_frontier:
+        inherited_loads = InheritedLoads(graph.children, next_csr_store, finished.__getitem__, lambda node: opcodes[node] == 0)
+    final_cycle = list_schedule(leaves, opcodes, priorities, int, graph.parents, kinds, bytearray(len(graph)),
+                                finished, list(graph.out_degree), list(graph.out_degree), inherited_loads, writer,
+                                machine, graph.node)
+
+    logger.info(f"Scheduling complete: {len(graph)} instructions in {final_cycle} cycles")
+    assert all(finished), "All nodes must be finished after scheduling"
     return final_cycle
+
+
+def list_schedule(leaves, opcodes, priorities, position, parents, kinds, is_ready, finished, unfinished, unreleased,
+                  inherited_loads, writer, machine, view):
+    """
+    The cycle loop of schedule() and schedule_csr(). Nodes are numbers, and the callers say how to
+    read their graph:
+        -leaves: The nodes without children, in descending order of priority
+        -opcodes, priorities: Each node's opcode and priority, indexed by node
+        -position(node): Its place in block order
+        -parents(node), kinds(node): node's parents in block order, and the kinds of their edges
+         to it in the same order
+        -is_ready, finished, unfinished, unreleased: The scheduler's state, indexed by node: false,
+         false, and the node's number of children twice
+        -inherited_loads: The graph's InheritedLoads, or None
+        -view(node): What the writer gets for node
+    Returns the number of cycles.
+    """
+    log_issues = logger.isEnabledFor(logging.DEBUG)
+    # Machine tables (see MachineModel)
+    latency = machine.latency
+    opcode_class = machine.opcode_class
+    addable = machine.addable
+    assignment = machine.assignment
+    nop_class = machine.nop_class
+    classes = range(len(machine.class_mask))
+    base = len(machine.class_mask) + 1
+    width = len(machine.units)
+
+    cycle = 1
+    # One min-heap of (-priority, ready number, node) per resource class; the ready number breaks
+    # ties in the order nodes became ready, so nodes are never compared
+    ready = [[] for _ in classes]
+    ready_number = itertools.count()
+    for node in leaves:
+        is_ready[node] = True
+        ready[opcode_class[opcodes[node]]].append((-priorities[node], next(ready_number), node))
+    for queue in ready:
+        heapq.heapify(queue)  # Transform list into a heap, in-place
+    # (queue, bit in the addable masks, class) for each class, as the pick loop reads them
+    queues = [(ready[c], 1 << c, c) for c in classes]
+    # Min-heap of (finish cycle, issue number, node): the ops that retire next are on top. The
+    # issue number breaks ties so nodes are never compared.
+    active = []
+    issue_number = itertools.count()
+    retired = []
+    # Loads and stores issued this cycle (their serial-edge parents may be released early)
+    issued_memory_ops = []
+
+    def make_ready(node):
+        is_ready[node] = True
+        heapq.heappush(ready[opcode_class[opcodes[node]]], (-priorities[node], next(ready_number), node))
+
+    # Idle cycles not written yet; written together when the run ends
+    idle_cycles = 0
+
+    while active or any(ready):
+        # print("ACTIVE SET: ", [active_op[2].formatOP() for active_op in active])
+        if not any(ready):
+            # Nothing can issue until the next retirement (at the end of cycle active[0][0] - 1):
+            # skip straight to that cycle
+            skipped = active[0][0] - 1 - cycle
+            if skipped > 0:
+                idle_cycles += skipped
+                cycle += skipped
+
+        # Operations picked this cycle, in pick order; state encodes their classes (see
+        # MachineModel.pick), which is all the slot tables need
+        picked = []
+        state = 0
+
+        # Pick the operations for this cycle, one at a time: the highest priority node among the
+        # queues whose class still fits (a free unit after any rearranging of the units already
+        # assigned, room in the issue width and under the per-cycle limit) goes first
+        while True:
+            fits = addable[state]
+            best = None
+            for queue, bit, c in queues:
+                if queue and fits & bit and (best is None or queue[0] < best[0]):
+                    best = queue
+                    best_class = c
+            if best is None:
+                break
+            node = heapq.heappop(best)[2]
+
+            if best_class == nop_class:
+                # We are ignoring nops: they have no dependences and no unit, so drop them
+                finished[node] = True
+                continue
+
+            picked.append(node)
+            state = state * base + best_class + 1
+            op_code = opcodes[node]
+            heapq.heappush(active, (cycle + latency[op_code], next(issue_number), node))
+            if op_code == 0 or op_code == 2:
+                issued_memory_ops.append(node)
+
+        # What was issued on each unit this cycle
+        issued = [None] * width
+        for node, unit in zip(picked, assignment[state]):
+            issued[unit] = view(node)
+            if log_issues:
+                logger.debug(f"Cycle {cycle}: Scheduled {issued[unit].formatOP()} on {machine.units[unit]}")
+
+        # Remove operations from Active that retire: only the top of the heap is touched
+        while active and active[0][0] <= cycle + 1:
+            node = heapq.heappop(active)[2]
+            finished[node] = True
+            retired.append(node)
+        # Each retirement satisfies one dependence of each parent; a parent is ready once all of
+        # them are satisfied
+        for node in retired:
+            op_code = opcodes[node]
+            memory_op = op_code == 0 or op_code == 2
+            # Only the kinds of a load's or store's edges matter here
+            edges = zip(parents(node), kinds(node) if memory_op else itertools.repeat(DATA))
+            waiting = None if inherited_loads is None else inherited_loads.retire(node)
+            if waiting is not None:
+                # Stores that inherited this load (edge kind None), visited in block order among its
+                # parents
+                edges = sorted([*edges, *((store, None) for store in waiting)], key=lambda edge: position(edge[0]))
+            for dependent, kind in edges:
+                unfinished[dependent] -= 1
+                if kind is None:
+                    # Released when the load was issued, like a serial edge
+                    pass
+                elif not (memory_op and kind == SERIAL):
+                    # Serial edges to loads and stores stopped blocking when the op was issued
+                    unreleased[dependent] -= 1
+                if not is_ready[dependent] and (unfinished[dependent] == 0 or (unfinished[dependent] == 1 and unreleased[dependent] == 0)):
+                    make_ready(dependent)
+        retired.clear()
+
+        # Early release: a load or store that is in flight no longer blocks the operations with a
+        # serial edge to it, so they are ready once it is their only unfinished child
+        for node in issued_memory_ops:
+            if inherited_loads is not None and opcodes[node] == 2 and unfinished[node]:
+                next_store_node = inherited_loads.pass_on(node)
+                if next_store_node is not None:
+                    unfinished[next_store_node] += 1
+            for dependent, kind in zip(parents(node), kinds(node)):
+                if kind == SERIAL:
+                    unreleased[dependent] -= 1
+                    if not is_ready[dependent] and unfinished[dependent] == 1 and unreleased[dependent] == 0:
+                        make_ready(dependent)
+        issued_memory_ops.clear()
+
+        # Hand the cycle to the writer (formatting, if any, is up to it)
+        if not picked:
+            idle_cycles += 1
+        else:
+            if idle_cycles:
+                writer.idle(cycle - idle_cycles, idle_cycles, width)
+                idle_cycles = 0
+            writer.issue(cycle, issued)
+
+        # Increment the cycle counter
+        cycle += 1
+
+    if idle_cycles:
+        writer.idle(cycle - idle_cycles, idle_cycles, width)
+    writer.close()
+    return cycle - 1
@@ -0,0 +1,56 @@
+# #!/usr/bin/python -u
+
+import argparse
+import os
+import sys
+import Pipeline
+
+
+def output_name(path, used):
+    # <input file name>.sched, made unique if two inputs share a file name
+    name = os.path.basename(path) + ".sched"
+    count = used.get(name, 0)
+    used[name] = count + 1
+    if count:
+        name = f"{os.path.basename(path)}-{count}.sched"
+    return name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Schedule many single-block ILOC files in one run.")
+    parser.add_argument("paths", nargs="*", help="ILOC files, or directories whose files are all scheduled")
+    parser.add_argument("-m", "--manifest", help="a file listing one ILOC file per line")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("-o", "--output-dir",
+                        help="write each schedule to <output dir>/<file name>.sched instead of one combined stream on stdout")
+    args = parser.parse_args(argv)
+
+    inputs = Pipeline.collect_inputs(args.paths, args.manifest)
+    if not inputs:
+        print("ERROR: no input files provided", file=sys.stderr)
+        return 2
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    failures = 0
+    used = {}
+    for path, schedule, messages in Pipeline.schedule_files(inputs, args.jobs):
+        for message in messages.splitlines():
+            print(f"{path}: {message}", file=sys.stderr)
+        if schedule is None:
+            failures += 1
+            print(f"FAILED: {path}", file=sys.stderr)
+            continue
+        if args.output_dir:
+            with open(os.path.join(args.output_dir, output_name(path, used)), "w", encoding="utf-8") as file:
+                file.write(schedule)
+        else:
+            sys.stdout.write(f"//FILE: {path}\n")
+            sys.stdout.write(schedule)
+
+    print(f"scheduled {len(inputs) - failures} of {len(inputs)} files", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# #!/usr/bin/python -u
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+import Parser
+from Scanner import TableScanner
+import Renamer
+import DependencyGraphGenerator
+import PriorityCalculator
+import Scheduler
+
+
+def loads_block(ops):
+    # Independent loads, each feeding a mult: many 5-cycle loads in flight at once, and a ready
+    # queue full of loads waiting for the one memory unit
+    lines = ["loadI 0 => r0"]
+    for i in range(ops // 2):
+        lines.append(f"load r0 => r{i % 50 + 1}")
+        lines.append(f"mult r{i % 50 + 1}, r{i % 50 + 1} => r{i % 50 + 60}")
+    return "\n".join(lines) + "\n"
+
+
+def chain_block(ops):
+    # One chain of dependent loads: every load waits out the previous one's latency, the idle
+    # cycles the scheduler jumps over
+    return "loadI 0 => r1\n" + "load r1 => r1\n" * (ops - 1)
+
+
+def random_block(ops, seed):
+    # A random mix of every opcode over a few registers
+    r = random.Random(seed)
+    weights = {"loadI": 4, "load": 4, "store": 4, "add": 3, "sub": 1, "mult": 2, "lshift": 1, "rshift": 1, "output": 3}
+    lines = []
+    for _ in range(ops):
+        opcode = r.choices(list(weights), list(weights.values()))[0]
+        a, b, c = (r.randrange(6) for _ in range(3))
+        if opcode == "loadI":
+            lines.append(f"loadI {r.choice([0, 4, 8, 1024, 2000])} => r{c}")
+        elif opcode in ("load", "store"):
+            lines.append(f"{opcode} r{a} => r{c}")
+        elif opcode == "output":
+            lines.append(f"output {r.choice([0, 4, 8, 1024, 2000])}")
+        else:
+            lines.append(f"{opcode} r{a}, r{b} => r{c}")
+    return "\n".join(lines) + "\n"
+
+
+def time_schedule(iloc_code, repeats):
+    # Best CPU time of Scheduler.schedule over repeats runs (other processes on the machine do not
+    # count against it), and the schedule's length in cycles. The graph is rebuilt for every run
+    # (scheduling marks its nodes) and not timed.
+    best = None
+    for _ in range(repeats):
+        head, tail, num_ops, max_sr = Parser.parseILOC(io.StringIO(iloc_code), False, False, False, TableScanner())
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            start = time.process_time()
+            Scheduler.schedule(nodes, roots, leaves)
+            elapsed = time.process_time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, output.getvalue().count("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time Scheduler.schedule on blocks that stress retirement, the ready queues, and idle cycles.")
+    parser.add_argument("paths", nargs="*", help="ILOC files to time as well as the generated blocks")
+    parser.add_argument("-n", "--ops", type=int, default=4000, help="operations in each generated block (default: %(default)s)")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="runs per block; the best is reported (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    blocks = [("loads", loads_block(args.ops)), ("chain", chain_block(args.ops)), ("random", random_block(args.ops, 7))]
+    for path in args.paths:
+        with open(path, "r") as file:
+            blocks.append((path, file.read()))
+    for name, iloc_code in blocks:
+        seconds, cycles = time_schedule(iloc_code, args.repeats)
+        print(f"{name}: {seconds * 1000:.1f} ms, {cycles} cycles ({seconds / max(cycles, 1) * 1e6:.2f} us/cycle)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,208 @@
 # #!/usr/bin/python -u
 
 import argparse
+import io
 import sys
 import Parser
-from Scanner import Scanner
+from Scanner import TableScanner
 import Renamer
 # from Allocator import Allocator
-import print_ILOC_block
+# import print_ILOC_block
 import DependencyGraphGenerator
 import PriorityCalculator
 import Scheduler
+import Pipeline
+import DeadCodeEliminator
+import ScheduleWriter
+from ScheduleCache import ScheduleCache, DEFAULT_MAX_BYTES
+import MachineModel
 
 def main():
     # Store and check for filename
     parser = argparse.ArgumentParser()
     parser.add_argument("name", help="a valid Linux pathname relative to the current working directory which contains the input file")
+    parser.add_argument("--stream", action="store_true",
+                        help="parse, rename, and build the dependence graph in compressed sparse row form (as --csr) one operation at a time, without building the whole IR first; uses the least memory (not with --blocks, --dce, --dce-report, --edge-report, --ir-cache, or --cache)")
+    parser.add_argument("--blocks", action="store_true",
+                        help="the input holds several independent blocks, each ending with a '//end of block' line; schedule them in parallel")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes for --blocks (default: number of CPUs)")
+    parser.add_argument("--priority", type=priority_spec, default=None, metavar="SPEC",
+                        help="priority function: one of " + ", ".join(sorted(PriorityCalculator.PRIORITY_FUNCTIONS)) +
+                        ", or a weighted sum such as '10*critical_path + descendants' (default: the original 10 * latency formula)")
+    parser.add_argument("--compress-nops", action="store_true",
+                        help="print each run of idle cycles as one 'nop xN' line")
+    parser.add_argument("--machine", type=machine_file, default=None, metavar="FILE",
+                        help="JSON or TOML description of the target machine: functional units, the opcodes each accepts, and latencies (default: the lab3 machine)")
+    parser.add_argument("--disambiguate", action="store_true",
+                        help="work out the addresses built from loadI constants and drop the memory dependences between operations that provably access different words")
+    parser.add_argument("--dce", action="store_true",
+                        help="remove the operations whose results are never used (and those only they use) before building the dependence graph")
+    parser.add_argument("--dce-report", action="store_true",
+                        help="--dce, and print the number of operations removed and cycles saved to stderr (not with --blocks)")
+    parser.add_argument("--csr", action="store_true",
+                        help="build the dependence graph in compressed sparse row form and prioritize and schedule on it (same schedule, less memory)")
+    parser.add_argument("--edge-report", action="store_true",
+                        help="print the dependence graph's edge counts to stderr, with and without the memory frontier (with --disambiguate: with and without disambiguation)")
+    parser.add_argument("--ir-cache", action="store_true",
+                        help="reuse the parsed IR from NAME.ir when NAME has not changed, and write it after a clean parse")
+    parser.add_argument("--cache", metavar="DIR", default=None,
+                        help="reuse schedules of previously seen blocks from this directory")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), metavar="MIB",
+                        help="size cap of the --cache directory in MiB; least recently used entries are evicted (default: %(default)s)")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="print the cache hit and miss counts to stderr")
     args = parser.parse_args()
+    if args.stream:
+        # The streaming path never holds the whole IR to split, clean up, report on, or cache
+        for flag, used in (("--blocks", args.blocks), ("--dce", args.dce), ("--dce-report", args.dce_report),
+                           ("--edge-report", args.edge_report), ("--ir-cache", args.ir_cache), ("--cache", args.cache)):
+            if used:
+                parser.error(f"{flag} cannot be used with --stream")
+    if args.blocks and args.dce_report:
+        # The blocks are scheduled in worker processes, which hand back nothing but the schedule
+        parser.error("--dce-report cannot be used with --blocks")
 
     if not args.name:
         print("ERROR: Input file not provided", file=sys.stderr)
         return
     else:
         try:
-            file = open(args.name, "r", encoding="utf-8")
+            file = open(args.name, "rb")
         except Exception:
             print("ERROR: could not open the provided file.", file=sys.stderr)
             return
         
+        cache = ScheduleCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+
+        if args.blocks:
+            # Schedule every block on the process pool, then print the schedules in input order
+            blocks = Pipeline.split_blocks(file.read())
+            file.close()
+            for schedule in Pipeline.schedule_blocks(blocks, args.jobs, cache, args.priority, args.compress_nops, args.machine, args.disambiguate, args.dce):
+                sys.stdout.write(schedule)
+                sys.stdout.write(Pipeline.BLOCK_MARKER.decode() + "\n")
+            print_cache_stats(cache, args)
+            return
+
         # Instantiate the scanner and pass it around for use
-        scanner = Scanner()
-        # Begin parsing the file and build the IR
-        head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        scanner = TableScanner()
+        if args.stream:
+            # Parser -> forward renamer -> CSR graph builder, one operation at a time. The operations
+            # are dropped once their rows are in the graph; a Node graph would keep every one of them.
+            operations = Renamer.renaming_forward(Parser.streamILOC(io.TextIOWrapper(file, encoding="utf-8"), scanner))
+            graph = DependencyGraphGenerator.generate_dependency_graph_csr_stream(operations, args.machine or MachineModel.DEFAULT_MACHINE, disambiguate=args.disambiguate)
+            # With the whole block seen, give the VRs renaming()'s numbers so the schedule reads the same
+            names = Renamer.renaming_names(zip(reversed(graph.opcodes), reversed(graph.vrs1), reversed(graph.vrs2), reversed(graph.vrs3)))
+            DependencyGraphGenerator.rename_csr(graph, names)
+            schedule_csr(graph, args)
+            file.close()
+            return
+        else:
+            # Begin parsing the file (memory-mapped, or loaded from NAME.ir with --ir-cache) and build the IR
+            head, tail, num_ops, max_sr = Parser.parseILOC_file(file, False, False, scanner, ir_cache=args.ir_cache)
 
-        # Rename the ILOC block and print to stdout
-        # max_vr, maxLive = Renamer.renaming(tail, num_ops, max_sr)
-        Renamer.renaming(tail, num_ops, max_sr)
+            # Rename the ILOC block and print to stdout
+            # max_vr, maxLive = Renamer.renaming(tail, num_ops, max_sr)
+            Renamer.renaming(tail, num_ops, max_sr)
 
-        # Print the renamed block to stdout
-        # print_ILOC_block.print_ILOC_block(head)
+            if args.dce or args.dce_report:
+                head = eliminate_dead_code(head, args)
 
-        # LAB 3 NEW CODE! ////////////////////////////////////////////////////////////////////
-        
-        # Generate the dependence graph
-        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+            # Print the renamed block to stdout
+            # print_ILOC_block.print_ILOC_block(head)
+
+            if cache is not None:
+                # Look the renamed block up in the schedule cache; on a miss, schedule and store it
+                key = cache.key(head, Pipeline.cache_variant(args.priority, args.compress_nops, args.machine, args.disambiguate))
+                schedule = cache.get(key)
+                if schedule is None:
+                    schedule = Pipeline.schedule_renamed(head, args.priority, args.compress_nops, args.machine, args.disambiguate)
+                    cache.put(key, schedule)
+                sys.stdout.write(schedule)
+                print_cache_stats(cache, args)
+                file.close()
+                return
+
+            # LAB 3 NEW CODE! ////////////////////////////////////////////////////////////////////
+
+            if args.edge_report:
+                print_edge_report(head, args.disambiguate, args.machine)
+
+            if args.csr:
+                schedule_csr(DependencyGraphGenerator.generate_dependency_graph_csr(head, args.machine or MachineModel.DEFAULT_MACHINE, disambiguate=args.disambiguate), args)
+                file.close()
+                return
+
+            # Generate the dependence graph
+            nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head, disambiguate=args.disambiguate, machine=args.machine or MachineModel.DEFAULT_MACHINE)
 
         # Calculate priorities
-        prioritized_nodes, prioritized_roots, prioritized_leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+        prioritized_nodes, prioritized_roots, prioritized_leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves, priority=args.priority)
         # for node in prioritized_nodes:
         #     print(node.formatOP() + " Latency: " + str(node.latency) + " Priority: " + str(node.priority))
 
         # Schedule the code
-        Scheduler.schedule(prioritized_nodes, prioritized_roots, prioritized_leaves)
+        Scheduler.schedule(prioritized_nodes, prioritized_roots, prioritized_leaves, compress_nops=args.compress_nops, machine=args.machine, memory_frontier=not args.disambiguate)
 
         file.close()
 
+def schedule_csr(graph, args):
+    # Prioritizes and schedules a CSRGraph with the lab3 options
+    priorities = PriorityCalculator.calculate_csr_priorities(graph, priority=args.priority)
+    Scheduler.schedule_csr(graph, priorities, compress_nops=args.compress_nops, machine=args.machine)
+
+def eliminate_dead_code(head, args):
+    # DeadCodeEliminator on the renamed IR; with --dce-report, the block is also scheduled before
+    # and after to count the cycles saved
+    if args.dce_report:
+        before = count_cycles(head, args)
+    head, _, removed = DeadCodeEliminator.eliminate_dead_code(head)
+    if args.dce_report:
+        saved = before - count_cycles(head, args)
+        print(f"dead code: removed {removed} operations, saved {saved} cycles", file=sys.stderr)
+    return head
+
+def count_cycles(head, args):
+    # Length of head's schedule with the lab3 options, without printing it
+    nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head, disambiguate=args.disambiguate, machine=args.machine or MachineModel.DEFAULT_MACHINE)
+    nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves, priority=args.priority)
+    return Scheduler.schedule(nodes, roots, leaves, writer=ScheduleWriter.RecordWriter(), machine=args.machine, memory_frontier=not args.disambiguate)
+
+def print_edge_report(head, disambiguate=False, machine=None):
+    # Edges of the graph as built and without the one memory-edge reduction the options add: the
+    # memory frontier, or with disambiguate, disambiguation (both graphs have the frontier then)
+    machine = machine or MachineModel.DEFAULT_MACHINE
+    if disambiguate:
+        before = DependencyGraphGenerator.generate_dependency_graph(head, machine=machine)
+        after = DependencyGraphGenerator.generate_dependency_graph(head, disambiguate=True, machine=machine)
+        names = ("without disambiguation", "with disambiguation")
+    else:
+        before = DependencyGraphGenerator.generate_dependency_graph(head, reduce_memory_edges=False, machine=machine)
+        after = DependencyGraphGenerator.generate_dependency_graph(head, machine=machine)
+        names = ("without memory frontier", "with memory frontier")
+    for name, graph in zip(names, (before, after)):
+        counts = DependencyGraphGenerator.edge_counts(graph[0])
+        print(f"edges {name}: {sum(counts)} ({counts[0]} data, {counts[1]} serial, {counts[2]} conflict)", file=sys.stderr)
+
+def priority_spec(spec):
+    try:
+        PriorityCalculator.parse_priority(spec)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+    return spec
+
+def machine_file(path):
+    try:
+        return MachineModel.load_machine(path)
+    except OSError as error:
+        raise argparse.ArgumentTypeError(f"could not read {path}: {error.strerror}")
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+def print_cache_stats(cache, args):
+    if cache is not None and args.cache_stats:
+        print(cache.stats(), file=sys.stderr)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,186 @@
+import pytest
+from io import StringIO
+import Parser
+import Renamer
+import DependencyGraphGenerator
+import PriorityCalculator
+import Scheduler
+import ScheduleWriter
+import AddressAnalysis
+import Node
+import MachineModel
+import lab3
+
+# 1024 and 1028 are different words: only the load from 1028 has to wait for the store
+DISJOINT_BLOCK = """loadI 1024 => r0
+loadI 4 => r1
+add r0, r1 => r2
+load r0 => r3
+store r1 => r2
+load r2 => r4
+load r0 => r5
+output 1024
+"""
+
+
+def renamed(scanner, iloc_code):
+    head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+    Renamer.renaming(tail, num_ops, max_sr)
+    return head
+
+
+def addresses(scanner, iloc_code):
+    # The address each operation reports, in block order
+    tracker = AddressAnalysis.AddressTracker()
+    result = []
+    for op in DependencyGraphGenerator.iterate_IR(renamed(scanner, iloc_code)):
+        data = op.getData()
+        result.append(tracker.address(data[1], data[2], data[3], data[7], data[11]))
+    return result
+
+
+class TestAddressTracker:
+    # Test constant propagation of addresses
+
+    def test_add_chain(self, scanner):
+        # The address chain of test.txt: a base and repeated adds of a stride
+        iloc_code = "loadI 4 => r1\nloadI 2000 => r2\nadd r2, r1 => r3\nadd r3, r1 => r4\nload r2 => r10\nload r4 => r11\nstore r11 => r3\noutput 2024\n"
+
+        assert addresses(scanner, iloc_code) == [None, None, None, None, 2000, 2008, 2004, 2024]
+
+    def test_all_arithmetic(self, scanner):
+        iloc_code = "loadI 12 => r1\nloadI 2 => r2\nsub r1, r2 => r3\nmult r1, r2 => r4\nlshift r1, r2 => r5\nrshift r1, r2 => r6\n" \
+                    "load r3 => r7\nload r4 => r7\nload r5 => r7\nload r6 => r7\n"
+
+        assert addresses(scanner, iloc_code)[6:] == [10, 24, 48, 3]
+
+    def test_loaded_values_are_unknown(self, scanner):
+        iloc_code = "loadI 1024 => r0\nload r0 => r1\nadd r1, r0 => r2\nstore r0 => r2\nload r1 => r3\n"
+
+        assert addresses(scanner, iloc_code) == [None, 1024, None, None, None]
+
+    def test_wraparound_and_undefined_shifts(self):
+        assert AddressAnalysis.fold(3, 2**31 - 1, 1) == -2**31
+        assert AddressAnalysis.fold(5, 2**16, 2**16) == 0
+        assert AddressAnalysis.fold(6, 1, 32) is None
+        assert AddressAnalysis.fold(7, -8, 1) == -4
+
+
+class TestMayAlias:
+    # Test when two accesses are disjoint
+
+    def test_words(self):
+        assert AddressAnalysis.may_alias(1024, 1024)
+        assert AddressAnalysis.may_alias(1024, 1026)
+        assert not AddressAnalysis.may_alias(1024, 1028)
+        assert AddressAnalysis.may_alias(None, 1028)
+
+    def test_latest_aliasing_store(self):
+        stores = AddressAnalysis.StoreIndex()
+        assert stores.latest_aliasing(0) is None
+        stores.add(0, "a", 1024)
+        stores.add(1, "b", None)
+        stores.add(2, "c", 1028)
+
+        assert stores.latest_aliasing(1028) == "c"
+        assert stores.latest_aliasing(1024) == "b"
+        assert stores.latest_aliasing(None) == "c"
+        stores.add(3, "d", 1022)
+        assert stores.latest_aliasing(1024) == "d"
+
+    def test_pending_reads(self):
+        reads = AddressAnalysis.PendingReads()
+        reads.add(0, "a", 1028)
+        reads.add(1, "b", None)
+        reads.add(2, "c", 1024)
+
+        assert reads.aliasing(1024, False) == ["b", "c"]
+        assert reads.aliasing(1024, True) == ["b", "c"]
+        assert reads.aliasing(None, True) == ["a"]
+        assert reads.aliasing(None, True) == []
+
+
+class TestDisambiguatedGraph:
+    # Test that disjoint memory operations lose their edges
+
+    def test_disjoint_edges_dropped(self, scanner):
+        nodes, _, _ = DependencyGraphGenerator.generate_dependency_graph(renamed(scanner, DISJOINT_BLOCK), disambiguate=True)
+
+        # The store does not wait for the load from 1024, and only the load from 1028 waits for it
+        assert set(nodes[4].getChildren()) == {nodes[1], nodes[2]}
+        assert nodes[4] in nodes[5].getChildren()
+        assert nodes[4] not in nodes[6].getChildren()
+        assert len(nodes[7].getChildren()) == 0
+
+    def test_unknown_addresses_keep_edges(self, scanner):
+        iloc_code = "loadI 1024 => r0\nload r0 => r1\nstore r0 => r1\nload r0 => r2\n"
+
+        nodes, _, _ = DependencyGraphGenerator.generate_dependency_graph(renamed(scanner, iloc_code), disambiguate=True)
+
+        assert nodes[1] in nodes[2].getChildren()
+        assert nodes[2] in nodes[3].getChildren()
+
+    def test_load_waits_for_latest_aliasing_store(self, scanner):
+        iloc_code = "loadI 1024 => r0\nloadI 1028 => r1\nstore r1 => r0\nstore r0 => r1\nload r0 => r2\n"
+
+        nodes, _, _ = DependencyGraphGenerator.generate_dependency_graph(renamed(scanner, iloc_code), disambiguate=True)
+
+        assert nodes[4].getEdgeKind(nodes[2]) == Node.CONFLICT
+        assert nodes[3] not in nodes[4].getChildren()
+
+    def test_builders_agree(self, scanner, test_data_dir):
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            head = renamed(scanner, file.read() + DISJOINT_BLOCK)
+        nodes, _, _ = DependencyGraphGenerator.generate_dependency_graph(head, disambiguate=True)
+        graph = DependencyGraphGenerator.generate_dependency_graph_csr(head, disambiguate=True)
+        ids = {node: i for i, node in enumerate(nodes)}
+
+        for i, node in enumerate(nodes):
+            assert list(graph.children(i)) == [ids[child] for child in node.getChildren()]
+
+    def test_shorter_schedule(self, scanner):
+        def schedule(disambiguate):
+            head = renamed(scanner, DISJOINT_BLOCK)
+            nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head, disambiguate=disambiguate)
+            nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+            return Scheduler.schedule(nodes, roots, leaves, writer=ScheduleWriter.ListWriter(), memory_frontier=not disambiguate)
+
+        assert schedule(True) < schedule(False)
+
+    @pytest.mark.parametrize("csr", [False, True])
+    def test_store_does_not_inherit_disjoint_load(self, scanner, csr):
+        # The store to 4 has no edge to the load from 0, so it issues right after the store to 0
+        # instead of waiting for the load to retire (cycle 7)
+        head = renamed(scanner, "loadI 0 => r0\nloadI 4 => r1\nload r0 => r2\nstore r1 => r0\nstore r1 => r1\n")
+        records = ScheduleWriter.RecordWriter()
+        if csr:
+            graph = DependencyGraphGenerator.generate_dependency_graph_csr(head, disambiguate=True)
+            Scheduler.schedule_csr(graph, PriorityCalculator.calculate_csr_priorities(graph), writer=records)
+        else:
+            nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head, disambiguate=True)
+            nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+            Scheduler.schedule(nodes, roots, leaves, writer=records, memory_frontier=False)
+
+        issued = {line: cycle for cycle, unit, line in records.records}
+        assert issued[4] + 1 == issued[5] == 4
+
+
+class TestEdgeReport:
+    # Test lab3's --edge-report with --disambiguate
+
+    def test_reports_disambiguation_delta(self, scanner, capsys, monkeypatch):
+        # Both graphs are built for the given machine with the memory frontier; only disambiguation differs
+        machine = MachineModel.compile_machine({**MachineModel.LAB3_MACHINE, "serial_latency": 2})
+        calls = []
+        build = DependencyGraphGenerator.generate_dependency_graph
+
+        def recording_build(head, **kwargs):
+            calls.append(kwargs)
+            return build(head, **kwargs)
+
+        monkeypatch.setattr(DependencyGraphGenerator, "generate_dependency_graph", recording_build)
+        lab3.print_edge_report(renamed(scanner, DISJOINT_BLOCK), True, machine)
+
+        assert calls == [{"machine": machine}, {"disambiguate": True, "machine": machine}]
+        assert capsys.readouterr().err == "edges without disambiguation: 11 (7 data, 1 serial, 3 conflict)\n" \
+                                          "edges with disambiguation: 8 (7 data, 0 serial, 1 conflict)\n"
@@ -0,0 +1,161 @@
+import pytest
+import io
+from io import StringIO
+from Scanner import Scanner
+from ColumnarIR import ColumnarIR, OPView, NONE, INF
+import Parser
+import Renamer
+import DependencyGraphGenerator
+import PriorityCalculator
+import Scheduler
+
+
+def ir_rows(head):
+    rows = []
+    while head:
+        rows.append(list(head.getData()))
+        head = head.getNext()
+    return rows
+
+
+def edges(nodes):
+    return sorted((node.getOPNum(), sorted((child.getOPNum(), node.getEdge(child)["edgeType"])
+                                           for child in node.getChildren())) for node in nodes)
+
+
+class TestColumnarIRAdapter:
+    # Test the OP adapter over the columns
+
+    def test_round_trip_linked_list(self, scanner):
+        # Converting to columns and back keeps every IR field
+        iloc_code = "loadI 5 => r1\nadd r1, r1 => r2\noutput 4\nnop\n"
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+
+        ir = ColumnarIR.from_linked_list(head)
+        new_head, new_tail = ir.to_linked_list()
+
+        assert len(ir) == 4
+        assert ir_rows(new_head) == ir_rows(head)
+        assert new_tail.getPrev().getNext() is new_tail
+
+    def test_sentinels_translate_to_none_and_inf(self):
+        # None and float("inf") are stored as sentinels and read back unchanged
+        ir = ColumnarIR()
+        ir.append([1, 9] + [None] * 3 + [float("inf")] + [None] * 8)
+
+        assert ir.columns[2][0] == NONE
+        assert ir.columns[5][0] == INF
+        assert ir.head().getData()[2] is None
+        assert ir.head().getData()[5] == float("inf")
+
+    def test_values_from_inf_up_rejected(self):
+        # INF itself would read back as infinity, and larger values do not fit at all
+        ir = ColumnarIR()
+
+        for value in (INF, 2 ** 64):
+            with pytest.raises(OverflowError):
+                ir.append([1, 1, value] + [None] * 11)
+            with pytest.raises(OverflowError):
+                ir.append_operation(1, 8, value)
+        assert len(ir) == 0 and all(len(column) == 0 for column in ir.columns)
+
+    def test_view_writes_through(self):
+        # Writing through getData() updates the columns
+        ir = ColumnarIR()
+        ir.append([1, 1, 5] + [None] * 11)
+
+        ir.head().getData()[11] = 3
+
+        assert ir.get(0, 11) == 3
+
+    def test_view_navigation(self):
+        # getNext/getPrev walk the rows like the linked list
+        ir = ColumnarIR()
+        for line in range(3):
+            ir.append([line + 1, 9] + [None] * 12)
+
+        head = ir.head()
+
+        assert head.getPrev() is None
+        assert head.getNext().getNext() == ir.tail()
+        assert ir.tail().getNext() is None
+        assert isinstance(head, OPView)
+
+    def test_empty_ir(self):
+        # An empty IR has no head or tail
+        ir = ColumnarIR()
+
+        assert ir.head() is None
+        assert ir.tail() is None
+
+
+class TestColumnarPipeline:
+    # Test the columnar parse, rename, and graph stages against the linked-list ones
+
+    def test_parse_matches_linked_list(self, scanner, test_data_dir):
+        # parseILOC_columnar stores the same fields as parseILOC_file
+        with open(f"{test_data_dir}/all_arithops.iloc", "rb") as file:
+            head, tail, num_ops, max_sr = Parser.parseILOC_file(file, False, False, scanner)
+        with open(f"{test_data_dir}/all_arithops.iloc", "rb") as file:
+            ir, columnar_num_ops, columnar_max_sr = Parser.parseILOC_file(file, False, False, scanner, columnar=True)
+
+        assert ir_rows(ir.head()) == ir_rows(head)
+        assert (columnar_num_ops, columnar_max_sr) == (num_ops, max_sr)
+
+    def test_parse_invalid_line_goes_through_scanner(self, scanner):
+        # Lines handled by the table scanner still land in the columns
+        ir, num_ops, max_sr = Parser.parseILOC_columnar(b"foo\nload r1 => r2\nloadI 3 => r4", False, False, scanner)
+
+        assert len(ir) == 1
+        assert num_ops == 2
+        assert ir.row(0)[:3] == [2, 0, 1]
+
+    @pytest.mark.parametrize("buf", [b"loadI 9223372036854775807 => r1\noutput 4\n", b"output 4\nloadI 99999999999999999999 => r1\n"])
+    def test_parse_value_too_large(self, scanner, capsys, buf):
+        # An operation the columns cannot hold is reported and left out
+        ir, num_ops, max_sr = Parser.parseILOC_columnar(buf, False, False, scanner)
+
+        assert [ir.row(row)[:3] for row in range(len(ir))] == [[2 - buf.startswith(b"output"), 8, 4]]
+        assert num_ops == 2
+        assert max_sr == 0
+        assert "too large" in capsys.readouterr().err
+
+    def test_renaming_columns_matches_renaming(self, scanner, test_data_dir):
+        # Column renaming assigns the same VRs and NUs as list renaming
+        with open(f"{test_data_dir}/data_dependency.iloc", "rb") as file:
+            buf = file.read()
+        head, tail, num_ops, max_sr = Parser.parseILOC_buffer(buf, False, False, scanner)
+        ir, num_ops, max_sr = Parser.parseILOC_columnar(buf, False, False, scanner)
+
+        Renamer.renaming(tail, num_ops, max_sr)
+        Renamer.renaming_columns(ir, num_ops, max_sr)
+
+        assert ir_rows(ir.head()) == ir_rows(head)
+
+    def test_dependency_graph_columns_matches(self, scanner):
+        # The columnar graph has the same edges as the linked-list graph
+        iloc_code = b"loadI 8 => r1\nload r1 => r2\nstore r2 => r1\noutput 8\nload r1 => r3\nmult r2, r3 => r4\n"
+        head, tail, num_ops, max_sr = Parser.parseILOC_buffer(iloc_code, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        ir, num_ops, max_sr = Parser.parseILOC_columnar(iloc_code, False, False, scanner)
+        Renamer.renaming_columns(ir, num_ops, max_sr)
+
+        expected = DependencyGraphGenerator.generate_dependency_graph(head)
+        actual = DependencyGraphGenerator.generate_dependency_graph_columns(ir)
+
+        assert edges(actual[0]) == edges(expected[0])
+        assert len(actual[1]) == len(expected[1])
+        assert len(actual[2]) == len(expected[2])
+
+    def test_schedule_from_columns(self, scanner, capsys):
+        # The scheduler runs on nodes built from columns
+        ir, num_ops, max_sr = Parser.parseILOC_columnar(b"loadI 5 => r1\nloadI 10 => r2\nadd r1, r2 => r3\n", False, False, scanner)
+        Renamer.renaming_columns(ir, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph_columns(ir)
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+
+        cycle_count = Scheduler.schedule(nodes, roots, leaves, False)
+
+        assert cycle_count == 2
+        assert "add r1, r2 => r0" in capsys.readouterr().out
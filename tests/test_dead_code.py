@@ -0,0 +1,89 @@
+import pytest
+import sys
+from io import StringIO
+import Parser
+import Renamer
+import DependencyGraphGenerator
+import DeadCodeEliminator
+import Pipeline
+import lab3
+
+
+def eliminate(scanner, iloc_code):
+    # Line numbers of the operations left, and the number removed
+    head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+    Renamer.renaming(tail, num_ops, max_sr)
+    head, tail, removed = DeadCodeEliminator.eliminate_dead_code(head)
+    lines = [op.getData()[0] for op in DependencyGraphGenerator.iterate_IR(head)]
+    assert (tail is None and head is None) or (tail.getData()[0] == lines[-1] and tail.getNext() is None)
+    return lines, removed
+
+
+class TestEliminateDeadCode:
+    # Test removing operations whose results are never used
+
+    def test_unused_definition_removed(self, scanner):
+        iloc_code = "loadI 4 => r1\nloadI 8 => r2\nstore r1 => r1\n"
+
+        assert eliminate(scanner, iloc_code) == ([1, 3], 1)
+
+    def test_chain_removed(self, scanner):
+        # Removing the add leaves the load, and then the loadI feeding it, without uses
+        iloc_code = "loadI 1024 => r1\nload r1 => r2\nadd r2, r2 => r3\noutput 1024\n"
+
+        assert eliminate(scanner, iloc_code) == ([4], 3)
+
+    def test_shared_operand_kept(self, scanner):
+        # r1 still has a use after the dead add goes
+        iloc_code = "loadI 4 => r1\nadd r1, r1 => r2\nstore r1 => r1\n"
+
+        assert eliminate(scanner, iloc_code) == ([1, 3], 1)
+
+    def test_redefined_register(self, scanner):
+        # The first definition of r1 is overwritten before any use; the second one is stored
+        iloc_code = "loadI 4 => r1\nloadI 8 => r1\nstore r1 => r1\n"
+
+        assert eliminate(scanner, iloc_code) == ([2, 3], 1)
+
+    def test_side_effects_kept(self, scanner):
+        iloc_code = "nop\nloadI 4 => r1\nstore r1 => r1\noutput 4\n"
+
+        assert eliminate(scanner, iloc_code) == ([1, 2, 3, 4], 0)
+
+    def test_everything_dead(self, scanner, test_data_dir):
+        with open(f"{test_data_dir}/all_arithops.iloc", "r") as file:
+            assert eliminate(scanner, file.read()) == ([], 5)
+
+    def test_nothing_left_dead(self, scanner):
+        # A second pass over the result finds nothing
+        iloc_code = "loadI 1 => r1\nloadI 2 => r2\nadd r1, r2 => r3\nmult r3, r1 => r4\nsub r4, r2 => r5\nstore r3 => r1\n"
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        head, _, removed = DeadCodeEliminator.eliminate_dead_code(head)
+
+        assert removed == 2
+        assert DeadCodeEliminator.eliminate_dead_code(head)[2] == 0
+
+
+class TestPipelineDeadCode:
+    # Test the dce option of the pipeline
+
+    def test_fewer_cycles(self):
+        block = b"loadI 1024 => r1\nload r1 => r2\nmult r2, r2 => r3\nloadI 4 => r4\nstore r4 => r1\n"
+
+        assert Pipeline.schedule_block(block, dce=True).count("\n") < Pipeline.schedule_block(block).count("\n")
+
+    def test_no_dead_code_same_schedule(self):
+        block = b"loadI 1024 => r1\nload r1 => r2\nmult r2, r2 => r3\nstore r3 => r1\noutput 1024\n"
+
+        assert Pipeline.schedule_block(block, dce=True) == Pipeline.schedule_block(block)
+
+    def test_report_rejected_with_blocks(self, tmp_path, monkeypatch, capsys):
+        # Worker processes cannot report what they removed
+        path = tmp_path / "blocks.i"
+        path.write_text("nop\n")
+        monkeypatch.setattr(sys, "argv", ["lab3.py", "--blocks", "--dce-report", str(path)])
+
+        with pytest.raises(SystemExit):
+            lab3.main()
+        assert "--dce-report cannot be used with --blocks" in capsys.readouterr().err
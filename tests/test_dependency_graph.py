@@ -1,9 +1,15 @@
 import pytest
+import pickle
+import sys
 from io import StringIO
 from Scanner import Scanner
 import Parser
 import Renamer
 import DependencyGraphGenerator
+import Node
+import MachineModel
+from OP import OP
+import lab3
 
 
 class TestDependencyGraphBasic:
@@ -140,6 +146,50 @@ class TestDependencyGraphMemoryOperations:
         assert len(store_node.getChildren()) > 0
 
 
+class TestDependencyGraphMemoryFrontier:
+    # Test that stores get serial edges only to the loads and outputs since the previous store
+
+    def build(self, scanner, iloc_code, reduce_memory_edges):
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, _, _ = DependencyGraphGenerator.generate_dependency_graph(head, reduce_memory_edges=reduce_memory_edges)
+        graph = DependencyGraphGenerator.generate_dependency_graph_csr(head, reduce_memory_edges=reduce_memory_edges)
+        return nodes, graph
+
+    def test_store_skips_loads_before_previous_store(self, scanner):
+        # The second store reaches the first load through the first store
+        iloc_code = "loadI 0 => r0\nload r0 => r1\noutput 0\nstore r0 => r0\nload r0 => r2\nstore r0 => r0\n"
+
+        nodes, graph = self.build(scanner, iloc_code, True)
+
+        assert list(nodes[5].getChildren()) == [nodes[0], nodes[3], nodes[4]]
+        assert list(graph.children(5)) == [0, 3, 4]
+        assert set(nodes[3].getChildren()) == {nodes[0], nodes[1], nodes[2]}
+
+    def test_full_graph_keeps_every_serial_edge(self, scanner):
+        iloc_code = "loadI 0 => r0\nload r0 => r1\noutput 0\nstore r0 => r0\nload r0 => r2\nstore r0 => r0\n"
+
+        nodes, graph = self.build(scanner, iloc_code, False)
+
+        assert list(nodes[5].getChildren()) == [nodes[0], nodes[3], nodes[1], nodes[2], nodes[4]]
+        assert list(graph.children(5)) == [0, 3, 1, 2, 4]
+
+    def test_edge_counts(self, scanner, test_data_dir):
+        # Only serial edges are dropped, and the CSR graph drops the same ones
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            iloc_code = file.read()
+        iloc_code = iloc_code + "load r1 => r2\nstore r2 => r1\n" * 20
+
+        reduced, graph = self.build(scanner, iloc_code, True)
+        full, _ = self.build(scanner, iloc_code, False)
+        reduced_counts = DependencyGraphGenerator.edge_counts(reduced)
+        full_counts = DependencyGraphGenerator.edge_counts(full)
+
+        assert reduced_counts[1] < full_counts[1]
+        assert reduced_counts[0] == full_counts[0] and reduced_counts[2] == full_counts[2]
+        assert sum(reduced_counts) == len(graph.out_targets)
+
+
 class TestDependencyGraphRootsAndLeaves:
     # Test correct identification of roots and leaves
 
@@ -240,3 +290,193 @@ class TestDependencyGraphEdgeCases:
         # Should have at least 1 root and 1 leaf
         assert len(roots) >= 1
         assert len(leaves) >= 1
+
+
+class TestDependencyGraphStream:
+    # Test building the graph from a stream of operations
+
+    def test_stream_graph_matches_linked_list_graph(self, scanner, test_data_dir):
+        # Streamed parse + forward renaming gives the same edges as the two-pass pipeline
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        expected, _, _ = DependencyGraphGenerator.generate_dependency_graph(head)
+
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            operations = Renamer.renaming_forward(Parser.streamILOC(file, scanner))
+            nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph_stream(operations)
+
+        def edges(graph):
+            return sorted((node.getOPNum(), sorted((child.getOPNum(), node.getEdge(child)["edgeType"])
+                                                   for child in node.getChildren())) for node in graph)
+        assert edges(nodes) == edges(expected)
+
+    def test_stream_graph_accepts_any_iterable(self, scanner):
+        # A plain list of renamed OPs works too
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO("loadI 5 => r1\nadd r1, r1 => r2\n"), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph_stream([head, tail])
+
+        assert len(nodes) == 2
+        assert roots == [nodes[1]]
+        assert leaves == [nodes[0]]
+
+    def test_renamed_stream_graph_formats_like_renaming(self, scanner, test_data_dir):
+        # After rename_csr the streamed CSR graph prints renaming()'s VRs
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        expected = DependencyGraphGenerator.generate_dependency_graph_csr(head)
+
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            graph = DependencyGraphGenerator.generate_dependency_graph_csr_stream(Renamer.renaming_forward(Parser.streamILOC(file, scanner)))
+        # Format once first: renaming has to drop the cached text
+        graph.formatOP(0)
+        names = Renamer.renaming_names(zip(reversed(graph.opcodes), reversed(graph.vrs1), reversed(graph.vrs2), reversed(graph.vrs3)))
+        DependencyGraphGenerator.rename_csr(graph, names)
+
+        assert [graph.formatOP(node) for node in range(len(graph))] == [expected.formatOP(node) for node in range(len(expected))]
+        assert graph.out_vrs == expected.out_vrs and graph.in_vrs == expected.in_vrs
+
+
+class TestStreamOption:
+    # Test lab3 --stream against the default two-pass pipeline
+
+    def run(self, monkeypatch, capsys, *argv):
+        monkeypatch.setattr(sys, "argv", ["lab3.py", *argv])
+        lab3.main()
+        return capsys.readouterr().out
+
+    @pytest.mark.parametrize("options", [[], ["--csr"], ["--disambiguate"]])
+    @pytest.mark.parametrize("iloc_code", [
+        "loadI 1024 => r1\nloadI 4 => r2\nload r1 => r3\nadd r3, r2 => r1\nstore r1 => r2\noutput 1024\n",
+        "loadI 99999999999999999999 => r1\nstore r1 => r1\noutput 99999999999999999999\n",
+    ])
+    def test_same_schedule_as_default(self, monkeypatch, capsys, tmp_path, options, iloc_code):
+        path = tmp_path / "block.i"
+        path.write_text(iloc_code)
+
+        assert self.run(monkeypatch, capsys, "--stream", *options, str(path)) == self.run(monkeypatch, capsys, *options, str(path))
+
+    @pytest.mark.parametrize("option", [["--blocks"], ["--dce"], ["--dce-report"], ["--edge-report"], ["--ir-cache"], ["--cache", "dir"]])
+    def test_whole_ir_options_rejected(self, monkeypatch, capsys, tmp_path, option):
+        path = tmp_path / "block.i"
+        path.write_text("nop\n")
+
+        with pytest.raises(SystemExit):
+            self.run(monkeypatch, capsys, "--stream", *option, str(path))
+        assert f"{option[0]} cannot be used with --stream" in capsys.readouterr().err
+
+
+class TestDependencyGraphCSR:
+    # Test the compressed sparse row form of the graph
+
+    def csr_and_nodes(self, scanner, iloc_code):
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, _, _ = DependencyGraphGenerator.generate_dependency_graph(head)
+        return DependencyGraphGenerator.generate_dependency_graph_csr(head), nodes
+
+    def test_columns(self, scanner):
+        # Edges, kinds, VRs, latencies, and degrees of a small block, in both directions
+        graph, _ = self.csr_and_nodes(scanner, "loadI 0 => r0\nload r0 => r1\nstore r1 => r0\noutput 0\n")
+
+        assert len(graph) == 4
+        assert list(graph.out_offsets) == [0, 0, 1, 3, 4]
+        assert list(graph.out_targets) == [0, 1, 0, 2]
+        assert list(graph.out_kinds) == [Node.DATA, Node.DATA, Node.DATA, Node.CONFLICT]
+        assert list(graph.out_latencies) == [5, 5, 5, 1]
+        assert list(graph.out_degree) == [0, 1, 2, 1]
+        assert list(graph.in_degree) == [2, 1, 1, 0]
+        assert list(graph.parents(0)) == [1, 2]
+        assert graph.in_vrs[graph.in_offsets[0]] == graph.vrs3[0]
+        assert graph.roots() == [3] and graph.leaves() == [0]
+        assert graph.formatOP(2) == f"store r{graph.vrs1[2]} => r{graph.vrs3[2]}"
+
+    def test_matches_node_graph(self, scanner, test_data_dir):
+        # Same children, in the same order, and the same parents as the Node graph
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            graph, nodes = self.csr_and_nodes(scanner, file.read())
+        ids = {node: i for i, node in enumerate(nodes)}
+
+        for i, node in enumerate(nodes):
+            assert list(graph.children(i)) == [ids[child] for child in node.getChildren()]
+            assert list(graph.parents(i)) == [ids[parent] for parent in node.getParents()]
+            assert [graph.out_kinds[edge] for edge in range(graph.out_offsets[i], graph.out_offsets[i + 1])] == \
+                [node.getEdgeKind(child) for child in node.getChildren()]
+            assert graph.formatOP(i) == node.formatOP()
+
+    def test_pickle_round_trip(self, scanner):
+        # The arrays survive a pickle round trip; the formatting cache is not sent along
+        graph, _ = self.csr_and_nodes(scanner, "loadI 0 => r0\nload r0 => r1\nadd r1, r1 => r2\nstore r2 => r0\n")
+        graph.formatOP(0)
+
+        copy = pickle.loads(pickle.dumps(graph))
+
+        assert copy.formatted == {}
+        for name in ("opcodes", "out_offsets", "out_targets", "out_kinds", "out_latencies", "in_targets", "in_kinds"):
+            assert getattr(copy, name) == getattr(graph, name)
+        assert copy.formatOP(3) == graph.formatOP(3)
+
+    def test_constant_over_64_bits(self, scanner):
+        # Constants are kept whole, as in the Node graph
+        graph, nodes = self.csr_and_nodes(scanner, "loadI 99999999999999999999 => r0\nstore r0 => r0\noutput 18446744073709551616\n")
+
+        assert [graph.formatOP(i) for i in range(3)] == [node.formatOP() for node in nodes]
+        assert pickle.loads(pickle.dumps(graph)).constants == [99999999999999999999, 0, 2 ** 64]
+
+
+class TestNodeEdges:
+    # Test the compact edge storage of Node
+
+    def build(self, scanner, iloc_code):
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        return DependencyGraphGenerator.generate_dependency_graph(head)[0]
+
+    def test_get_edge_reports_type_and_dependency(self, scanner):
+        # Packed edges still read back as the edgeType / edgeDependency dicts
+        nodes = self.build(scanner, "loadI 4 => r1\nstore r1 => r1\noutput 4\n")
+
+        store, output = nodes[1], nodes[2]
+        assert store.getEdge(nodes[0]) == {"edgeType": "Data", "edgeDependency": f"r{nodes[0].OP.getData()[11]}"}
+        assert output.getEdge(store) == {"edgeType": "Conflict", "edgeDependency": ""}
+        assert output.getEdgeKind(store) == Node.CONFLICT
+        assert output.getEdgeLatency(store) == 1
+        assert store.getEdgeLatency(nodes[0]) == 5
+
+    def test_edge_latencies_stored_by_builder(self, scanner):
+        # Each edge carries its latency on the machine the graph was built for
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO("loadI 4 => r1\nload r1 => r2\nstore r2 => r1\noutput 4\n"), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        machine = MachineModel.compile_machine(dict(MachineModel.LAB3_MACHINE, latencies={"load": 9, "store": 4}, serial_latency=2))
+        nodes, _, _ = DependencyGraphGenerator.generate_dependency_graph(head, machine=machine)
+        load, store, output = nodes[1], nodes[2], nodes[3]
+
+        assert store.getEdgeLatency(load) == 4
+        assert output.getEdgeLatency(store) == 1
+        assert [(child, edge >> Node.LATENCY_SHIFT & Node.LATENCY_MASK) for child, edge in store.getEdges()] == \
+            [(load, 4), (nodes[0], 4)]
+        assert store.getEdgeLatency(load, MachineModel.DEFAULT_MACHINE) == 5
+        assert store.getEdgeVR(load) == load.OP.getData()[11]
+
+    def test_string_edge_arguments(self):
+        # setNewChild still accepts edge names and "rN" dependencies
+        parent = Node.Node(OP())
+        child = Node.Node(OP())
+        parent.OP.getData()[1] = 3
+
+        parent.setNewChild(child, "Serial")
+        assert parent.getEdge(child) == {"edgeType": "Serial", "edgeDependency": ""}
+        parent.setNewChild(child, "Data", "r12")
+        assert parent.getEdge(child) == {"edgeType": "Data", "edgeDependency": "r12"}
+        assert parent.getEdgeLatency(child) == 1
+
+    def test_containers_are_created_lazily(self):
+        # A node without edges allocates no containers but still answers like an empty set
+        node = Node.Node(OP())
+
+        assert node.edges is None and node.parents is None
+        assert len(node.getChildren()) == 0 and len(node.getParents()) == 0
+        assert not hasattr(node, "__dict__") and not hasattr(node.OP, "__dict__")
@@ -0,0 +1,160 @@
+import pytest
+import json
+from io import StringIO
+import Parser
+import Renamer
+import DependencyGraphGenerator
+import PriorityCalculator
+import Scheduler
+import ScheduleWriter
+import MachineModel
+
+
+def schedule(scanner, iloc_code, machine):
+    head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+    Renamer.renaming(tail, num_ops, max_sr)
+    nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head, machine=machine or MachineModel.DEFAULT_MACHINE)
+    nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+    writer = ScheduleWriter.ListWriter()
+    cycle_count = Scheduler.schedule(nodes, roots, leaves, writer=writer, machine=machine)
+    return cycle_count, writer.lines
+
+
+def machine(**changes):
+    description = json.loads(json.dumps(MachineModel.LAB3_MACHINE))
+    description.update(changes)
+    return MachineModel.compile_machine(description)
+
+
+class TestMachineTables:
+    # Test compiling machine descriptions into lookup tables
+
+    def test_lab3_machine(self):
+        # The default machine is the one the scheduler was written for
+        lab3 = MachineModel.DEFAULT_MACHINE
+
+        assert lab3.units == ["f0", "f1"]
+        assert lab3.issue_width == 2
+        assert lab3.latency == [5, 1, 5, 1, 1, 3, 1, 1, 1, 1]
+        assert lab3.unit_mask == [1, 3, 1, 3, 3, 2, 3, 3, 3, 0]
+        # load/store, the ALU ops, mult, output (limited to one per cycle), and nop
+        assert len(lab3.class_mask) == 5
+        assert lab3.class_limit[lab3.opcode_class[8]] == 1
+        # ALU ops try f1 first, keeping f0 (which also takes loads and stores) free
+        assert lab3.class_units[lab3.opcode_class[3]] == [1, 0]
+
+    def test_load_json_and_toml(self, tmp_path):
+        # Both formats compile to the same tables
+        json_path = tmp_path / "lab3.json"
+        json_path.write_text(json.dumps(MachineModel.LAB3_MACHINE))
+        toml_path = tmp_path / "lab3.toml"
+        toml_path.write_text(
+            'name = "lab3"\nissue_width = 2\ndefault_latency = 1\nserial_latency = 1\n'
+            'latencies = { load = 5, store = 5, mult = 3 }\nper_cycle = { output = 1 }\n'
+            '[[units]]\nname = "f0"\nopcodes = ["load", "store", "loadI", "add", "sub", "lshift", "rshift", "output"]\n'
+            '[[units]]\nname = "f1"\nopcodes = ["loadI", "add", "sub", "mult", "lshift", "rshift", "output"]\n')
+
+        from_json = MachineModel.load_machine(str(json_path))
+        from_toml = MachineModel.load_machine(str(toml_path))
+
+        assert from_json.fingerprint() == from_toml.fingerprint() == MachineModel.DEFAULT_MACHINE.fingerprint()
+        assert from_toml.class_units == MachineModel.DEFAULT_MACHINE.class_units
+
+    @pytest.mark.parametrize("changes, message", [
+        ({"units": []}, "non-empty list of units"),
+        ({"units": [{"name": "f0", "opcodes": ["load", "store"]}]}, "no unit accepts loadI"),
+        ({"units": [{"name": "f0", "opcodes": ["jump"]}]}, "unknown opcode 'jump'"),
+        ({"latencies": {"load": 0}}, "latency of load"),
+        ({"serial_latency": 70000}, "serial_latency must be at most 65535"),
+        ({"pipelines": 2}, "unknown machine description keys: pipelines"),
+    ])
+    def test_invalid_descriptions(self, changes, message):
+        # Mistakes are reported as ValueErrors naming the problem
+        with pytest.raises(ValueError, match=message):
+            machine(**changes)
+
+
+class TestMachineScheduling:
+    # Test that the graph and the scheduler follow the machine tables
+
+    def test_latencies_come_from_the_machine(self, scanner):
+        # A two-cycle load shortens both the critical path and the schedule
+        iloc_code = "loadI 0 => r0\nload r0 => r1\nadd r1, r1 => r2\noutput 0\n"
+
+        default_cycles, _ = schedule(scanner, iloc_code, None)
+        fast_cycles, fast_lines = schedule(scanner, iloc_code, machine(latencies={"load": 2, "store": 2, "mult": 3}))
+
+        assert default_cycles - fast_cycles == 3
+        assert "add" in fast_lines[3]
+
+    def test_reweighing_matches_building_for_the_machine(self, scanner, test_data_dir):
+        # Edge latencies stored by the builder give the priorities calculatePriorities(machine=...)
+        # works out from a graph built for the lab3 machine
+        slow = machine(latencies={"load": 7, "store": 2, "mult": 4}, serial_latency=2)
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        built, _, _ = DependencyGraphGenerator.generate_dependency_graph(head, machine=slow)
+        reweighed, _, _ = DependencyGraphGenerator.generate_dependency_graph(head)
+
+        PriorityCalculator.calculatePriorities(built, [], [], priority="slack + successor_latency")
+        PriorityCalculator.calculatePriorities(reweighed, [], [], priority="slack + successor_latency", machine=slow)
+
+        assert [node.priority for node in built] == [node.priority for node in reweighed]
+        assert [node.latency for node in built] == [node.latency for node in reweighed]
+
+    def test_three_unit_machine(self, scanner):
+        # Three independent adds issue together on a machine with three ALU units
+        units = [{"name": f"f{u}", "opcodes": ["load", "store", "loadI", "add", "sub", "mult", "lshift", "rshift", "output"]}
+                 for u in range(3)]
+        iloc_code = "loadI 1 => r1\nadd r1, r1 => r2\nadd r1, r1 => r3\nadd r1, r1 => r4\n"
+
+        cycle_count, lines = schedule(scanner, iloc_code, machine(units=units, issue_width=3))
+
+        assert cycle_count == 2
+        assert lines[1].count("add") == 3
+        assert lines[0].count("nop") == 2
+
+    def test_issue_width_caps_the_cycle(self, scanner):
+        # With an issue width of one, the second unit never gets an operation
+        iloc_code = "loadI 1 => r1\nloadI 2 => r2\nadd r1, r2 => r3\n"
+
+        cycle_count, lines = schedule(scanner, iloc_code, machine(issue_width=1))
+
+        assert cycle_count == 3
+        assert all(line.count("nop") == 1 for line in lines)
+
+
+class TestMachineSlots:
+    # Test the per-cycle slot tables
+
+    def test_assign_keeps_greedy_choice_when_it_fits(self):
+        # ALU ops take f1 first; a later mult moves an earlier ALU op to f0
+        lab3 = MachineModel.DEFAULT_MACHINE
+        alu, mult, memory = (lab3.opcode_class[opcode] for opcode in (3, 5, 0))
+
+        assert lab3.assign([alu, memory]) == (1, 0)
+        assert lab3.assign([alu, alu]) == (1, 0)
+        assert lab3.assign([alu, mult]) == (0, 1)
+        assert lab3.assign([memory, memory]) is None
+
+    def test_addable_classes(self):
+        # After a load, only f1 is left: no second load, but mult, ALU ops, output, and nop fit
+        lab3 = MachineModel.DEFAULT_MACHINE
+        memory = lab3.opcode_class[0]
+        state = lab3.pick(0, memory)
+
+        assert lab3.picks(state) == [memory]
+        assert lab3.addable[state] == sum(1 << c for c in range(len(lab3.class_mask)) if c != memory)
+        assert lab3.addable[lab3.pick(state, lab3.opcode_class[3])] == 0
+
+    def test_eight_wide_cycle(self, scanner):
+        # Eight independent adds issue in a single cycle of an eight-unit machine
+        units = [{"name": f"f{u}", "opcodes": ["load", "store", "loadI", "add", "sub", "mult", "lshift", "rshift", "output"]}
+                 for u in range(8)]
+        iloc_code = "loadI 1 => r1\n" + "".join(f"add r1, r1 => r{i}\n" for i in range(2, 10))
+
+        cycle_count, lines = schedule(scanner, iloc_code, machine(units=units, issue_width=8))
+
+        assert cycle_count == 2
+        assert lines[1].count("add") == 8
@@ -1,9 +1,19 @@
 import pytest
 from io import StringIO
-from Scanner import Scanner
+import os
+from Scanner import Scanner, TableScanner
 import Parser
 
 
+def ir_rows(head):
+    # Copies of the OP data lists of an IR, in order
+    rows = []
+    while head:
+        rows.append(list(head.getData()))
+        head = head.getNext()
+    return rows
+
+
 class TestParserBasicInstructions:
     # Test parsing basic ILOC instructions into IR
 
@@ -340,3 +350,238 @@ class TestParserIRToString:
         assert "loadI" in captured.out
         assert "add" in captured.out
         assert "output" in captured.out
+
+
+class TestParserTableEngine:
+    # Test parseILOC with the table-driven scanner (table=True)
+
+    def test_table_engine_matches_classic(self, scanner, test_data_dir):
+        # Both engines should build the same IR for every test data file
+        for name in sorted(os.listdir(test_data_dir)):
+            with open(os.path.join(test_data_dir, name), "r") as file:
+                expected = Parser.parseILOC(file, False, False, False, scanner)
+            with open(os.path.join(test_data_dir, name), "r") as file:
+                actual = Parser.parseILOC(file, False, False, False, TableScanner(), table=True)
+
+            assert ir_rows(actual[0]) == ir_rows(expected[0]), name
+            assert actual[2:] == expected[2:], name
+
+    def test_table_engine_constant_over_64_bits(self, scanner):
+        # Constants too large for int64 parse as they do in the classic engine
+        iloc_code = "loadI 99999999999999999999 => r1\noutput 18446744073709551616\n"
+
+        expected = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        actual = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner, table=True)
+
+        assert ir_rows(actual[0]) == ir_rows(expected[0])
+        assert actual[0].getData()[2] == 99999999999999999999
+
+    def test_table_engine_accepts_plain_scanner(self, scanner):
+        # A plain Scanner is swapped for a TableScanner
+        file = StringIO("add r1, r2 => r3\n")
+
+        head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner, table=True)
+
+        assert head.getData()[:3] == [1, 3, 1]
+        assert max_sr == 3
+
+    def test_table_engine_reports_errors(self, scanner, capsys):
+        # Invalid lines are reported the same way as the classic engine
+        iloc_code = "foo r1 => r2\nadd r1 r2 => r3\nnop\n"
+
+        Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        expected = capsys.readouterr().err
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner, table=True)
+        actual = capsys.readouterr().err
+
+        assert actual == expected
+        assert num_ops == 2
+        assert head.getData()[1] == 9
+
+
+class TestParserBuffer:
+    # Test the whole-file parse path (parseILOC_buffer / parseILOC_file)
+
+    def test_file_matches_classic(self, scanner, test_data_dir):
+        # The memory-mapped path should build the same IR for every test data file
+        for name in sorted(os.listdir(test_data_dir)):
+            with open(os.path.join(test_data_dir, name), "r") as file:
+                expected = Parser.parseILOC(file, False, False, False, scanner)
+            with open(os.path.join(test_data_dir, name), "rb") as file:
+                actual = Parser.parseILOC_file(file, False, False, scanner)
+
+            assert ir_rows(actual[0]) == ir_rows(expected[0]), name
+            assert actual[2:] == expected[2:], name
+
+    def test_buffer_all_operations(self, scanner):
+        # Every operation kind is parsed from the buffer
+        iloc_code = (b"load r1 => r2\nloadI 7 => r3\nstore r3 => r2\nadd r1, r2 => r4\nsub r1, r2 => r5\n"
+                     b"mult r1, r2 => r6\nlshift r1, r2 => r7\nrshift r1, r2 => r8\noutput 12\nnop\n")
+
+        head, tail, num_ops, max_sr = Parser.parseILOC_buffer(iloc_code, False, False, scanner)
+
+        rows = ir_rows(head)
+        assert [row[1] for row in rows] == list(range(10))
+        assert rows[1][2] == 7 and rows[1][10] == 3
+        assert rows[8][2] == 12
+        assert num_ops == 10
+        assert max_sr == 8
+
+    def test_buffer_crlf_line_endings(self, scanner):
+        # Windows line endings are translated like a file opened in text mode
+        head, tail, num_ops, max_sr = Parser.parseILOC_buffer(b"loadI 1 => r1\r\n// c\r\nnop\r\n", False, False, scanner)
+
+        assert num_ops == 2
+        assert tail.getData()[0] == 3
+
+    def test_buffer_reports_errors(self, scanner, capsys):
+        # Lines the fast path does not recognize are checked by the table scanner
+        iloc_code = "foo r1 => r2\nadd r1 r2 => r3\nloadI 5 => r1"
+
+        Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        expected = capsys.readouterr().err
+        head, tail, num_ops, max_sr = Parser.parseILOC_buffer(iloc_code.encode(), False, False, scanner)
+        actual = capsys.readouterr().err
+
+        assert actual == expected
+        assert head is None
+        assert num_ops == 2
+
+    @pytest.mark.parametrize("iloc_code", [
+        "loadI 99999999999999999999 => r1",
+        "loadI 99999999999999999999 => r1\noutput 99999999999999999999",
+        "loadI 18446744073709551616 => r1\nstore r1 => r1\n",
+    ])
+    def test_constant_over_64_bits(self, scanner, capsys, iloc_code):
+        # Large constants, including on a last line without a newline (which the table scanner
+        # handles), give the classic parser's IR and errors
+        expected = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        expected_err = capsys.readouterr().err
+        actual = Parser.parseILOC_buffer(iloc_code.encode(), False, False, scanner)
+
+        assert capsys.readouterr().err == expected_err
+        assert ir_rows(actual[0]) == ir_rows(expected[0])
+        assert actual[2:] == expected[2:]
+
+    def test_empty_file(self, scanner, tmp_path):
+        # Empty files cannot be memory-mapped and are read instead
+        path = tmp_path / "empty.iloc"
+        path.write_bytes(b"")
+
+        with open(path, "rb") as file:
+            head, tail, num_ops, max_sr = Parser.parseILOC_file(file, False, False, scanner)
+
+        assert head is None
+        assert num_ops == 0
+
+
+class TestParserIRCache:
+    # Test the binary IR cache written next to the input
+
+    ILOC = b"loadI 8 => r1\n// comment\nload r1 => r2\nadd r1, r2 => r3\noutput 8\nnop\n"
+
+    def parse(self, path, scanner, **kwargs):
+        with open(path, "rb") as file:
+            return Parser.parseILOC_file(file, False, False, scanner, ir_cache=True, **kwargs)
+
+    def test_cache_written_and_loaded(self, scanner, tmp_path):
+        # The second parse loads the same IR from NAME.ir
+        path = tmp_path / "block.iloc"
+        path.write_bytes(self.ILOC)
+
+        parsed = self.parse(path, scanner)
+        assert os.path.exists(str(path) + Parser.IR_CACHE_SUFFIX)
+        loaded = self.parse(path, None)
+
+        assert ir_rows(loaded[0]) == ir_rows(parsed[0])
+        assert loaded[0].getNext().getPrev() is loaded[0]
+        assert loaded[1].getData()[1] == 9
+        assert loaded[2:] == parsed[2:] == (5, 3)
+
+    def test_cache_loaded_as_columns(self, scanner, tmp_path):
+        # The columnar parse loads the cache without building OPs
+        path = tmp_path / "block.iloc"
+        path.write_bytes(self.ILOC)
+
+        expected, num_ops, max_sr = self.parse(path, scanner, columnar=True)
+        loaded, loaded_num_ops, loaded_max_sr = self.parse(path, scanner, columnar=True)
+
+        assert [list(column) for column in loaded.columns] == [list(column) for column in expected.columns]
+        assert (loaded_num_ops, loaded_max_sr) == (num_ops, max_sr)
+
+    def test_changed_content_is_reparsed(self, scanner, tmp_path):
+        # A cache for other content (or another parser version) is ignored and replaced
+        path = tmp_path / "block.iloc"
+        path.write_bytes(self.ILOC)
+        self.parse(path, scanner)
+        path.write_bytes(b"output 3\n")
+
+        head, tail, num_ops, max_sr = self.parse(path, scanner)
+
+        assert ir_rows(head)[0][2] == 3
+        assert Parser.load_ir_cache(str(path) + Parser.IR_CACHE_SUFFIX, b"0" * 32) is None
+
+    def test_invalid_lines_are_not_cached(self, scanner, tmp_path, capsys):
+        # Inputs with errors are parsed (and reported) every time
+        path = tmp_path / "block.iloc"
+        path.write_bytes(b"output 3\nfoo r1\n")
+
+        self.parse(path, scanner)
+        self.parse(path, scanner)
+
+        assert not os.path.exists(str(path) + Parser.IR_CACHE_SUFFIX)
+        assert capsys.readouterr().err.count("ERROR 2") >= 2
+
+    @pytest.mark.parametrize("constant", [2 ** 63 - 1, 2 ** 64])
+    def test_values_columns_cannot_hold_are_not_cached(self, scanner, tmp_path, constant):
+        # The cache is int64 columns with INF as a sentinel, so these inputs are parsed every time
+        path = tmp_path / "block.iloc"
+        path.write_bytes(f"loadI {constant} => r1\noutput 4\n".encode())
+
+        head = self.parse(path, scanner)[0]
+
+        assert head.getData()[2] == constant
+        assert not os.path.exists(str(path) + Parser.IR_CACHE_SUFFIX)
+
+    def test_text_file_through_parseILOC(self, scanner, tmp_path):
+        # parseILOC(ir_cache=True) builds the same IR as the classic parser
+        path = tmp_path / "block.iloc"
+        path.write_bytes(self.ILOC)
+        with open(path, "r") as file:
+            expected = Parser.parseILOC(file, False, False, False, scanner)
+
+        for _ in range(2):
+            with open(path, "r") as file:
+                actual = Parser.parseILOC(file, False, False, False, scanner, ir_cache=True)
+            assert ir_rows(actual[0]) == ir_rows(expected[0])
+            assert actual[2:] == expected[2:]
+
+
+class TestParserStream:
+    # Test the streaming parser (streamILOC)
+
+    def test_stream_yields_operations_in_order(self, scanner):
+        # Operations come out one at a time, unlinked
+        iloc_code = "loadI 5 => r1\n// comment\nadd r1, r1 => r2\noutput 4\n"
+
+        operations = list(Parser.streamILOC(StringIO(iloc_code), scanner))
+
+        assert [op.getData()[1] for op in operations] == [1, 3, 8]
+        assert [op.getData()[0] for op in operations] == [1, 3, 4]
+        assert all(op.getNext() is None for op in operations)
+
+    def test_stream_is_lazy(self, scanner):
+        # Only the lines needed for the next operation are read
+        file = StringIO("loadI 5 => r1\nloadI 6 => r2\n")
+        operations = Parser.streamILOC(file, scanner)
+
+        next(operations)
+
+        assert file.tell() == len("loadI 5 => r1\n")
+
+    def test_stream_skips_invalid_lines(self, scanner, capsys):
+        # Invalid lines are reported and left out
+        operations = list(Parser.streamILOC(StringIO("foo\nnop\n"), scanner))
+
+        assert len(operations) == 1
+        assert "ERROR" in capsys.readouterr().err
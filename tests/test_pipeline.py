@@ -0,0 +1,108 @@
+import pytest
+import os
+import Pipeline
+
+
+class TestSplitBlocks:
+    # Test splitting multi-block files on the end-of-block marker
+
+    def test_split_on_marker_lines(self):
+        # Each marker line ends (and stays with) its block
+        buf = b"loadI 1 => r1\n//end of block\nloadI 2 => r2\n//end of block\n"
+
+        blocks = Pipeline.split_blocks(buf)
+
+        assert blocks == [b"loadI 1 => r1\n//end of block\n", b"loadI 2 => r2\n//end of block\n"]
+
+    def test_trailing_block_without_marker(self):
+        # Text after the last marker is its own block
+        blocks = Pipeline.split_blocks(b"nop\n//end of block\noutput 4\n")
+
+        assert blocks[-1] == b"output 4\n"
+
+    def test_blank_trailer_is_not_a_block(self):
+        # Whitespace after the last marker is dropped
+        blocks = Pipeline.split_blocks(b"output 4\n\t//end of block\n\n  \n")
+
+        assert len(blocks) == 1
+
+    def test_no_marker_is_one_block(self):
+        # A single-block file comes back whole
+        assert Pipeline.split_blocks(b"output 1\noutput 2\n") == [b"output 1\noutput 2\n"]
+
+
+class TestScheduleBlocks:
+    # Test scheduling blocks in this process and on the process pool
+
+    BLOCKS = [
+        b"loadI 5 => r1\nloadI 10 => r2\nadd r1, r2 => r3\n",
+        b"output 100\noutput 200\n",
+        b"loadI 4 => r1\nload r1 => r2\nmult r2, r2 => r3\nstore r3 => r1\n",
+    ]
+
+    def test_schedule_block_output(self):
+        # One block produces the same text lab3.py prints
+        schedule = Pipeline.schedule_block(self.BLOCKS[1])
+
+        assert schedule == "[ nop ; output 100 ]\n[ nop ; output 200 ]\n"
+
+    def test_pool_keeps_input_order(self):
+        # Schedules from the pool come back in block order
+        serial = Pipeline.schedule_blocks(self.BLOCKS, workers=1)
+        parallel = Pipeline.schedule_blocks(self.BLOCKS, workers=2)
+
+        assert [len(schedule.splitlines()) for schedule in parallel] == [len(schedule.splitlines()) for schedule in serial]
+        assert parallel[1] == serial[1]
+
+    def test_empty_block_list(self):
+        # Nothing to schedule gives nothing back
+        assert Pipeline.schedule_blocks([], workers=4) == []
+
+
+class TestScheduleFiles:
+    # Test the many-file batch path
+
+    def test_collect_inputs_directory_and_manifest(self, tmp_path):
+        # Directories expand to their files; manifest paths are relative to the manifest
+        (tmp_path / "blocks").mkdir()
+        (tmp_path / "blocks" / "b.iloc").write_text("nop\n")
+        (tmp_path / "blocks" / "a.iloc").write_text("nop\n")
+        (tmp_path / "blocks" / "nested").mkdir()
+        manifest = tmp_path / "manifest.txt"
+        manifest.write_text("# comment\n\nblocks/b.iloc\n")
+
+        inputs = Pipeline.collect_inputs([str(tmp_path / "blocks")], str(manifest))
+
+        assert inputs == [str(tmp_path / "blocks" / "b.iloc"), str(tmp_path / "blocks" / "a.iloc"),
+                          str(tmp_path / "blocks" / "b.iloc")]
+
+    def test_failure_does_not_stop_other_files(self, test_data_dir, tmp_path):
+        # A missing file is reported and the rest are still scheduled, in order
+        paths = [f"{test_data_dir}/serial_outputs.iloc", str(tmp_path / "missing.iloc"), f"{test_data_dir}/simple_add.iloc"]
+
+        results = list(Pipeline.schedule_files(paths, workers=2))
+
+        assert [path for path, _, _ in results] == paths
+        assert results[0][1] == "[ nop ; output 100 ]\n[ nop ; output 200 ]\n"
+        assert results[1][1] is None
+        assert "FileNotFoundError" in results[1][2]
+        assert results[2][1] is not None
+
+    def test_invalid_lines_are_reported_per_file(self, test_data_dir):
+        # Parse errors are captured with the file they came from
+        path, schedule, messages = Pipeline.schedule_file(f"{test_data_dir}/invalid_unknown_op.iloc")
+
+        assert schedule is not None
+        assert "ERROR" in messages
+
+    def test_batch_cli_writes_one_file_per_input(self, test_data_dir, tmp_path, capsys):
+        # batch.py -o writes <name>.sched per input and reports failures in the exit status
+        import batch
+        output_dir = tmp_path / "out"
+
+        status = batch.main(["-j", "1", "-o", str(output_dir), f"{test_data_dir}/serial_outputs.iloc",
+                             f"{test_data_dir}/serial_outputs.iloc", str(tmp_path / "missing.iloc")])
+
+        assert status == 1
+        assert sorted(os.listdir(output_dir)) == ["serial_outputs.iloc-1.sched", "serial_outputs.iloc.sched"]
+        assert "scheduled 2 of 3 files" in capsys.readouterr().err
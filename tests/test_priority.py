@@ -110,6 +110,19 @@ class TestPriorityFormula:
             assert node.priority >= 0
 
 
+    def test_default_priority_is_ten_times_latency(self, scanner, test_data_dir):
+        # The original formula leaves descendants out, even where nodes have them
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+
+        assert any(node.getChildren() for node in nodes)
+        assert [node.priority for node in nodes] == [10 * node.latency for node in nodes]
+
+
 class TestPrioritySorting:
     # Test that results are sorted by priority
 
@@ -219,3 +232,173 @@ class TestPriorityEdgeCases:
         for node in nodes:
             assert node.priority is not None
             assert node.priority >= 0
+
+
+class TestPriorityTopologicalLatency:
+    # Test the single-pass (topological order) latency computation
+
+    def build(self, scanner, iloc_code):
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        return DependencyGraphGenerator.generate_dependency_graph(head)
+
+    def test_longest_weighted_path(self, scanner):
+        # Latency is the longest path from a root, with the parent's latency on each edge
+        nodes, roots, leaves = self.build(scanner, "loadI 4 => r1\nload r1 => r2\nmult r2, r2 => r3\nstore r3 => r1\n")
+
+        order = PriorityCalculator.topological_latencies(nodes)
+
+        # store (root) -> mult (5) -> load (+3) -> loadI (+5); the direct store -> loadI edge is shorter
+        assert [node.latency for node in nodes] == [13, 8, 5, 0]
+        assert order == [nodes[3], nodes[2], nodes[1], nodes[0]]
+
+    def test_each_edge_visited_once(self, scanner, monkeypatch):
+        # Diamond ladders have exponentially many paths but only O(V + E) work
+        calls = []
+        original = PriorityCalculator.Node.getEdges
+        monkeypatch.setattr(PriorityCalculator.Node, "getEdges", lambda node: calls.extend(original(node)) or original(node))
+
+        for steps in (1000, 8000):
+            iloc_code = "loadI 1 => r1\n" + "add r1, r1 => r2\nadd r1, r1 => r3\nadd r2, r3 => r1\n" * steps
+            nodes, roots, leaves = self.build(scanner, iloc_code)
+            edges = sum(len(node.getChildren()) for node in nodes)
+            calls.clear()
+
+            PriorityCalculator.topological_latencies(nodes)
+
+            assert len(calls) == edges == 4 * steps
+            assert nodes[0].latency == 2 * steps
+
+
+class TestPriorityExactDescendants:
+    # Test exact descendant counts from bitset reachability
+
+    DIAMONDS = "loadI 1 => r1\n" + "add r1, r1 => r2\nadd r1, r1 => r3\nadd r2, r3 => r1\n" * 20
+
+    def build(self, scanner, iloc_code):
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        return DependencyGraphGenerator.generate_dependency_graph(head)
+
+    def test_distinct_descendants_in_diamonds(self, scanner):
+        # Shared descendants are counted once, however many paths reach them
+        nodes, roots, leaves = self.build(scanner, self.DIAMONDS)
+
+        counts = PriorityCalculator.exact_descendants(nodes)
+
+        def reachable(node):
+            seen = set()
+            stack = list(node.getChildren())
+            while stack:
+                child = stack.pop()
+                if child not in seen:
+                    seen.add(child)
+                    stack.extend(child.getChildren())
+            return len(seen)
+        assert [counts[node] for node in nodes] == [reachable(node) for node in nodes]
+        assert counts[nodes[-1]] == len(nodes) - 1
+
+    def test_chunked_matches_one_pass(self, scanner, test_data_dir):
+        # Any chunk size gives the same counts
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        for iloc_nodes in (DependencyGraphGenerator.generate_dependency_graph(head)[0], self.build(scanner, self.DIAMONDS)[0]):
+            expected = PriorityCalculator.exact_descendants(iloc_nodes)
+            for chunk_size in (1, 3, 16):
+                assert PriorityCalculator.exact_descendants(iloc_nodes, chunk_size=chunk_size) == expected
+
+    def test_exact_priority_term(self, scanner):
+        # priority = 10 * latency + distinct descendants
+        nodes, roots, leaves = self.build(scanner, "loadI 1 => r1\nadd r1, r1 => r2\nadd r1, r1 => r3\nadd r2, r3 => r4\n")
+
+        sorted_nodes, sorted_roots, sorted_leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves, "exact")
+
+        assert [node.priority for node in nodes] == [20, 11, 11, 3]
+        assert sorted_nodes[0] is nodes[0]
+
+    def test_unknown_term(self, scanner):
+        # Anything but "exact" is rejected
+        nodes, roots, leaves = self.build(scanner, "nop\n")
+
+        with pytest.raises(ValueError):
+            PriorityCalculator.calculatePriorities(nodes, roots, leaves, "longest")
+
+
+class TestPriorityRegistry:
+    # Test the registry of priority functions and weighted specs
+
+    BLOCK = "loadI 4 => r1\nload r1 => r2\nloadI 8 => r3\nadd r2, r3 => r4\nstore r4 => r1\noutput 4\n"
+
+    def build(self, scanner, iloc_code):
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        return DependencyGraphGenerator.generate_dependency_graph(head)
+
+    def test_critical_path_spec_matches_default(self, scanner):
+        # "10*critical_path" reproduces the built-in formula
+        nodes, roots, leaves = self.build(scanner, self.BLOCK)
+        PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+        expected = [node.priority for node in nodes]
+
+        PriorityCalculator.calculatePriorities(nodes, roots, leaves, priority="10*critical_path")
+
+        assert [node.priority for node in nodes] == expected
+
+    def test_parse_weighted_sum(self):
+        # Weights may come before or after the name, and terms may be subtracted
+        terms = PriorityCalculator.parse_priority("10*critical_path + descendants - fan_out*0.5")
+
+        assert [(weight, function.__name__) for weight, function in terms] == [
+            (10, "critical_path"), (1, "descendants"), (-0.5, "fan_out")]
+        with pytest.raises(ValueError):
+            PriorityCalculator.parse_priority("critical_path + unknown")
+        with pytest.raises(ValueError):
+            PriorityCalculator.parse_priority("x*fan_out")
+
+    def test_parse_exponent_weights(self):
+        # The sign of an exponent does not start a new term
+        terms = PriorityCalculator.parse_priority("1e-3*fan_out + critical_path - 2.5E+2*slack")
+
+        assert [(weight, function.__name__) for weight, function in terms] == [
+            (1e-3, "fan_out"), (1, "critical_path"), (-250.0, "slack")]
+
+    def test_builtin_functions(self, scanner):
+        # One value per node, in the graph's topological order
+        nodes, roots, leaves = self.build(scanner, self.BLOCK)
+        order = PriorityCalculator.topological_latencies(nodes)
+        graph = PriorityCalculator.PriorityGraph(order)
+        position = {node: i for i, node in enumerate(order)}
+        loadI_4, load, loadI_8, add, store, output = (position[node] for node in nodes)
+
+        fan_out = PriorityCalculator.fan_out(graph)
+        assert fan_out[loadI_4] == 2 and fan_out[output] == 0
+        slack = PriorityCalculator.slack(graph)
+        assert max(slack) == 0 and slack[loadI_4] == 0 and slack[loadI_8] < 0
+        successor_latency = PriorityCalculator.successor_latency(graph)
+        assert successor_latency[loadI_4] == 5 + 5
+        pressure = PriorityCalculator.register_pressure(graph)
+        # add reads r2 and r3 (sole reader of both) and defines r4; store shares r1 with load
+        assert pressure[add] == 1 and pressure[store] == 1.5 and pressure[loadI_4] == -1
+
+    def test_registered_function_is_selectable(self, scanner, monkeypatch):
+        # New functions join the registry by name
+        monkeypatch.setitem(PriorityCalculator.PRIORITY_FUNCTIONS, "line", lambda graph: [node.getOPNum() for node in graph.nodes])
+        nodes, roots, leaves = self.build(scanner, self.BLOCK)
+
+        sorted_nodes, _, _ = PriorityCalculator.calculatePriorities(nodes, roots, leaves, priority="-1*line")
+
+        assert sorted_nodes[0] is nodes[0]
+
+    def test_priority_through_pipeline_and_cache(self, tmp_path):
+        # Each priority spec is its own schedule cache entry
+        import Pipeline
+        from ScheduleCache import ScheduleCache
+        cache = ScheduleCache(str(tmp_path))
+        block = self.BLOCK.encode()
+
+        Pipeline.schedule_block(block, cache)
+        Pipeline.schedule_block(block, cache, "slack")
+        Pipeline.schedule_block(block, cache, "slack")
+
+        assert (cache.hits, cache.misses) == (1, 2)
@@ -217,3 +217,52 @@ class TestRenamerPreservesStructure:
         # Opcodes should remain unchanged
         assert head.getData()[1] == opcode1_before
         assert head.getNext().getData()[1] == opcode2_before
+
+
+class TestRenamerForward:
+    # Test the streaming forward renamer
+
+    def test_forward_renaming_links_defs_to_uses(self, scanner):
+        # A use gets the VR of the most recent definition of its SR
+        iloc_code = "loadI 5 => r1\nadd r1, r1 => r1\nstore r1 => r2\n"
+
+        loadI, add, store = Renamer.renaming_forward(Parser.streamILOC(StringIO(iloc_code), scanner))
+
+        assert add.getData()[3] == loadI.getData()[11]
+        assert add.getData()[7] == loadI.getData()[11]
+        assert store.getData()[3] == add.getData()[11]
+        assert add.getData()[11] != loadI.getData()[11]
+
+    def test_forward_renaming_live_in_registers(self, scanner):
+        # A register used before any definition gets its own VR, shared by later uses
+        iloc_code = "store r1 => r2\nload r2 => r3\n"
+
+        store, load = Renamer.renaming_forward(Parser.streamILOC(StringIO(iloc_code), scanner))
+
+        assert store.getData()[7] is None
+        assert load.getData()[3] == store.getData()[11]
+        assert store.getData()[3] != store.getData()[11]
+
+    def test_forward_renaming_is_lazy(self, scanner):
+        # Each operation is renamed as it arrives
+        stream = Renamer.renaming_forward(Parser.streamILOC(StringIO("loadI 5 => r1\nfoo\n"), scanner))
+
+        first = next(stream)
+
+        assert first.getData()[11] == 0
+
+    def test_renaming_names_match_renaming(self, scanner):
+        # Mapping the forward VRs gives every operand the VR renaming() gives it
+        iloc_code = "loadI 5 => r1\nload r1 => r2\nloadI 8 => r3\nadd r2, r4 => r1\nstore r1 => r3\nmult r1, r1 => r5\n"
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        operations = list(Renamer.renaming_forward(Parser.streamILOC(StringIO(iloc_code), scanner)))
+
+        names = Renamer.renaming_names((op.getData()[1], op.getData()[3], op.getData()[7], op.getData()[11]) for op in reversed(operations))
+
+        expected = head
+        for op in operations:
+            for index in (3, 7, 11):
+                forward = op.getData()[index]
+                assert (None if forward is None else names[forward]) == expected.getData()[index]
+            expected = expected.getNext()
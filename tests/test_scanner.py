@@ -1,5 +1,5 @@
 import pytest
-from Scanner import Scanner
+from Scanner import Scanner, TableScanner, ERROR
 
 
 class TestScannerBasicTokens:
@@ -347,3 +347,72 @@ class TestScannerKnownLimitations:
         token, idx, lexeme = scanner.next_token(0, line, False, 1)
 
         assert token == 2  # This will fail (documented bug)
+
+
+class TestTableScanner:
+    # Test the table-driven scanner against the hand-written one
+
+    LINES = [
+        "loadI 100 => r1\n", "load r1 => r2\n", "store r1 => r2\n", "add r1, r2 => r3\n",
+        "sub r1, r2 => r3\n", "mult r1, r2 => r3\n", "lshift r1, r2 => r3\n", "rshift r1, r2 => r3\n",
+        "output 100\n", "nop\n", "\tadd\tr20, r19\t=>r7\t// comment\n", "// comment\n", "\n",
+        "loadX\n", "addd\n", "stor\n", "rs\n", "rx\n", "r", "rs", "lo", "loadI", "=", "=x", "/x", "/",
+        "r123", "12345", "   ", "xyz\n", "loadI\xa05\xa0=>\xa0r1\n",
+        "loadI 99999999999999999999 => r1\n", "output 99999999999999999999",
+    ]
+
+    def test_next_token_matches_scanner(self, scanner, capsys):
+        # Every start index of every line should give the same result and stream output
+        table_scanner = TableScanner()
+        for line in self.LINES:
+            for idx in range(len(line) + 1):
+                for stream in (False, True):
+                    expected = scanner.next_token(idx, line, stream, 7)
+                    expected_out = capsys.readouterr().out
+                    actual = table_scanner.next_token(idx, line, stream, 7)
+                    actual_out = capsys.readouterr().out
+
+                    assert actual == expected, (line, idx)
+                    assert actual_out == expected_out, (line, idx)
+
+    def test_scan_line_arithop(self):
+        # A whole line comes back as one flat array of (category, value) pairs
+        tokens = TableScanner().scan_line("add r1, r22 => r3 // sum\n")
+
+        assert list(tokens) == [0, 3, 5, 1, 6, 0, 5, 22, 7, 0, 5, 3, 9, 0]
+
+    def test_scan_line_loadI_bytes(self):
+        # Bytes lines are scanned directly
+        tokens = TableScanner().scan_line(b"loadI 42 => r1\n")
+
+        assert list(tokens) == [2, 1, 10, 42, 7, 0, 5, 1, 9, 0]
+
+    def test_scan_line_error_ends_line(self):
+        # An invalid lexeme ends the line with an ERROR token
+        tokens = TableScanner().scan_line("add r1, x => r3\n")
+
+        assert list(tokens) == [0, 3, 5, 1, 6, 0, ERROR, 0]
+
+    def test_scan_line_without_newline_ends_with_eof(self):
+        # Running out of input before a newline ends the line with EOF
+        tokens = TableScanner().scan_line("output 5")
+
+        assert list(tokens) == [3, 8, 10, 5, 8, 0]
+
+    def test_scan_line_constant_over_64_bits(self):
+        # A constant that does not fit in the int64 array comes back whole, in a list
+        tokens = TableScanner().scan_line("loadI 99999999999999999999 => r1\n")
+
+        assert tokens == [2, 1, 10, 99999999999999999999, 7, 0, 5, 1, 9, 0]
+
+    def test_scan_buffer_constant_over_64_bits(self):
+        # Lines before and after the large constant are kept
+        tokens = TableScanner().scan_buffer(b"nop\noutput 18446744073709551616\nnop")
+
+        assert list(tokens) == [4, 9, 9, 0, 3, 8, 10, 2 ** 64, 9, 0, 4, 9, 8, 0]
+
+    def test_scan_buffer_multiple_lines(self):
+        # A buffer is scanned line after line; every line ends with exactly one terminal token
+        tokens = TableScanner().scan_buffer(b"nop\nfoo\n// c\noutput 1\n")
+
+        assert list(tokens) == [4, 9, 9, 0, ERROR, 0, 9, 0, 3, 8, 10, 1, 9, 0]
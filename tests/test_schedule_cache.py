@@ -0,0 +1,148 @@
+import pytest
+import os
+import time
+from io import StringIO
+import Parser
+import Renamer
+import Pipeline
+import ScheduleCache
+from ScheduleCache import ScheduleCache as Cache
+
+
+def renamed_head(scanner, iloc_code):
+    head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+    Renamer.renaming(tail, num_ops, max_sr)
+    return head
+
+
+class TestScheduleCacheKey:
+    # Test hashing the normalized renamed IR
+
+    def test_register_names_and_line_numbers_do_not_matter(self, scanner):
+        # Blocks that rename to the same IR share a key
+        first = renamed_head(scanner, "loadI 1 => r1\nloadI 2 => r2\nadd r1, r2 => r3\n")
+        second = renamed_head(scanner, "\n// comment\nloadI 1 => r7\nloadI 2 => r9\nadd r7, r9 => r4\n")
+
+        assert ScheduleCache.ir_key(first) == ScheduleCache.ir_key(second)
+
+    def test_constants_and_opcodes_matter(self, scanner):
+        # A different constant or opcode is a different key
+        base = ScheduleCache.ir_key(renamed_head(scanner, "loadI 1 => r1\noutput 4\n"))
+
+        assert base != ScheduleCache.ir_key(renamed_head(scanner, "loadI 2 => r1\noutput 4\n"))
+        assert base != ScheduleCache.ir_key(renamed_head(scanner, "loadI 1 => r1\noutput 8\n"))
+        assert base != ScheduleCache.ir_key(renamed_head(scanner, "loadI 1 => r1\nnop\n"))
+
+    def test_variant_separates_keys(self, scanner):
+        # The same IR under another variant is another entry
+        head = renamed_head(scanner, "output 4\n")
+
+        assert ScheduleCache.ir_key(head) != ScheduleCache.ir_key(head, "other")
+
+    def test_schedule_version_separates_keys(self, scanner, monkeypatch):
+        # Entries written before the schedules changed are not served afterwards
+        head = renamed_head(scanner, "output 4\n")
+        before = ScheduleCache.ir_key(head)
+        monkeypatch.setattr(ScheduleCache, "SCHEDULE_VERSION", ScheduleCache.SCHEDULE_VERSION + 1)
+
+        assert ScheduleCache.ir_key(head) != before
+
+    def test_variant_includes_default_machine(self):
+        # No machine is the default machine, so changing the default changes the key too
+        assert Pipeline.cache_variant() == Pipeline.cache_variant(machine=Pipeline.DEFAULT_MACHINE)
+        assert Pipeline.DEFAULT_MACHINE.fingerprint() in Pipeline.cache_variant()
+
+
+class TestScheduleCacheStore:
+    # Test the on-disk entries, counters, and LRU eviction
+
+    def test_miss_then_hit(self, tmp_path):
+        # A stored schedule is returned and counted as a hit
+        cache = Cache(str(tmp_path))
+
+        assert cache.get("abc") is None
+        cache.put("abc", "[ nop ; output 1 ]\n")
+
+        assert cache.get("abc") == "[ nop ; output 1 ]\n"
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert cache.stats() == "schedule cache: 1 hits, 1 misses"
+
+    def test_hit_evicted_before_refresh(self, tmp_path, monkeypatch):
+        # An entry read successfully is a hit even if another worker removes it before utime
+        cache = Cache(str(tmp_path))
+        cache.put("abc", "[ nop ; output 1 ]\n")
+
+        def evicted(path):
+            raise FileNotFoundError(path)
+        monkeypatch.setattr(ScheduleCache.os, "utime", evicted)
+
+        assert cache.get("abc") == "[ nop ; output 1 ]\n"
+        assert (cache.hits, cache.misses) == (1, 0)
+
+    def test_put_leaves_no_temporary_files(self, tmp_path):
+        # Entries are written through a temporary file that is renamed into place
+        cache = Cache(str(tmp_path))
+        cache.put("abc", "x\n")
+        cache.put("abc", "y\n")
+
+        assert os.listdir(tmp_path) == ["abc.sched"]
+        assert cache.get("abc") == "y\n"
+
+    def test_least_recently_used_entry_is_evicted(self, tmp_path):
+        # Going over max_bytes removes the entry read least recently
+        cache = Cache(str(tmp_path), max_bytes=20)
+        cache.put("a", "0123456789")
+        cache.put("b", "0123456789")
+        past = time.time() - 60
+        os.utime(cache.path("a"), (past, past))
+        os.utime(cache.path("b"), (past - 60, past - 60))
+        assert cache.get("b") is not None
+
+        cache.put("c", "0123456789")
+
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+        assert cache.get("c") is not None
+        assert cache.size() <= 20
+
+
+class TestScheduleCachePipeline:
+    # Test the cache through Pipeline and lab3.py
+
+    BLOCK = b"loadI 4 => r1\nload r1 => r2\nmult r2, r2 => r3\nstore r3 => r1\n"
+
+    def test_second_schedule_is_a_hit(self, tmp_path):
+        # The cached schedule is what the pipeline printed the first time
+        cache = Cache(str(tmp_path))
+
+        first = Pipeline.schedule_block(self.BLOCK, cache)
+        second = Pipeline.schedule_block(self.BLOCK.replace(b"r3", b"r8"), cache)
+
+        assert first == second
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_pool_counts_worker_hits(self, tmp_path):
+        # Hits and misses in worker processes are added to the caller's counters
+        cache = Cache(str(tmp_path))
+        Pipeline.schedule_block(self.BLOCK, cache)
+
+        schedules = Pipeline.schedule_blocks([self.BLOCK, b"output 1\n"], workers=2, cache=cache)
+
+        assert schedules[1] == "[ nop ; output 1 ]\n"
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_lab3_cache_option(self, test_data_dir, tmp_path, monkeypatch, capsys):
+        # lab3.py --cache prints the same schedule from the cache on the second run
+        import lab3
+        cache_dir = str(tmp_path / "cache")
+        argv = ["lab3.py", "--cache", cache_dir, "--cache-stats", f"{test_data_dir}/serial_outputs.iloc"]
+        monkeypatch.setattr("sys.argv", argv)
+
+        lab3.main()
+        first = capsys.readouterr()
+        lab3.main()
+        second = capsys.readouterr()
+
+        assert first.out == second.out == "[ nop ; output 100 ]\n[ nop ; output 200 ]\n"
+        assert "0 hits, 1 misses" in first.err
+        assert "1 hits, 0 misses" in second.err
@@ -0,0 +1,92 @@
+import pytest
+import os
+import threading
+import Pipeline
+import ScheduleDaemon
+from ScheduleDaemon import ScheduleClient, ScheduleServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    # Scheduling server on a private socket, running on a background thread
+    path = str(tmp_path / "scheduler.sock")
+    server = ScheduleServer(path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+class TestScheduleDaemon:
+    # Test scheduling blocks through the UNIX socket server
+
+    BLOCK = b"loadI 5 => r1\nloadI 10 => r2\nadd r1, r2 => r3\noutput 100\n"
+
+    def test_matches_in_process_schedule(self, server):
+        # The server returns the same schedule (cycle count and operations) as schedule_block
+        with ScheduleClient(server) as client:
+            schedule, messages = client.schedule(self.BLOCK)
+
+        expected = Pipeline.schedule_block(self.BLOCK)
+        assert messages == ""
+        assert len(schedule.splitlines()) == len(expected.splitlines())
+        assert sorted(schedule.replace(";", "\n").split()) == sorted(expected.replace(";", "\n").split())
+
+    def test_many_requests_on_one_connection(self, server):
+        # A connection answers requests in order
+        blocks = [b"output 1\n", self.BLOCK, b"output 2\noutput 3\n"]
+
+        with ScheduleClient(server) as client:
+            results = [client.schedule(block) for block in blocks]
+
+        assert "output 1" in results[0][0]
+        assert "add" in results[1][0]
+        assert "output 3" in results[2][0]
+
+    def test_invalid_lines_are_reported(self, server):
+        # Parse errors come back as messages next to the schedule of the valid lines
+        with ScheduleClient(server) as client:
+            schedule, messages = client.schedule(b"output 1\nfoo r1 => r2\n")
+
+        assert "output 1" in schedule
+        assert "ERROR 2" in messages
+
+    def test_empty_block(self, server):
+        # An empty block schedules to nothing rather than failing
+        with ScheduleClient(server) as client:
+            schedule, messages = client.schedule(b"")
+
+        assert schedule is not None
+
+    def test_socket_removed_on_close(self, tmp_path):
+        # Closing the server removes its socket file, and a stale one is replaced on start
+        path = str(tmp_path / "scheduler.sock")
+        ScheduleServer(path).server_close()
+        assert not os.path.exists(path)
+
+        first = ScheduleServer(path)
+        second = ScheduleServer(path)
+        second.server_close()
+        first.socket.close()
+        assert not os.path.exists(path)
+
+    def test_send_cli(self, server, tmp_path, capsys):
+        # The send command prints schedules and fails for files it cannot open
+        name = tmp_path / "block.iloc"
+        name.write_bytes(self.BLOCK)
+
+        status = ScheduleDaemon.main(["-s", server, "send", str(name), str(tmp_path / "missing.iloc")])
+
+        captured = capsys.readouterr()
+        assert status == 1
+        assert "add" in captured.out
+        assert "could not open" in captured.err
+
+    def test_send_without_server(self, tmp_path, capsys):
+        # Sending with no server listening is reported, not raised
+        status = ScheduleDaemon.main(["-s", str(tmp_path / "none.sock"), "send", "x.iloc"])
+
+        assert status == 2
+        assert "could not connect" in capsys.readouterr().err
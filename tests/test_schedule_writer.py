@@ -0,0 +1,93 @@
+import pytest
+import logging
+from io import StringIO
+import Parser
+import Renamer
+import DependencyGraphGenerator
+import PriorityCalculator
+import Scheduler
+import ScheduleWriter
+
+ILOC_CODE = "loadI 0 => r0\nload r0 => r1\nload r1 => r2\nmult r1, r2 => r3\nstore r3 => r0\noutput 0\n"
+
+
+def schedule(scanner, writer, iloc_code=ILOC_CODE):
+    head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+    Renamer.renaming(tail, num_ops, max_sr)
+    nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+    nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+    cycle_count = Scheduler.schedule(nodes, roots, leaves, writer=writer)
+    return cycle_count, nodes
+
+
+class CountingStream(StringIO):
+    # StringIO that counts write calls
+    writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+class TestTextWriters:
+    # Test the writers that produce the lab3 text format
+
+    def test_text_writer_matches_stdout(self, scanner, capsys):
+        # The default writer prints to stdout; TextWriter on a stream writes the same text
+        schedule(scanner, None)
+        expected = capsys.readouterr().out
+        stream = StringIO()
+
+        schedule(scanner, ScheduleWriter.TextWriter(stream))
+
+        assert stream.getvalue() == expected
+        assert ScheduleWriter.IDLE_CYCLE + "\n" in expected
+
+    def test_text_writer_buffers_lines(self, scanner):
+        # The whole schedule goes out in one write unless it outgrows the buffer
+        stream = CountingStream()
+        cycle_count, _ = schedule(scanner, ScheduleWriter.TextWriter(stream))
+        assert stream.writes == 1
+
+        small = CountingStream()
+        schedule(scanner, ScheduleWriter.TextWriter(small, buffer_lines=4))
+        assert 1 < small.writes < cycle_count
+        assert small.getvalue() == stream.getvalue()
+
+    def test_list_and_file_writers(self, scanner, tmp_path):
+        # ListWriter keeps the lines, FileWriter writes (and closes) the file
+        stream = StringIO()
+        schedule(scanner, ScheduleWriter.TextWriter(stream, compress_nops=True))
+        lines = ScheduleWriter.ListWriter(compress_nops=True)
+        schedule(scanner, lines)
+        path = tmp_path / "schedule.txt"
+        writer = ScheduleWriter.FileWriter(str(path), compress_nops=True)
+        schedule(scanner, writer)
+
+        assert lines.lines == stream.getvalue().splitlines()
+        assert "nop x4" in lines.lines
+        assert path.read_text() == stream.getvalue()
+        assert writer.stream.closed
+
+    def test_base_writers_are_abstract(self):
+        # A writer has to say what to do with issued cycles, and a line writer with its lines
+        with pytest.raises(TypeError):
+            ScheduleWriter.ScheduleWriter()
+        with pytest.raises(TypeError):
+            ScheduleWriter.LineWriter()
+
+
+class TestRecordWriter:
+    # Test the structured record stream
+
+    def test_records(self, scanner, caplog):
+        # One (cycle, unit, line number) per issued operation; nothing is formatted (debug logging
+        # would format the loads and stores)
+        caplog.set_level(logging.INFO, logger="Scheduler")
+        writer = ScheduleWriter.RecordWriter()
+
+        cycle_count, nodes = schedule(scanner, writer)
+
+        assert writer.records == [(1, 1, 1), (2, 0, 2), (7, 0, 3), (12, 1, 4), (15, 0, 5), (20, 1, 6)]
+        assert cycle_count == 20
+        assert all(node.formatted is None for node in nodes)
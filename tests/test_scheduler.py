@@ -6,6 +6,7 @@ import Renamer
 import DependencyGraphGenerator
 import PriorityCalculator
 import Scheduler
+import ScheduleWriter
 
 
 class TestSchedulerBasic:
@@ -40,3 +41,198 @@ class TestSchedulerBasic:
         # Add must wait for loadI
         assert cycle_count is not None
         assert cycle_count > 0
+
+    def test_scheduler_terminates_on_nop(self, scanner):
+        # nops are dropped rather than re-readied forever
+        iloc_code = "nop\nloadI 5 => r1\n"
+        file = StringIO(iloc_code)
+        head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+
+        cycle_count = Scheduler.schedule(nodes, roots, leaves, False)
+
+        assert cycle_count == 1
+        assert all(node.finished for node in nodes)
+
+
+class TestSchedulerRetirement:
+    # Test that in-flight operations retire after their latency
+
+    def schedule(self, scanner, iloc_code, capsys):
+        file = StringIO(iloc_code)
+        head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+        cycle_count = Scheduler.schedule(nodes, roots, leaves, False)
+        return cycle_count, capsys.readouterr().out.splitlines()
+
+    def test_overlapping_loads_retire_in_order(self, scanner, capsys):
+        # Two loads in flight at once; the add waits for the later one, the output for the store
+        iloc_code = "loadI 0 => r0\nload r0 => r1\nload r0 => r2\nadd r1, r2 => r3\nstore r3 => r0\noutput 0\n"
+
+        cycle_count, lines = self.schedule(scanner, iloc_code, capsys)
+
+        assert cycle_count == 14
+        assert "add" in lines[7]
+        assert "store" in lines[8]
+        assert lines[13] == "[ nop ; output 0 ]"
+        assert all(line == "[ nop ; nop ]" for line in lines[3:7] + lines[9:13])
+
+    def test_store_released_early_after_load(self, scanner, capsys):
+        # A store with a serial edge to a load issues the cycle after the load, not after it retires
+        iloc_code = "loadI 0 => r0\nloadI 4 => r2\nload r0 => r1\nstore r2 => r0\n"
+
+        cycle_count, lines = self.schedule(scanner, iloc_code, capsys)
+
+        assert lines[1].startswith("[ load")
+        assert lines[2].startswith("[ store")
+        assert cycle_count == 7
+
+    def test_dependence_counts_drain(self, scanner, test_data_dir):
+        # Every dependence is satisfied exactly once
+        with open(f"{test_data_dir}/serial_stores.iloc", "r") as file:
+            head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+
+        Scheduler.schedule(nodes, roots, leaves, False)
+
+        assert all(node.unfinished == 0 and node.unreleased == 0 for node in nodes)
+
+
+class TestSchedulerReadyQueues:
+    # Test picking operations from the per-resource ready queues
+
+    def test_contended_memory_unit(self, scanner, capsys, monkeypatch):
+        # Loads issue one per cycle on f0 while ALU work fills the free units; nodes are never compared
+        monkeypatch.setattr(Scheduler.Node, "__lt__", lambda self, other: pytest.fail("nodes compared"))
+        iloc_code = ("loadI 0 => r0\n" + "".join(f"load r0 => r{i}\n" for i in range(1, 5))
+                     + "".join(f"loadI {i} => r{i + 10}\n" for i in range(1, 5)))
+        file = StringIO(iloc_code)
+        head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+
+        cycle_count = Scheduler.schedule(nodes, roots, leaves, False)
+
+        lines = capsys.readouterr().out.splitlines()
+        assert [line.count("load ") for line in lines] == [0, 0, 1, 1, 1, 1, 0, 0, 0, 0]
+        assert sum(line.count("loadI") for line in lines) == 5
+        assert cycle_count == 10
+
+
+class TestSchedulerIdleCycles:
+    # Test skipping and printing idle cycles
+
+    def schedule(self, scanner, iloc_code, capsys, compress_nops):
+        file = StringIO(iloc_code)
+        head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+        cycle_count = Scheduler.schedule(nodes, roots, leaves, False, compress_nops)
+        return cycle_count, capsys.readouterr().out.splitlines()
+
+    def test_load_chain_prints_every_idle_cycle(self, scanner, capsys):
+        # Each load waits out the previous one's latency; by default every idle cycle gets a line
+        iloc_code = "loadI 0 => r0\nload r0 => r1\nload r1 => r2\nload r2 => r3\n"
+
+        cycle_count, lines = self.schedule(scanner, iloc_code, capsys, False)
+
+        assert cycle_count == 16
+        assert len(lines) == 16
+        assert lines[2:6] == [ScheduleWriter.IDLE_CYCLE] * 4
+        assert lines[-4:] == [ScheduleWriter.IDLE_CYCLE] * 4
+
+    def test_load_chain_compressed(self, scanner, capsys):
+        # Compressed output prints one line per run of idle cycles; the cycle count is unchanged
+        iloc_code = "loadI 0 => r0\nload r0 => r1\nload r1 => r2\nload r2 => r3\n"
+
+        cycle_count, lines = self.schedule(scanner, iloc_code, capsys, True)
+
+        assert cycle_count == 16
+        assert len(lines) == 7
+        assert [line for line in lines if "load " in line] == [lines[1], lines[3], lines[5]]
+        assert lines[2::2] == ["nop x4"] * 3
+
+
+class TestSchedulerSlotAssignment:
+    # Test matching the operations picked in a cycle to functional units
+
+    def test_alu_op_moves_aside_for_mult(self, scanner, capsys):
+        # The add is picked first and would take f1, the only unit for mult; it moves to f0 instead
+        iloc_code = "loadI 1 => r1\nloadI 2 => r2\nadd r1, r2 => r3\nmult r1, r2 => r4\nadd r3, r3 => r5\nadd r5, r5 => r6\n"
+        file = StringIO(iloc_code)
+        head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+
+        Scheduler.schedule(nodes, roots, leaves, False)
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[1].startswith("[ add") and " ; mult" in lines[1]
+
+
+class TestSchedulerCSR:
+    # Test scheduling directly on the CSR graph
+
+    @pytest.mark.parametrize("name", ["serial_stores.iloc", "serial_outputs.iloc", "all_arithops.iloc", "data_dependency.iloc"])
+    @pytest.mark.parametrize("priority", [None, "slack", "register_pressure + critical_path"])
+    def test_matches_node_schedule(self, scanner, test_data_dir, name, priority):
+        # The CSR priorities and schedule are exactly those of the Node graph
+        with open(f"{test_data_dir}/{name}", "r") as file:
+            head, tail, num_ops, max_sr = Parser.parseILOC(file, False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head)
+        nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves, priority=priority)
+        expected = ScheduleWriter.ListWriter()
+        expected_cycles = Scheduler.schedule(nodes, roots, leaves, writer=expected)
+        graph = DependencyGraphGenerator.generate_dependency_graph_csr(head)
+
+        priorities = PriorityCalculator.calculate_csr_priorities(graph, priority=priority)
+        lines = ScheduleWriter.ListWriter()
+        cycle_count = Scheduler.schedule_csr(graph, priorities, writer=lines)
+
+        assert priorities == [node.priority for node in sorted(nodes, key=Scheduler.Node.getOPNum)]
+        assert cycle_count == expected_cycles
+        assert lines.lines == expected.lines
+
+
+class TestSchedulerMemoryFrontier:
+    # Test that the reduced memory edges schedule exactly like the full graph
+
+    def schedule(self, scanner, iloc_code, reduce_memory_edges, csr):
+        head, tail, num_ops, max_sr = Parser.parseILOC(StringIO(iloc_code), False, False, False, scanner)
+        Renamer.renaming(tail, num_ops, max_sr)
+        lines = ScheduleWriter.ListWriter()
+        if csr:
+            graph = DependencyGraphGenerator.generate_dependency_graph_csr(head, reduce_memory_edges=reduce_memory_edges)
+            priorities = PriorityCalculator.calculate_csr_priorities(graph)
+            cycle_count = Scheduler.schedule_csr(graph, priorities, writer=lines)
+        else:
+            nodes, roots, leaves = DependencyGraphGenerator.generate_dependency_graph(head, reduce_memory_edges=reduce_memory_edges)
+            nodes, roots, leaves = PriorityCalculator.calculatePriorities(nodes, roots, leaves)
+            cycle_count = Scheduler.schedule(nodes, roots, leaves, writer=lines, memory_frontier=reduce_memory_edges)
+        return cycle_count, lines.lines
+
+    @pytest.mark.parametrize("csr", [False, True])
+    def test_store_waits_for_load_of_previous_store(self, scanner, csr):
+        # The first store issues while the load is in flight; the second still waits for the load
+        iloc_code = "loadI 0 => r0\nloadI 4 => r2\nload r0 => r1\nstore r2 => r0\nstore r2 => r2\nstore r0 => r2\n"
+
+        assert self.schedule(scanner, iloc_code, True, csr) == self.schedule(scanner, iloc_code, False, csr)
+
+    @pytest.mark.parametrize("csr", [False, True])
+    @pytest.mark.parametrize("name", ["serial_stores.iloc", "serial_outputs.iloc", "all_arithops.iloc"])
+    def test_matches_full_graph(self, scanner, test_data_dir, name, csr):
+        with open(f"{test_data_dir}/{name}", "r") as file:
+            iloc_code = file.read()
+        iloc_code += "load r1 => r2\nstore r2 => r3\nload r3 => r4\noutput 8\nstore r4 => r1\n" * 4
+
+        assert self.schedule(scanner, iloc_code, True, csr) == self.schedule(scanner, iloc_code, False, csr)